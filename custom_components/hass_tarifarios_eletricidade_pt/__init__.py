@@ -4,29 +4,43 @@ from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
 
-from .const import DOMAIN, VERSION  # ensure DOMAIN = "hass_tarifarios_eletricidade_pt"
+from .const import DEFAULT_CONSUMO_ANUAL, DEFAULT_CONTAGEM, DEFAULT_ENGINE, DEFAULT_ESCALAO_GN, DEFAULT_SENSOR_MODE, DOMAIN, VERSION  # ensure DOMAIN = "hass_tarifarios_eletricidade_pt"
 from .data_loader import TarifariosDataUpdateCoordinator
+from .offer_filters import offer_filters_from_config
+from .sensor import async_remove_other_mode_entities
+from .services import async_setup_services
+from .websocket_api import async_setup_websocket_api
 
 # Expose version for Home Assistant
 __version__ = VERSION
 
 PLATFORMS: list[Platform] = [Platform.SENSOR]
 
+
+def _selected_codes(config) -> list[str] | None:
+    sel_codes = config.get("codigos_oferta")
+    if isinstance(sel_codes, str):
+        sel_codes = [c.strip() for c in sel_codes.split(",") if c.strip()]
+    return sel_codes
+
+
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
     """Set up the integration (YAML not used)."""
+    async_setup_services(hass)
+    async_setup_websocket_api(hass)
     return True
 
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up a config entry."""
     hass.data.setdefault(DOMAIN, {})
     
-    # Extract configuration from config entry
-    comercializador = entry.data.get("comercializador")
-    pot_cont = entry.data.get("pot_cont")
-    energy_type = entry.data.get("energy_type", "ele")  # Default to electricity only for backward compatibility
-    sel_codes = entry.data.get("codigos_oferta")
-    if isinstance(sel_codes, str):
-        sel_codes = [c.strip() for c in sel_codes.split(",") if c.strip()]
+    # Extract configuration from config entry (options override the initial data)
+    config = {**entry.data, **entry.options}
+    comercializador = config.get("comercializador")
+    pot_cont = config.get("pot_cont")
+    energy_type = config.get("energy_type", "ele")  # Default to electricity only for backward compatibility
+    sel_codes = _selected_codes(config)
     
     # Create the data update coordinator
     coordinator = TarifariosDataUpdateCoordinator(
@@ -34,7 +48,16 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         comercializador=comercializador,
         codigos_oferta=sel_codes,
         pot_cont=pot_cont,
-        energy_type=energy_type
+        energy_type=energy_type,
+        engine=config.get("engine", DEFAULT_ENGINE),
+        offer_filters=offer_filters_from_config(config),
+        consumo_anual=config.get("consumo_anual", DEFAULT_CONSUMO_ANUAL),
+        consumo_sensor=config.get("consumo_sensor"),
+        escalao_gn=config.get("escalao_gn", DEFAULT_ESCALAO_GN),
+        fontes=config.get("fontes"),
+        caminho_local=config.get("caminho_local"),
+        artefacto=config.get("artefacto"),
+        contagem=config.get("contagem", DEFAULT_CONTAGEM),
     )
     
     # Fetch initial data
@@ -43,12 +66,48 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # Store coordinator in hass.data
     hass.data[DOMAIN][entry.entry_id] = {
         "coordinator": coordinator,
-        "config": entry.data,
+        "config": config,
     }
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    entry.async_on_unload(entry.add_update_listener(async_update_options))
+    entry.async_on_unload(coordinator.async_cancel_validity_timer)
+    entry.async_on_unload(coordinator.async_untrack_consumption_sensor)
     return True
 
+
+async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Apply changed options to the cached snapshot instead of reloading the entry."""
+    config = {**entry.data, **entry.options}
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    mode = config.get("modo_sensores", DEFAULT_SENSOR_MODE)
+    if mode != entry_data["config"].get("modo_sensores", DEFAULT_SENSOR_MODE):
+        # Switching between per-offer and catalogue sensors replaces the entities
+        async_remove_other_mode_entities(hass, entry.entry_id, mode)
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+    entry_data["config"] = config
+    coordinator = entry_data["coordinator"]
+    engine = config.get("engine", DEFAULT_ENGINE)
+    if engine != coordinator.engine:
+        # The cached snapshot belongs to the other engine: rebuild it, then filter
+        coordinator.engine = engine
+        coordinator.snapshot = None
+    # New sources are used from the next release on
+    coordinator.fontes = config.get("fontes")
+    coordinator.caminho_local = config.get("caminho_local")
+    coordinator.artefacto = config.get("artefacto")
+    await coordinator.async_apply_filters(
+        codigos_oferta=_selected_codes(config),
+        pot_cont=config.get("pot_cont"),
+        energy_type=config.get("energy_type", "ele"),
+        offer_filters=offer_filters_from_config(config),
+        consumo_anual=config.get("consumo_anual", DEFAULT_CONSUMO_ANUAL),
+        consumo_sensor=config.get("consumo_sensor"),
+        escalao_gn=config.get("escalao_gn", DEFAULT_ESCALAO_GN),
+    )
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
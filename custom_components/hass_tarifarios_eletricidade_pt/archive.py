@@ -0,0 +1,376 @@
+"""On-disk archive of ERSE releases, stored as price deltas, with price-history queries.
+
+Each release is one gzip JSON file holding only the prices that changed against the
+previous release (by date): {"changed": {key: prices}, "removed": [key, ...]}, where
+key is "code|potência|contagem|escalão" and prices follow snapshot.PRICE_COLS.
+index.json lists the releases and, per offer code, the releases that touched it, so a
+query on one offer only decompresses the releases where that offer changed, plus the
+comercializador of every offer seen.
+
+The latest release, and one release every CHECKPOINT_INTERVAL, also keep their full
+price table, so rebuilding the table of any release replays at most that many deltas.
+
+PriceArchive is blocking; the async helpers at the bottom run it in the executor.
+"""
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+from datetime import date, datetime, timedelta
+
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .snapshot import CODE_COL, COMERCIALIZADOR_COL, PRICE_FIELDS, column_values
+from .tariff_periods import LISBON_TZ
+
+_LOGGER = logging.getLogger(__name__)
+
+ARCHIVE_DIR = f"{DOMAIN}_archive"
+INDEX_FILE = "index.json"
+INDEX_VERSION = 1
+# Key of the shared PriceArchive in hass.data[DOMAIN]
+DATA_ARCHIVE = "archive"
+# Most deltas replayed to rebuild a release's table from the full table before it
+CHECKPOINT_INTERVAL = 30
+
+_URL_DATE = re.compile(r"/(\d{8})(?:%20|\s)(\d{6})(?:%20|\s)CSV\.zip", re.IGNORECASE)
+
+
+def release_datetime_from_url(url: str | None) -> datetime | None:
+    """Publication time encoded in an ERSE ZIP URL (".../20250919%20100313%20CSV.zip").
+
+    The result is naive, in ERSE (Lisbon) local time.
+    """
+    match = _URL_DATE.search(url or "")
+    if not match:
+        return None
+    try:
+        return datetime.strptime(match[1] + match[2], "%Y%m%d%H%M%S")
+    except ValueError:
+        return None
+
+
+def release_date_from_url(url: str | None) -> date | None:
+    """Publication date encoded in an ERSE ZIP URL."""
+    published = release_datetime_from_url(url)
+    return published.date() if published is not None else None
+
+
+def _key(key: tuple) -> str:
+    return "|".join(key)
+
+
+def _code(key: str) -> str:
+    return key.split("|", 1)[0]
+
+
+def diff_tables(old: dict, new: dict) -> tuple[dict, list]:
+    """Return ({key: prices} changed or added, [keys] removed) from old to new."""
+    changed = {k: list(v) for k, v in new.items() if old.get(k) != v}
+    removed = [k for k in old if k not in new]
+    return changed, removed
+
+
+class PriceArchive:
+    """Delta-encoded releases in one directory, plus the per-offer index."""
+
+    def __init__(self, path: str):
+        self.path = path
+        # [{"hash", "date", "file", "url", "full" (checkpoints only)}], sorted by date
+        self.releases: list[dict] = []
+        # offer code -> hashes of the releases that changed it
+        self.offers: dict[str, list[str]] = {}
+        # offer code -> comercializador, for the offers that left the newer releases
+        self.comercializadores: dict[str, str] = {}
+        self._loaded = False
+        # Entries refreshing at the same time archive from several executor threads
+        self._lock = threading.Lock()
+        # Hashes archived by this instance (i.e. first seen since Home Assistant started)
+        self.new_releases: set[str] = set()
+
+    # Storage -------------------------------------------------------------
+
+    def load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(os.path.join(self.path, INDEX_FILE), encoding="utf-8") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            _LOGGER.warning("Unreadable price archive index, starting a new one: %s", e)
+            return
+        self.releases = index.get("releases", [])
+        self.offers = index.get("offers", {})
+        self.comercializadores = index.get("comercializadores", {})
+
+    def _save_index(self) -> None:
+        tmp = os.path.join(self.path, INDEX_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "releases": self.releases, "offers": self.offers,
+                       "comercializadores": self.comercializadores}, f)
+        os.replace(tmp, os.path.join(self.path, INDEX_FILE))
+
+    def _read_delta(self, release: dict) -> dict:
+        with gzip.open(os.path.join(self.path, release["file"]), "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_delta(self, release: dict, changed: dict, removed: list) -> None:
+        with gzip.open(os.path.join(self.path, release["file"]), "wt", encoding="utf-8") as f:
+            json.dump({"hash": release["hash"], "date": release["date"], "changed": changed, "removed": removed}, f)
+
+    def _read_full(self, release: dict) -> dict:
+        with gzip.open(os.path.join(self.path, release["full"]), "rt", encoding="utf-8") as f:
+            return json.load(f)["table"]
+
+    def _write_full(self, release: dict, table: dict) -> None:
+        release["full"] = f"{release['date'].replace('-', '')}_{release['hash'][:12]}.full.json.gz"
+        with gzip.open(os.path.join(self.path, release["full"]), "wt", encoding="utf-8") as f:
+            json.dump({"hash": release["hash"], "date": release["date"], "table": table}, f)
+
+    def _drop_full(self, release: dict) -> None:
+        try:
+            os.remove(os.path.join(self.path, release.pop("full")))
+        except OSError as e:
+            _LOGGER.debug("Could not remove the full table of release %s: %s", release["hash"][:12], e)
+
+    def _checkpoint_before(self, position: int) -> int:
+        """Position of the last release before `position` with a full table, -1 if none."""
+        return next((i for i in range(position - 1, -1, -1) if "full" in self.releases[i]), -1)
+
+    def _table_before(self, position: int) -> dict:
+        """Full price table of the release before `position`: its last checkpoint plus the deltas since."""
+        start = self._checkpoint_before(position)
+        table: dict = self._read_full(self.releases[start]) if start >= 0 else {}
+        for release in self.releases[start + 1:position]:
+            delta = self._read_delta(release)
+            table.update(delta["changed"])
+            for key in delta["removed"]:
+                table.pop(key, None)
+        return table
+
+    def _fill_checkpoints(self, position: int) -> None:
+        """Add full tables to the stretch of deltas around `position` wherever it is CHECKPOINT_INTERVAL long."""
+        last = self._checkpoint_before(position)
+        table: dict = self._read_full(self.releases[last]) if last >= 0 else {}
+        for i in range(last + 1, len(self.releases)):
+            release = self.releases[i]
+            if "full" in release:
+                return
+            delta = self._read_delta(release)
+            table.update(delta["changed"])
+            for key in delta["removed"]:
+                table.pop(key, None)
+            if i - last >= CHECKPOINT_INTERVAL:
+                self._write_full(release, table)
+                last = i
+
+    def _index_release(self, release_hash: str, changed: dict, removed: list, drop: bool = False) -> None:
+        for code in {_code(k) for k in changed} | {_code(k) for k in removed}:
+            hashes = self.offers.setdefault(code, [])
+            if drop:
+                if release_hash in hashes:
+                    hashes.remove(release_hash)
+            elif release_hash not in hashes:
+                hashes.append(release_hash)
+
+    # Writing -------------------------------------------------------------
+
+    def has_release(self, release_hash: str) -> bool:
+        self.load()
+        return any(r["hash"] == release_hash for r in self.releases)
+
+    def add_release(self, release_hash: str, release_date: date, price_table: dict, url: str | None = None,
+                    comercializadores: dict[str, str] | None = None) -> bool:
+        """Store one release as a delta; older releases (backfill) are slotted in by date.
+
+        comercializadores maps the release's offer codes to their comercializador.
+        Returns False when the release is already archived.
+        """
+        with self._lock:
+            return self._add_release(release_hash, release_date, price_table, url, comercializadores)
+
+    def _add_release(self, release_hash: str, release_date: date, price_table: dict, url: str | None,
+                     comercializadores: dict[str, str] | None) -> bool:
+        if self.has_release(release_hash):
+            return False
+        os.makedirs(self.path, exist_ok=True)
+        self.comercializadores.update(comercializadores or {})
+
+        new = {_key(k): list(v) for k, v in price_table.items()}
+        release = {
+            "hash": release_hash,
+            "date": release_date.isoformat(),
+            "file": f"{release_date:%Y%m%d}_{release_hash[:12]}.json.gz",
+            "url": url,
+        }
+        position = sum(1 for r in self.releases if r["date"] <= release["date"])
+        previous = self._table_before(position)
+
+        changed, removed = diff_tables(previous, new)
+        self._write_delta(release, changed, removed)
+        self._index_release(release_hash, changed, removed)
+
+        # The release after the new one is now a delta against the new one
+        if position < len(self.releases):
+            following = self.releases[position]
+            old = self._read_delta(following)
+            self._index_release(following["hash"], old["changed"], old["removed"], drop=True)
+            full = dict(previous)
+            full.update(old["changed"])
+            for key in old["removed"]:
+                full.pop(key, None)
+            f_changed, f_removed = diff_tables(new, full)
+            self._write_delta(following, f_changed, f_removed)
+            self._index_release(following["hash"], f_changed, f_removed)
+
+        self.releases.insert(position, release)
+        if position == len(self.releases) - 1:
+            self._write_full(release, new)
+            former = position - 1
+            if former >= 0 and "full" in self.releases[former] and former - self._checkpoint_before(former) < CHECKPOINT_INTERVAL:
+                # The former latest release keeps its full table only as a periodic checkpoint
+                self._drop_full(self.releases[former])
+        else:
+            self._fill_checkpoints(position)
+        self.new_releases.add(release_hash)
+        self._save_index()
+        _LOGGER.debug("Archived release %s (%s): %d changed, %d removed",
+                      release_hash[:12], release["date"], len(changed), len(removed))
+        return True
+
+    # Queries -------------------------------------------------------------
+
+    def offer_codes(self, comercializador: str) -> set[str]:
+        """Codes of every archived offer of a comercializador."""
+        self.load()
+        return {code for code, owner in self.comercializadores.items() if owner == comercializador}
+
+    def previous_table(self, release_hash: str) -> dict[tuple, tuple] | None:
+        """Price table of the release before `release_hash` (the latest one if not archived)."""
+        self.load()
+        position = next((i for i, r in enumerate(self.releases) if r["hash"] == release_hash), len(self.releases))
+        if position == 0:
+            return None
+        table = self._table_before(position)
+        return {tuple(k.split("|")): tuple(v) for k, v in table.items()}
+
+    def _offer_releases(self, code: str, until: date | None = None) -> list[dict]:
+        hashes = set(self.offers.get(code, ()))
+        return [
+            r for r in self.releases
+            if r["hash"] in hashes and (until is None or r["date"] <= until.isoformat())
+        ]
+
+    def price_on(self, code: str, day: date) -> dict[str, dict]:
+        """Prices of every (potência, contagem, escalão) of an offer in force on `day`."""
+        self.load()
+        state: dict[str, list] = {}
+        for release in self._offer_releases(code, day):
+            delta = self._read_delta(release)
+            state.update({k: v for k, v in delta["changed"].items() if _code(k) == code})
+            for key in delta["removed"]:
+                if _code(key) == code:
+                    state.pop(key, None)
+        return {key.split("|", 1)[1]: dict(zip(PRICE_FIELDS, values)) for key, values in state.items()}
+
+    def changes(self, code: str) -> list[dict]:
+        """Every price change of an offer, oldest first."""
+        self.load()
+        state: dict[str, list] = {}
+        result = []
+        for release in self._offer_releases(code):
+            delta = self._read_delta(release)
+            for key, values in delta["changed"].items():
+                if _code(key) != code:
+                    continue
+                result.append({
+                    "date": release["date"],
+                    "variant": key.split("|", 1)[1],
+                    "old": dict(zip(PRICE_FIELDS, state[key])) if key in state else None,
+                    "new": dict(zip(PRICE_FIELDS, values)),
+                })
+                state[key] = values
+            for key in delta["removed"]:
+                if _code(key) == code and key in state:
+                    result.append({
+                        "date": release["date"],
+                        "variant": key.split("|", 1)[1],
+                        "old": dict(zip(PRICE_FIELDS, state.pop(key))),
+                        "new": None,
+                    })
+        return result
+
+
+def get_archive(hass: HomeAssistant) -> PriceArchive:
+    """Return the shared PriceArchive under the config directory."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    archive = domain_data.get(DATA_ARCHIVE)
+    if archive is None:
+        archive = domain_data[DATA_ARCHIVE] = PriceArchive(hass.config.path(".storage", ARCHIVE_DIR))
+    return archive
+
+
+async def async_archive_snapshot(hass: HomeAssistant, snapshot, url: str | None = None,
+                                 release_date: date | None = None) -> bool:
+    """Archive a snapshot once per hash, dated from its ZIP URL (today when unknown)."""
+    archive = get_archive(hass)
+    release_date = release_date or release_date_from_url(url) or datetime.now(LISBON_TZ).date()
+
+    def _add() -> bool:
+        if archive.has_release(snapshot.hash):
+            return False
+        comercializadores = {
+            str(code): str(owner)
+            for code, owner in zip(column_values(snapshot.cond_df, CODE_COL), column_values(snapshot.cond_df, COMERCIALIZADOR_COL))
+            if code is not None and owner is not None
+        }
+        return archive.add_release(snapshot.hash, release_date, snapshot.price_table, url, comercializadores)
+
+    try:
+        return await asyncio.to_thread(_add)
+    except OSError as e:
+        _LOGGER.warning("Could not archive ERSE release %s: %s", snapshot.hash[:12], e)
+        return False
+
+
+async def async_backfill(hass: HomeAssistant, days: int) -> int:
+    """Fetch and archive the releases of the last `days` days; return how many were added."""
+    from .data_loader import build_snapshot
+    from .downloader import async_download_erse_zip, async_extract_csv_from_zip, async_find_zip_for_date
+
+    archive = get_archive(hass)
+    await asyncio.to_thread(archive.load)
+    known_dates = {r["date"] for r in archive.releases}
+    added = 0
+    today = datetime.now(LISBON_TZ).date()
+    for days_back in range(days):
+        day = today - timedelta(days=days_back)
+        if day.isoformat() in known_dates:
+            continue
+        url = await async_find_zip_for_date(hass, day)
+        if url is None:
+            continue
+        try:
+            zip_content = await async_download_erse_zip(hass, url)
+            cond_txt, precos_txt = await asyncio.gather(
+                async_extract_csv_from_zip(zip_content, "CondComerciais.csv"),
+                async_extract_csv_from_zip(zip_content, "Precos_ELEGN.csv"),
+            )
+            # Only prices are kept, so the cheaper engine is enough
+            snapshot = await asyncio.to_thread(build_snapshot, cond_txt, precos_txt, "lite")
+        except Exception as e:
+            _LOGGER.warning("Backfill of %s failed: %s", url, e)
+            continue
+        if await async_archive_snapshot(hass, snapshot, url, day):
+            added += 1
+    _LOGGER.info("Price archive backfill of %d days added %d releases", days, added)
+    return added
@@ -0,0 +1,166 @@
+"""Snapshot artefacts: an ERSE release parsed once (see build) and loaded by many installs.
+
+An artefact is a ZIP holding:
+
+- manifest.json: format and version, integration version, snapshot hash, the release
+  it was built from (source, URL, date), build time and the shape of each table;
+- <table>.json and <table>.idx for the CondComerciais and Precos_ELEGN tables, already
+  header-mapped: per column the distinct texts (the dictionary), and the dictionary
+  position of every cell as little-endian uint32 (0 = missing), column after column;
+- catalogue.json: the offers catalogue of the snapshot.
+
+Loading an artefact only decodes JSON and integer arrays; nothing is evaluated or
+unpickled, so an artefact fetched from a URL cannot run code.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sys
+import zipfile
+from array import array
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from io import BytesIO
+
+from .const import VERSION
+
+_LOGGER = logging.getLogger(__name__)
+
+ARTEFACT_FORMAT = "tarifarios-snapshot"
+# Bumped on any change of the layout above; older or newer artefacts are refused
+ARTEFACT_VERSION = 1
+MANIFEST = "manifest.json"
+CATALOGUE = "catalogue.json"
+TABLES = ("cond", "precos")
+
+
+class ArtefactError(Exception):
+    """Not a snapshot artefact, or one of another format version."""
+
+
+@dataclass
+class Artefact:
+    """A loaded artefact: its manifest, the text columns of each table and the catalogue."""
+
+    manifest: dict
+    tables: dict[str, dict[str, list]]
+    catalogue: dict | None = None
+
+    @property
+    def hash(self) -> str:
+        return self.manifest["hash"]
+
+    @property
+    def release_date(self) -> date | None:
+        released = self.manifest.get("release", {}).get("date")
+        return date.fromisoformat(released) if released else None
+
+
+def _encode(column: list) -> tuple[list[str], array]:
+    positions: dict[str, int] = {}
+    codes = array("I")
+    for value in column:
+        if value is None:
+            codes.append(0)
+        else:
+            codes.append(positions.setdefault(value, len(positions) + 1))
+    return list(positions), codes
+
+
+def _decode(values: list[str], codes: array) -> list:
+    lookup = [None, *values]
+    return [lookup[c] for c in codes]
+
+
+def _little_endian(codes: array) -> array:
+    if sys.byteorder != "little":
+        codes.byteswap()
+    return codes
+
+
+def write_artefact(path: str, snapshot_hash: str, tables: dict[str, dict[str, list]],
+                   catalogue: dict | None = None, release: dict | None = None) -> dict:
+    """Write an artefact of header-mapped text columns (data_loader.parse_tables); return its manifest. Blocking."""
+    manifest = {
+        "format": ARTEFACT_FORMAT,
+        "version": ARTEFACT_VERSION,
+        "integration_version": VERSION,
+        "hash": snapshot_hash,
+        "release": release or {},
+        "built_at": datetime.now(timezone.utc).isoformat(),
+        "tables": {},
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.tmp"
+    try:
+        with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zf:
+            for name in TABLES:
+                columns = tables.get(name, {})
+                dictionaries, blob = [], array("I")
+                for column in columns.values():
+                    values, codes = _encode(column)
+                    dictionaries.append(values)
+                    blob.extend(codes)
+                rows = len(next(iter(columns.values()))) if columns else 0
+                manifest["tables"][name] = {"rows": rows, "columns": list(columns)}
+                zf.writestr(f"{name}.json", json.dumps(dictionaries, ensure_ascii=False, separators=(",", ":")))
+                zf.writestr(f"{name}.idx", _little_endian(blob).tobytes())
+            if catalogue is not None:
+                zf.writestr(CATALOGUE, json.dumps(catalogue, ensure_ascii=False, separators=(",", ":")))
+            zf.writestr(MANIFEST, json.dumps(manifest, ensure_ascii=False, indent=2))
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    _LOGGER.debug("Wrote artefact %s of snapshot %s (%d bytes)", path, snapshot_hash[:12], os.path.getsize(path))
+    return manifest
+
+
+def _manifest(zf: zipfile.ZipFile) -> dict:
+    try:
+        manifest = json.loads(zf.read(MANIFEST))
+    except (KeyError, ValueError) as e:
+        raise ArtefactError(f"No valid {MANIFEST}") from e
+    if manifest.get("format") != ARTEFACT_FORMAT:
+        raise ArtefactError("Not a snapshot artefact")
+    if manifest.get("version") != ARTEFACT_VERSION:
+        raise ArtefactError(f"Artefact format version {manifest.get('version')}, expected {ARTEFACT_VERSION}")
+    return manifest
+
+
+def read_manifest(content: bytes) -> dict:
+    """Manifest of an artefact, without decoding its tables. Blocking."""
+    try:
+        with zipfile.ZipFile(BytesIO(content)) as zf:
+            return _manifest(zf)
+    except zipfile.BadZipFile as e:
+        raise ArtefactError("Not a ZIP") from e
+
+
+def read_artefact(content: bytes) -> Artefact:
+    """Decode a whole artefact. Blocking."""
+    try:
+        with zipfile.ZipFile(BytesIO(content)) as zf:
+            manifest = _manifest(zf)
+            tables = {}
+            for name in TABLES:
+                shape = manifest["tables"][name]
+                rows, names = shape["rows"], shape["columns"]
+                dictionaries = json.loads(zf.read(f"{name}.json"))
+                blob = array("I")
+                blob.frombytes(zf.read(f"{name}.idx"))
+                if len(dictionaries) != len(names) or len(blob) != rows * len(names):
+                    raise ArtefactError(f"Table {name} does not match its manifest shape")
+                _little_endian(blob)
+                tables[name] = {
+                    column: _decode(values, blob[i * rows:(i + 1) * rows])
+                    for i, (column, values) in enumerate(zip(names, dictionaries))
+                }
+            catalogue = json.loads(zf.read(CATALOGUE)) if CATALOGUE in zf.namelist() else None
+    except (zipfile.BadZipFile, KeyError, ValueError) as e:
+        raise ArtefactError(f"Corrupt artefact: {e}") from e
+    return Artefact(manifest, tables, catalogue)
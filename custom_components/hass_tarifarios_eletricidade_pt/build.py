@@ -0,0 +1,102 @@
+"""Headless build of a snapshot artefact, outside Home Assistant.
+
+Races the same data sources as the integration, parses the newest release once and
+writes it as a snapshot artefact (see artefact) that installs load with the
+"artefacto" data source instead of downloading, extracting and parsing it themselves:
+
+    cd custom_components
+    python -m hass_tarifarios_eletricidade_pt.build -o tarifarios.snapshot
+    python -m hass_tarifarios_eletricidade_pt.build --fontes local --local ../data
+
+Home Assistant must be installed (for the HTTP session), not running.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from homeassistant.core import HomeAssistant
+
+from .artefact import write_artefact
+from .catalogue import Catalogue
+from .const import DEFAULT_SOURCES, SOURCE_OPTIONS
+from .data_loader import parse_tables, snapshot_from_tables
+from .snapshot import payload_digest
+from .sources import async_race_sources, build_sources, read_release
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_OUTPUT = "tarifarios.snapshot"
+
+
+def build_artefact(release, output: str) -> dict:
+    """Read and parse a raced release and write its artefact; return the manifest. Blocking."""
+    start = time.perf_counter()
+    read_release(release)
+    cond_columns, precos_columns = parse_tables(release.cond_txt, release.precos_txt)
+    # Same hash as the snapshot an install would parse from this release
+    digest = payload_digest(release.cond_txt, release.precos_txt)
+    snapshot = snapshot_from_tables(cond_columns, precos_columns, digest, "lite")
+    if snapshot.empty:
+        raise ValueError(f"Release from {release.url} has no offers")
+    catalogue = Catalogue.from_snapshot(snapshot)
+    manifest = write_artefact(
+        output, snapshot.hash, {"cond": cond_columns, "precos": precos_columns}, catalogue.as_dict(),
+        {
+            "source": release.source,
+            "url": release.url,
+            "date": release.release_date.isoformat() if release.release_date else None,
+        },
+    )
+    _LOGGER.info(
+        "Built %s: snapshot %s, %d offers, %d rows, in %.2fs",
+        output, snapshot.hash[:12], len(catalogue.offers), len(snapshot.merged), time.perf_counter() - start,
+    )
+    return manifest
+
+
+async def async_build(output: str, fontes: list[str], caminho_local: str | None = None) -> dict:
+    """Race the sources for the newest release and write its artefact to output."""
+    with tempfile.TemporaryDirectory() as config_dir:
+        # A bare core for the HTTP session and the sources' statistics; nothing is set up
+        hass = HomeAssistant(config_dir)
+        try:
+            local = os.path.abspath(caminho_local) if caminho_local else None
+            release = await async_race_sources(hass, build_sources(hass, fontes, local))
+            return await asyncio.to_thread(build_artefact, release, output)
+        finally:
+            await hass.async_stop(force=True)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m hass_tarifarios_eletricidade_pt.build",
+        description="Download and parse the newest ERSE release into a snapshot artefact.",
+    )
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help=f"artefact file (default {DEFAULT_OUTPUT})")
+    parser.add_argument(
+        "--fontes", nargs="+", default=[*DEFAULT_SOURCES, "github"],
+        choices=[s for s in SOURCE_OPTIONS if s != "artefacto"], help="data sources to race (default erse github)",
+    )
+    parser.add_argument("--local", help="folder or ZIP of the local source")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+
+    try:
+        manifest = asyncio.run(async_build(args.output, args.fontes, args.local))
+    except Exception as e:
+        _LOGGER.error("Build failed: %s", e)
+        return 1
+    release = manifest["release"]
+    print(f"{args.output}: snapshot {manifest['hash']} of the {release['source']} release of {release['date']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
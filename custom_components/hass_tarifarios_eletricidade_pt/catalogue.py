@@ -0,0 +1,172 @@
+"""Lightweight catalogue of the offers in a snapshot, persisted for the config flow."""
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timezone
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+from .consumption import CONSUMPTION_COLUMNS, ConsumptionIndex, consumption_fuel
+from .search import SearchIndex
+from .snapshot import CODE_COL, COMERCIALIZADOR_COL, NAME_COL, TariffSnapshot, column_values, float_values, text_value
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_KEY = f"{DOMAIN}.catalogue"
+STORAGE_VERSION = 1
+# Key of the in-memory catalogue in hass.data[DOMAIN]
+DATA_CATALOGUE = "catalogue"
+
+FORNECIMENTO_COL = "Tipo de energia - Eletricidade | Gás Natural | Dual"
+POT_COL = "Potência contratada"
+
+
+def matches_energy_type(fornecimento: str | None, energy_type: str) -> bool:
+    """Same selection rules as the energy type filter of filter_snapshot."""
+    value = (fornecimento or "").strip().upper()
+    if energy_type == "ele":
+        return value.startswith("ELE")
+    if energy_type == "gn":
+        return value.startswith("GN")
+    if energy_type == "dual":
+        return value in ("ELE", "DUAL")
+    return True
+
+
+def _pot_sort_key(pot: str) -> float:
+    try:
+        return float(pot.replace(",", "."))
+    except ValueError:
+        return float("inf")
+
+
+class Catalogue:
+    """Comercializadores, offer codes and names, energy types and potências of a snapshot."""
+
+    def __init__(self, snapshot_hash: str, offers: list[dict], built_at: str | None = None):
+        self.snapshot_hash = snapshot_hash
+        self.offers = offers
+        self.built_at = built_at or datetime.now(timezone.utc).isoformat()
+        self._consumption: dict[str, ConsumptionIndex] = {}
+        self._search: SearchIndex | None = None
+
+    @classmethod
+    def from_snapshot(cls, snapshot: TariffSnapshot) -> "Catalogue":
+        """Build the catalogue from the merged frame (either engine). Blocking."""
+        merged = snapshot.merged
+        if merged.empty or CODE_COL not in merged.columns:
+            return cls(snapshot.hash, [])
+
+        codes = column_values(merged, CODE_COL)
+        names = column_values(merged, NAME_COL)
+        comercializadores = column_values(merged, COMERCIALIZADOR_COL)
+        fornecimentos = column_values(merged, FORNECIMENTO_COL)
+        pots = column_values(merged, POT_COL)
+        # Consumption limits per fuel: (lower, upper) kWh/year lists, None = open
+        limits = {
+            fuel: [[None if v != v else v for v in float_values(merged, c).tolist()] for c in columns]
+            for fuel, columns in CONSUMPTION_COLUMNS.items()
+        }
+
+        potencias: dict[str, set] = {}
+        offers = []
+        for i, (code, name, com, fornec, pot) in enumerate(zip(codes, names, comercializadores, fornecimentos, pots)):
+            if code is None:
+                continue
+            code = str(code)
+            if code not in potencias:
+                potencias[code] = set()
+                offers.append({
+                    "codigo": code,
+                    "nome": text_value(name),
+                    "comercializador": text_value(com),
+                    "fornecimento": text_value(fornec).upper(),
+                    **{f"consumo_{fuel}": [lower[i], upper[i]] for fuel, (lower, upper) in limits.items()},
+                })
+            if text_value(pot):
+                potencias[code].add(text_value(pot))
+        for offer in offers:
+            offer["potencias"] = sorted(potencias[offer["codigo"]], key=_pot_sort_key)
+        offers.sort(key=lambda o: (o["comercializador"], o["codigo"]))
+        _LOGGER.debug("Built catalogue with %d offers for snapshot %s", len(offers), snapshot.hash[:12])
+        return cls(snapshot.hash, offers)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Catalogue":
+        return cls(data["snapshot_hash"], data["offers"], data.get("built_at"))
+
+    def as_dict(self) -> dict:
+        return {"snapshot_hash": self.snapshot_hash, "built_at": self.built_at, "offers": self.offers}
+
+    def consumption(self, fuel: str = "ele") -> ConsumptionIndex:
+        """Range index of the offers' consumption limits (open for catalogues stored without them)."""
+        index = self._consumption.get(fuel)
+        if index is None:
+            import numpy as np
+
+            bounds = [o.get(f"consumo_{fuel}") or (None, None) for o in self.offers]
+            lower, upper = (
+                np.array([np.nan if b[side] is None else b[side] for b in bounds], dtype=float) for side in (0, 1)
+            )
+            index = self._consumption[fuel] = ConsumptionIndex(lower, upper)
+        return index
+
+    @property
+    def search_index(self) -> SearchIndex:
+        """Accent-insensitive prefix index of the offer names, codes and comercializadores."""
+        if self._search is None:
+            self._search = SearchIndex(self.offers)
+        return self._search
+
+    def offers_for(self, comercializador: str | None = None, energy_type: str = "all", consumo_anual: float | None = None,
+                   pesquisa: str | None = None) -> list[dict]:
+        """Offers of a comercializador and energy type, eligible for `consumo_anual` kWh and matching `pesquisa` when given."""
+        offers = self.offers
+        found = self.search_index.match(pesquisa) if pesquisa else None
+        positions = sorted(found) if found is not None else None
+        if positions is not None:
+            offers = [offers[i] for i in positions]
+        if consumo_anual is not None and offers:
+            fuel = consumption_fuel(energy_type)
+            mask = self.consumption(fuel).eligible_mask(float(consumo_anual)).tolist()
+            if positions is not None:
+                mask = [mask[i] for i in positions]
+            offers = [o for o, eligible in zip(offers, mask) if eligible]
+        return [
+            o for o in offers
+            if (not comercializador or o["comercializador"] == comercializador)
+            and matches_energy_type(o["fornecimento"], energy_type)
+        ]
+
+    def comercializadores(self, energy_type: str = "all", pesquisa: str | None = None) -> list[str]:
+        offers = self.offers_for(energy_type=energy_type, pesquisa=pesquisa)
+        return sorted({o["comercializador"] for o in offers if o["comercializador"]})
+
+    def comercializador_labels(self, energy_type: str = "all", pesquisa: str | None = None) -> dict[str, str]:
+        """Comercializador -> "name (n offers)", of the offers matching `pesquisa` when given."""
+        counts: dict[str, int] = {}
+        for o in self.offers_for(energy_type=energy_type, pesquisa=pesquisa):
+            if o["comercializador"]:
+                counts[o["comercializador"]] = counts.get(o["comercializador"], 0) + 1
+        return {com: f"{com} ({n} oferta{'' if n == 1 else 's'})" for com, n in sorted(counts.items())}
+
+    def offer_codes(self, comercializador: str, energy_type: str = "ele") -> list[str]:
+        return sorted(o["codigo"] for o in self.offers_for(comercializador, energy_type))
+
+    def offer_labels(self, comercializador: str, energy_type: str = "ele", consumo_anual: float | None = None,
+                     pesquisa: str | None = None) -> dict[str, str]:
+        """Offer code -> "code - name", for labelled config flow options."""
+        return {
+            o["codigo"]: f"{o['codigo']} - {o['nome']}" if o["nome"] else o["codigo"]
+            for o in sorted(self.offers_for(comercializador, energy_type, consumo_anual, pesquisa), key=lambda o: o["codigo"])
+        }
+
+    def potencias(self, comercializador: str | None = None, energy_type: str = "all") -> list[str]:
+        pots = {p for o in self.offers_for(comercializador, energy_type) for p in o["potencias"]}
+        return sorted(pots, key=_pot_sort_key)
+
+
+def catalogue_store(hass: HomeAssistant) -> Store:
+    return Store(hass, STORAGE_VERSION, STORAGE_KEY)
@@ -1,16 +1,83 @@
 import voluptuous as vol
 import logging
+import os
 from homeassistant import config_entries
-from homeassistant.helpers import config_validation as cv
-from .const import DOMAIN, ENERGY_TYPE_OPTIONS
-from .data_loader import async_get_comercializadores, async_get_offer_codes_for_comercializador
+from homeassistant.core import callback
+from homeassistant.helpers import config_validation as cv, selector
+from .const import (
+    CICLO_OPTIONS,
+    CONTAGEM_OPTIONS,
+    DEFAULT_CICLO,
+    DEFAULT_CONSUMO_ANUAL,
+    DEFAULT_CONTAGEM,
+    DEFAULT_ENGINE,
+    DEFAULT_ESCALAO_GN,
+    DEFAULT_PRICE_TYPE,
+    DEFAULT_SENSOR_MODE,
+    DEFAULT_SOURCES,
+    DOMAIN,
+    ENERGY_TYPE_OPTIONS,
+    ENGINE_OPTIONS,
+    ESCALAO_GN_OPTIONS,
+    PRICE_TYPE_OPTIONS,
+    SENSOR_MODE_OPTIONS,
+    SOURCE_OPTIONS,
+)
+from .consumption import state_kwh
+from .data_loader import async_get_catalogue
+from .offer_filters import FLAG_FILTERS, offer_filters_from_config
+from .snapshot import pot_values
 
 _LOGGER = logging.getLogger(__name__)
 
-COND_COMERCIAIS_URL = "https://raw.githubusercontent.com/lui54lb3rt0/hass_tarifarios_eletricidade_PT/refs/heads/main/data/csv%5CCondComerciais.csv"
-PRECOS_ELEGN_URL = "https://raw.githubusercontent.com/lui54lb3rt0/hass_tarifarios_eletricidade_PT/refs/heads/main/data/csv%5CPrecos_ELEGN.csv"
-
 pot_cont_values = ["1,15", "2,3", "3,45", "4,6", "5,75", "6,9", "10,35", "13,8", "17,25", "20,7", "27,6", "34,5", "41,4"]  # Portuguese format with commas
+def _offer_filters_schema(config: dict) -> dict:
+    """Schema fields of the offer filters (loyalty, renewable, price type...)."""
+    fields = {
+        vol.Optional(key, default=bool(config.get(key, False))): bool
+        for key in FLAG_FILTERS
+    }
+    fields[vol.Optional("tipo_precos", default=config.get("tipo_precos", DEFAULT_PRICE_TYPE))] = vol.In(PRICE_TYPE_OPTIONS)
+    fields[vol.Optional("em_vigor", default=bool(config.get("em_vigor", False)))] = bool
+    return fields
+
+
+def _consumption_schema(config: dict) -> dict:
+    """Schema fields of the annual consumption: a value, or an energy sensor that reports it."""
+    return {
+        vol.Required("consumo_anual", default=config.get("consumo_anual", DEFAULT_CONSUMO_ANUAL)): vol.All(vol.Coerce(int), vol.Range(min=0)),
+        vol.Optional("consumo_sensor", description={"suggested_value": config.get("consumo_sensor")}): selector.EntitySelector(
+            selector.EntitySelectorConfig(domain="sensor", device_class="energy")
+        ),
+    }
+
+
+def _pot_cont_validator(potencias: list[str]):
+    """One or more potências of the list (one sensor per offer and potência when several)."""
+    return vol.All(cv.multi_select(potencias), vol.Length(min=1))
+
+
+def _new_search(user_input: dict, previous: str) -> str | None:
+    """Search text of a submitted form when it changed (the form is shown again, narrowed); else None."""
+    pesquisa = (user_input.get("pesquisa") or "").strip()
+    return None if pesquisa == previous else pesquisa
+
+
+def _narrowed(labels: dict[str, str], matching: dict[str, str], selected: list[str]) -> dict[str, str]:
+    """Labelled options of the matching offers, and of the selected ones so a new search keeps them."""
+    keep = set(matching).union(selected)
+    return {code: label for code, label in labels.items() if code in keep}
+
+
+def _annual_kwh(hass, config: dict) -> float:
+    """Annual consumption of a config: the sensor's reading when it has one, else the value."""
+    if config.get("consumo_sensor"):
+        kwh = state_kwh(hass.states.get(config["consumo_sensor"]))
+        if kwh is not None:
+            return kwh
+    return float(config.get("consumo_anual", DEFAULT_CONSUMO_ANUAL))
+
+
 codigo_oferta_list = ["COD_Proposta",
                     "TUR",
                     "CUR",
@@ -706,12 +773,23 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        """Return the options flow handler."""
+        return OptionsFlowHandler(config_entry)
+
     def __init__(self):
         """Initialize config flow."""
+        self._catalogue = None
         self._comercializadores = []
         self._selected_comercializador = None
         self._selected_energy_type = None
-        self._available_offer_codes = []
+        self._available_offer_codes = {}
+        self._available_potencias = []
+        # Search texts of the comercializador and offer steps
+        self._pesquisa = ""
+        self._pesquisa_ofertas = ""
 
     async def async_step_user(self, user_input=None):
         """Handle the initial step - select energy type and comercializador."""
@@ -719,16 +797,28 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         
         if not self._comercializadores:
             try:
-                self._comercializadores = await async_get_comercializadores(self.hass)
-                if not self._comercializadores:
-                    errors["base"] = "no_data"
+                self._catalogue = await async_get_catalogue(self.hass)
+                if self._catalogue is None:
+                    errors["base"] = "cannot_connect"
+                else:
+                    self._comercializadores = self._catalogue.comercializadores()
+                    if not self._comercializadores:
+                        errors["base"] = "no_data"
             except Exception:
                 errors["base"] = "cannot_connect"
 
-        if user_input is not None:
-            self._selected_comercializador = user_input["comercializador"]
-            self._selected_energy_type = user_input["energy_type"]
-            return await self.async_step_config()
+        if user_input is not None and not errors:
+            pesquisa = _new_search(user_input, self._pesquisa)
+            if pesquisa is not None:
+                self._pesquisa = pesquisa
+                if pesquisa and not self._catalogue.comercializadores(pesquisa=pesquisa):
+                    errors["pesquisa"] = "no_match"
+            elif user_input.get("comercializador"):
+                self._selected_comercializador = user_input["comercializador"]
+                self._selected_energy_type = user_input["energy_type"]
+                return await self.async_step_config()
+            else:
+                errors["comercializador"] = "no_selection"
 
         if errors.get("base"):
             return self.async_show_form(
@@ -737,10 +827,15 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 errors=errors,
             )
 
+        # Comercializadores with offers matching the search (name, code or comercializador)
+        labels = self._catalogue.comercializador_labels(pesquisa=self._pesquisa) or self._catalogue.comercializador_labels()
         schema = vol.Schema({
-            vol.Required("comercializador"): vol.In(self._comercializadores),
+            vol.Optional("pesquisa", description={"suggested_value": self._pesquisa}): cv.string,
+            vol.Optional("comercializador"): vol.In(labels),
             vol.Required("energy_type", default="ele"): vol.In(ENERGY_TYPE_OPTIONS),
         })
+        if user_input is not None:
+            schema = self.add_suggested_values_to_schema(schema, {"energy_type": user_input["energy_type"]})
 
         return self.async_show_form(
             step_id="user",
@@ -752,20 +847,37 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         """Handle the configuration step - select power and codes."""
         errors = {}
         
-        # Fetch offer codes for the selected comercializador and energy type if not already done
+        # Look up offer codes for the selected comercializador and energy type in the catalogue
         if not self._available_offer_codes and self._selected_comercializador and self._selected_energy_type:
             try:
-                self._available_offer_codes = await async_get_offer_codes_for_comercializador(
-                    self.hass, self._selected_comercializador, self._selected_energy_type
+                self._available_offer_codes = self._catalogue.offer_labels(
+                    self._selected_comercializador, self._selected_energy_type
+                )
+                self._available_potencias = self._catalogue.potencias(
+                    self._selected_comercializador, self._selected_energy_type
                 )
                 if not self._available_offer_codes:
                     _LOGGER.warning("No offer codes found for %s (%s)", self._selected_comercializador, self._selected_energy_type)
-                    self._available_offer_codes = []
             except Exception as e:
                 _LOGGER.error("Error fetching offer codes for %s (%s): %s", self._selected_comercializador, self._selected_energy_type, e)
                 errors["base"] = "cannot_connect"
 
-        if user_input is not None:
+        searching = False
+        if user_input is not None and self._available_offer_codes:
+            pesquisa = _new_search(user_input, self._pesquisa_ofertas)
+            if pesquisa is not None:
+                searching = True
+                self._pesquisa_ofertas = pesquisa
+
+        if user_input is not None and self._available_offer_codes and not searching:
+            # Offers whose ConsIni/ConsFim limits exclude the household's consumption
+            eligible = self._catalogue.offer_labels(
+                self._selected_comercializador, self._selected_energy_type, _annual_kwh(self.hass, user_input)
+            )
+            if any(c not in eligible for c in user_input.get("codigos_oferta") or []):
+                errors["codigos_oferta"] = "not_eligible"
+
+        if user_input is not None and not errors and not searching:
             # Create unique entry ID based on comercializador and timestamp
             unique_id = f"{self._selected_comercializador}_{int(self.hass.loop.time())}"
             await self.async_set_unique_id(unique_id)
@@ -777,20 +889,50 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     "comercializador": self._selected_comercializador,
                     "pot_cont": user_input.get("pot_cont"),
                     "codigos_oferta": user_input.get("codigos_oferta"),
-                    "energy_type": self._selected_energy_type
+                    "energy_type": self._selected_energy_type,
+                    "contagem": user_input.get("contagem", DEFAULT_CONTAGEM),
+                    "ciclo": user_input.get("ciclo", DEFAULT_CICLO),
+                    "consumo_anual": user_input.get("consumo_anual", DEFAULT_CONSUMO_ANUAL),
+                    "consumo_sensor": user_input.get("consumo_sensor"),
+                    "escalao_gn": user_input.get("escalao_gn", DEFAULT_ESCALAO_GN),
+                    "modo_sensores": user_input.get("modo_sensores", DEFAULT_SENSOR_MODE),
+                    **offer_filters_from_config(user_input),
                 },
             )
 
         # Create schema with available offer codes for this comercializador
+        potencias = self._available_potencias or pot_cont_values
         schema_dict = {
-            vol.Required("pot_cont", default=pot_cont_values[0]): vol.In(pot_cont_values),
+            vol.Required("pot_cont", default=[potencias[0]]): _pot_cont_validator(potencias),
+            vol.Required("contagem", default=DEFAULT_CONTAGEM): vol.In(CONTAGEM_OPTIONS),
+            vol.Required("ciclo", default=DEFAULT_CICLO): vol.In(CICLO_OPTIONS),
+            **_consumption_schema({}),
+            **_offer_filters_schema({}),
         }
+        if self._selected_energy_type != "ele":
+            schema_dict[vol.Required("escalao_gn", default=DEFAULT_ESCALAO_GN)] = vol.In(ESCALAO_GN_OPTIONS)
         
         # Only add codigos_oferta if we have codes available
         if self._available_offer_codes:
-            schema_dict[vol.Optional("codigos_oferta", default=[])] = cv.multi_select(self._available_offer_codes)
+            offers = self._available_offer_codes
+            if self._pesquisa_ofertas:
+                matching = self._catalogue.offer_labels(
+                    self._selected_comercializador, self._selected_energy_type, pesquisa=self._pesquisa_ofertas
+                )
+                if not matching:
+                    errors["pesquisa"] = "no_match"
+                selected = (user_input or {}).get("codigos_oferta") or []
+                offers = _narrowed(offers, matching, selected) or offers
+            schema_dict[vol.Optional("pesquisa", description={"suggested_value": self._pesquisa_ofertas})] = cv.string
+            schema_dict[vol.Optional("codigos_oferta", default=[])] = cv.multi_select(offers)
+        schema_dict[vol.Required("modo_sensores", default=DEFAULT_SENSOR_MODE)] = vol.In(SENSOR_MODE_OPTIONS)
         
         schema = vol.Schema(schema_dict)
+        if searching:
+            # Keep what was entered besides the search
+            schema = self.add_suggested_values_to_schema(
+                schema, {k: v for k, v in user_input.items() if k != "pesquisa"}
+            )
 
         return self.async_show_form(
             step_id="config",
@@ -800,4 +942,126 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 "energy_type": ENERGY_TYPE_OPTIONS[self._selected_energy_type]
             },
             errors=errors,
-        )
\ No newline at end of file
+        )
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Change power, energy type and offers of an entry without re-creating it."""
+
+    def __init__(self, config_entry):
+        """Initialize options flow."""
+        self._entry = config_entry
+        self._catalogue = None
+        self._options = {}
+        self._pesquisa_ofertas = ""
+
+    @property
+    def _config(self) -> dict:
+        return {**self._entry.data, **self._entry.options}
+
+    async def async_step_init(self, user_input=None):
+        """Select energy type and power."""
+        errors = {}
+        comercializador = self._config.get("comercializador")
+
+        if self._catalogue is None:
+            try:
+                self._catalogue = await async_get_catalogue(self.hass)
+            except Exception as e:
+                _LOGGER.error("Error loading catalogue for options: %s", e)
+            if self._catalogue is None:
+                errors["base"] = "cannot_connect"
+
+        if user_input is not None and not errors:
+            caminho = user_input.get("caminho_local")
+            artefacto = user_input.get("artefacto")
+            if caminho and not await self.hass.async_add_executor_job(os.path.exists, self.hass.config.path(caminho)):
+                errors["caminho_local"] = "invalid_path"
+            elif "artefacto" in user_input["fontes"] and not artefacto:
+                errors["artefacto"] = "artefact_required"
+            elif (
+                artefacto and not artefacto.startswith(("http://", "https://"))
+                and not await self.hass.async_add_executor_job(os.path.isfile, self.hass.config.path(artefacto))
+            ):
+                errors["artefacto"] = "invalid_path"
+            else:
+                self._options.update(user_input)
+                # A cleared path is left out of user_input
+                self._options["caminho_local"] = caminho
+                self._options["artefacto"] = artefacto
+                return await self.async_step_filters()
+
+        potencias = (self._catalogue.potencias(comercializador) if self._catalogue else []) or pot_cont_values
+        current_pots = [p for p in pot_values(self._config.get("pot_cont")) if p in potencias] or [potencias[0]]
+        schema = vol.Schema({
+            vol.Required("energy_type", default=self._config.get("energy_type", "ele")): vol.In(ENERGY_TYPE_OPTIONS),
+            vol.Required("pot_cont", default=current_pots): _pot_cont_validator(potencias),
+            vol.Required("escalao_gn", default=self._config.get("escalao_gn", DEFAULT_ESCALAO_GN)): vol.In(ESCALAO_GN_OPTIONS),
+            vol.Required("engine", default=self._config.get("engine", DEFAULT_ENGINE)): vol.In(ENGINE_OPTIONS),
+            vol.Required("fontes", default=self._config.get("fontes") or DEFAULT_SOURCES): vol.All(
+                cv.multi_select(SOURCE_OPTIONS), vol.Length(min=1)
+            ),
+            vol.Optional("caminho_local", description={"suggested_value": self._config.get("caminho_local")}): cv.string,
+            vol.Optional("artefacto", description={"suggested_value": self._config.get("artefacto")}): cv.string,
+        })
+        return self.async_show_form(
+            step_id="init",
+            data_schema=schema,
+            description_placeholders={"comercializador": comercializador},
+            errors=errors,
+        )
+
+    async def async_step_filters(self, user_input=None):
+        """Select the annual consumption and the offer filters (loyalty, renewable, price type...)."""
+        if user_input is not None:
+            self._options.update(user_input)
+            # A cleared selector is left out of user_input
+            self._options["consumo_sensor"] = user_input.get("consumo_sensor")
+            return await self.async_step_offers()
+
+        return self.async_show_form(
+            step_id="filters",
+            data_schema=vol.Schema({**_consumption_schema(self._config), **_offer_filters_schema(self._config)}),
+            description_placeholders={"comercializador": self._config.get("comercializador")},
+        )
+
+    async def async_step_offers(self, user_input=None):
+        """Select the offers for the chosen energy type, eligible for the annual consumption."""
+        comercializador = self._config.get("comercializador")
+        labels = self._catalogue.offer_labels(
+            comercializador, self._options["energy_type"], _annual_kwh(self.hass, {**self._config, **self._options})
+        )
+
+        errors = {}
+        pesquisa = None if user_input is None else _new_search(user_input, self._pesquisa_ofertas)
+        if user_input is not None and pesquisa is None:
+            self._options["codigos_oferta"] = user_input.get("codigos_oferta", [])
+            self._options["modo_sensores"] = user_input.get("modo_sensores", DEFAULT_SENSOR_MODE)
+            return self.async_create_entry(title="", data=self._options)
+
+        current = [c for c in (self._config.get("codigos_oferta") or []) if c in labels]
+        selected = current if user_input is None else user_input.get("codigos_oferta") or []
+        offers = labels
+        if pesquisa is not None:
+            self._pesquisa_ofertas = pesquisa
+        if self._pesquisa_ofertas:
+            matching = self._catalogue.offer_labels(comercializador, self._options["energy_type"], pesquisa=self._pesquisa_ofertas)
+            if not matching:
+                errors["pesquisa"] = "no_match"
+            offers = _narrowed(labels, matching, selected) or labels
+        schema = vol.Schema({
+            vol.Optional("pesquisa", description={"suggested_value": self._pesquisa_ofertas}): cv.string,
+            vol.Optional("codigos_oferta", default=current): cv.multi_select(offers),
+            vol.Required("modo_sensores", default=self._config.get("modo_sensores", DEFAULT_SENSOR_MODE)): vol.In(SENSOR_MODE_OPTIONS),
+        })
+        if user_input is not None:
+            # Keep what was entered besides the search
+            schema = self.add_suggested_values_to_schema(
+                schema, {k: v for k, v in user_input.items() if k != "pesquisa"}
+            )
+        return self.async_show_form(
+            step_id="offers",
+            data_schema=schema,
+            description_placeholders={"comercializador": comercializador},
+            errors=errors,
+        )
@@ -12,6 +12,74 @@ ENERGY_TYPE_OPTIONS = {
     "all": "Todos os tipos"
 }
 
+# Metering cycle options (Ciclo de contagem)
+CONTAGEM_OPTIONS = {
+    "1": "Simples",
+    "2": "Bi-horária",
+    "3": "Tri-horária",
+}
+
+# Natural gas consumption tiers (Escalão de consumo) of the ERSE prices
+ESCALAO_GN_OPTIONS = {
+    "1": "Escalão 1 (até 220 m³/ano)",
+    "2": "Escalão 2 (221 a 500 m³/ano)",
+    "3": "Escalão 3 (501 a 1 000 m³/ano)",
+    "4": "Escalão 4 (1 001 a 10 000 m³/ano)",
+}
+
+# Daily or weekly ERSE cycle for bi-horária and tri-horária
+CICLO_OPTIONS = {
+    "diario": "Ciclo diário",
+    "semanal": "Ciclo semanal",
+}
+
+# Price type filter: all offers, fixed prices only or indexed prices only
+PRICE_TYPE_OPTIONS = {
+    "todos": "Todos",
+    "fixos": "Preços fixos",
+    "indexados": "Preços indexados",
+}
+
+# Data engines: pandas DataFrames, or the stdlib csv/array engine for constrained hosts
+ENGINE_OPTIONS = {
+    "pandas": "pandas",
+    "lite": "Leve (sem pandas)",
+}
+
+# Sensor mode: one sensor per offer, or a few summary sensors for large catalogues
+SENSOR_MODE_OPTIONS = {
+    "ofertas": "Um sensor por oferta",
+    "catalogo": "Catálogo (sensores agregados)",
+}
+
+# Data sources of the ERSE files, raced for the newest release (see sources)
+SOURCE_OPTIONS = {
+    "erse": "ERSE (simulador)",
+    "github": "Espelho GitHub",
+    "local": "Pasta ou ZIP local",
+    "artefacto": "Artefacto pré-processado (caminho ou URL)",
+}
+
+# Share of the annual consumption billed at each energy term, per metering cycle.
+# Order: Simples | Fora de Vazio | Ponta, then Vazio | Cheias, then Vazio (tri-horária)
+CONSUMPTION_PROFILES = {
+    "1": (1.0, 0.0, 0.0),
+    "2": (0.65, 0.35, 0.0),
+    "3": (0.20, 0.45, 0.35),
+}
+
+DEFAULT_CONTAGEM = "1"
+DEFAULT_CICLO = "diario"
+DEFAULT_ESCALAO_GN = "1"
+DEFAULT_ENGINE = "pandas"
+DEFAULT_PRICE_TYPE = "todos"
+DEFAULT_SENSOR_MODE = "ofertas"
+DEFAULT_SOURCES = ["erse"]
+# Local source directory under the configuration directory, unless an entry sets another
+LOCAL_DATA_DIR = "tarifarios_data"
+DEFAULT_CONSUMO_ANUAL = 2500  # kWh/year
+CHEAPEST_OFFERS_COUNT = 5
+
 def get_version():
     """Get version from manifest.json."""
     try:
@@ -0,0 +1,105 @@
+"""Range index over the offers' annual consumption limits (ConsIni / ConsFim).
+
+Some offers only apply to households whose annual consumption lies within a range,
+per fuel (ConsIni_ELE..ConsFim_ELE, ConsIni_GN..ConsFim_GN, in kWh/year). The
+distinct limits split the consumption axis into regions where the set of eligible
+offers is constant: each limit value is a region of its own, and so is every open
+interval between two limits. A consumption is mapped to its region with one binary
+search and the region's mask is computed once, so repeated lookups (every ranking,
+every config flow step) never scan the rows.
+
+Both limits are inclusive; a missing limit leaves that side of the range open.
+"""
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+_LOGGER = logging.getLogger(__name__)
+
+CONS_INI_ELE_COL = "Limitações da oferta - Consumo inicial (Eletricidade)"
+CONS_FIM_ELE_COL = "Limitações da oferta - Consumo final (Eletricidade)"
+CONS_INI_GN_COL = "Limitações da oferta - Consumo inicial (Gás Natural)"
+CONS_FIM_GN_COL = "Limitações da oferta - Consumo final (Gás Natural)"
+
+# (lower, upper) limit columns per fuel
+CONSUMPTION_COLUMNS = {
+    "ele": (CONS_INI_ELE_COL, CONS_FIM_ELE_COL),
+    "gn": (CONS_INI_GN_COL, CONS_FIM_GN_COL),
+}
+# Unit of an energy sensor's state -> factor to kWh
+ENERGY_UNITS = {"Wh": 0.001, "kWh": 1.0, "MWh": 1000.0}
+
+
+def consumption_fuel(energy_type: str) -> str:
+    """Fuel whose limits apply to an entry's configured consumption (electricity unless gas only)."""
+    return "gn" if energy_type == "gn" else "ele"
+
+
+class ConsumptionIndex:
+    """Offers eligible for an annual consumption, by binary search over the distinct limits."""
+
+    def __init__(self, lower: np.ndarray, upper: np.ndarray):
+        import numpy as np
+
+        self.lower = lower
+        self.upper = upper
+        self._open_lower = np.isnan(lower)
+        self._open_upper = np.isnan(upper)
+        self.limits = np.unique(np.concatenate([lower[~self._open_lower], upper[~self._open_upper]]))
+        # Eligibility mask per region, computed on first use
+        self._masks: dict[int, np.ndarray] = {}
+        _LOGGER.debug("Consumption index: %d offers, %d distinct limits", len(lower), len(self.limits))
+
+    def region(self, kwh: float) -> int:
+        """Region of `kwh`: 2k below limits[k] (and above limits[k - 1]), 2k + 1 on limits[k]."""
+        import numpy as np
+
+        k = int(np.searchsorted(self.limits, kwh, side="left"))
+        if k < len(self.limits) and self.limits[k] == kwh:
+            return 2 * k + 1
+        return 2 * k
+
+    def _representative(self, region: int) -> float:
+        """A consumption inside `region`, to evaluate its mask."""
+        k, on_limit = divmod(region, 2)
+        limits = self.limits
+        if on_limit:
+            return float(limits[k])
+        if not len(limits):
+            return 0.0
+        if k == 0:
+            return float(limits[0]) - 1.0
+        if k == len(limits):
+            return float(limits[-1]) + 1.0
+        return (float(limits[k - 1]) + float(limits[k])) / 2
+
+    def eligible_mask(self, kwh: float) -> np.ndarray:
+        """Boolean array of the offers whose range contains `kwh` (shared, do not modify)."""
+        region = self.region(kwh)
+        mask = self._masks.get(region)
+        if mask is None:
+            x = self._representative(region)
+            mask = self._masks[region] = (
+                (self._open_lower | (self.lower <= x)) & (self._open_upper | (x <= self.upper))
+            )
+        return mask
+
+
+def state_kwh(state) -> float | None:
+    """kWh of an energy sensor state, None when unavailable, non-numeric or not energy."""
+    if state is None:
+        return None
+    factor = ENERGY_UNITS.get(state.attributes.get("unit_of_measurement", "kWh"))
+    if factor is None:
+        return None
+    try:
+        value = float(state.state) * factor
+    except (TypeError, ValueError):
+        return None
+    if value != value or value < 0:
+        return None
+    return value
@@ -1,17 +1,46 @@
+"""Parsing, merging and filtering of the ERSE CSVs, and the data update coordinator.
+
+pandas is only imported inside the blocking helpers, which always run in executor
+jobs, so loading the integration does not pay for it on Home Assistant startup.
+"""
+from __future__ import annotations
+
 import asyncio
+import importlib.util
 import logging
-from datetime import timedelta
+import time
+from datetime import datetime, time as dt_time, timedelta, timezone
 from io import StringIO
-import pandas as pd
-from homeassistant.core import HomeAssistant
+from typing import TYPE_CHECKING
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_point_in_time, async_track_state_change_event
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
-from .downloader import async_download_and_extract_csvs
+from .archive import async_archive_snapshot, get_archive, release_date_from_url
+from .catalogue import DATA_CATALOGUE, Catalogue, catalogue_store
+from .const import DEFAULT_CONSUMO_ANUAL, DEFAULT_CONTAGEM, DEFAULT_ENGINE, DEFAULT_ESCALAO_GN, DOMAIN
+from .consumption import state_kwh
+from .events import async_fire_price_events, diff_price_tables
+from .offer_filters import compile_filters
+from .offer_summary import OfferSummary, build_offer_summary
+from .scheduler import FULL_REFRESH_MAX_AGE, PROBE_INTERVAL, PublicationSchedule, async_get_schedule, is_newer_release
+from .sources import async_race_sources, build_sources, read_release
+from .snapshot import CODE_COL, ELE_PRICES, GN_PRICES, PRICE_FIELDS, TariffSnapshot, column_values, get_snapshot_cache, normalize_pot, payload_digest, pot_values
+from .stats import get_stats
+from .tariff_periods import LISBON_TZ
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 _LOGGER = logging.getLogger(__name__)
 
 CODE_COLS = ["Código da oferta comercial", "COD_Proposta", "CODProposta"]
 POT_COLS  = ["Potência contratada", "Pot_Cont"]
-FORNECIMENTO_COLS = ["Fornecimento", "fornecimento"]
+FORNECIMENTO_COLS = ["Tipo de energia - Eletricidade | Gás Natural | Dual", "Fornecimento", "fornecimento"]
+
+# A persisted catalogue older than this is rebuilt when no entry refreshed it
+CATALOGUE_MAX_AGE = timedelta(days=7)
+# Change of the consumption sensor (kWh/year) that re-ranks the offers
+CONSUMPTION_STEP = 10.0
 
 # Header mapping from codes to descriptive names
 HEADER_MAPPING = {
@@ -121,22 +150,64 @@ def _apply_header_mapping(df: pd.DataFrame) -> pd.DataFrame:
     return df_mapped
 
 
+async def async_get_catalogue(hass: HomeAssistant) -> Catalogue | None:
+    """Return the offers catalogue: in memory, else persisted, else built from a fresh download."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    stats = get_stats(hass)
+    catalogue = domain_data.get(DATA_CATALOGUE)
+    if catalogue is not None:
+        stats.count("catalogue_memory_hit")
+        return catalogue
+
+    try:
+        stored = await catalogue_store(hass).async_load()
+    except Exception as e:
+        _LOGGER.debug("Could not load stored catalogue: %s", e)
+        stored = None
+    if stored:
+        catalogue = Catalogue.from_dict(stored)
+        built_at = datetime.fromisoformat(catalogue.built_at)
+        if datetime.now(timezone.utc) - built_at <= CATALOGUE_MAX_AGE:
+            _LOGGER.debug("Using stored catalogue built at %s", catalogue.built_at)
+            stats.count("catalogue_store_hit")
+            domain_data[DATA_CATALOGUE] = catalogue
+            return catalogue
+
+    stats.count("catalogue_miss")
+    snapshot = await async_load_snapshot(hass)
+    if snapshot is None or snapshot.empty:
+        return catalogue
+    return await async_update_catalogue(hass, snapshot)
+
+
+async def async_update_catalogue(hass: HomeAssistant, snapshot: TariffSnapshot) -> Catalogue:
+    """Rebuild and persist the catalogue, once per snapshot."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    catalogue = domain_data.get(DATA_CATALOGUE)
+    if catalogue is not None and catalogue.snapshot_hash == snapshot.hash:
+        get_stats(hass).count("catalogue_rebuild_skipped")
+        return catalogue
+
+    prebuilt = snapshot.prebuilt_catalogue
+    if prebuilt is not None and prebuilt.get("snapshot_hash") == snapshot.hash:
+        get_stats(hass).count("catalogue_prebuilt")
+        catalogue = Catalogue.from_dict(prebuilt)
+    else:
+        get_stats(hass).count("catalogue_rebuild")
+        catalogue = await asyncio.to_thread(Catalogue.from_snapshot, snapshot)
+    domain_data[DATA_CATALOGUE] = catalogue
+    await catalogue_store(hass).async_save(catalogue.as_dict())
+    return catalogue
+
+
 async def async_get_comercializadores(hass: HomeAssistant) -> list[str]:
     """Get list of available comercializadores from the data."""
     try:
-        df = await async_process_csv(hass, codigos_oferta=None)
-        if df.empty:
+        catalogue = await async_get_catalogue(hass)
+        if catalogue is None:
             _LOGGER.warning("No data available to extract comercializadores")
             return []
-        
-        # Look for the comercializador column (mapped name)
-        comercializador_col = "Comercializador"
-        if comercializador_col not in df.columns:
-            _LOGGER.warning("Comercializador column not found in data")
-            return []
-        
-        # Get unique comercializadores, sorted
-        comercializadores = sorted(df[comercializador_col].dropna().unique().tolist())
+        comercializadores = catalogue.comercializadores()
         _LOGGER.debug("Found %d comercializadores: %s", len(comercializadores), comercializadores)
         return comercializadores
     
@@ -148,19 +219,11 @@ async def async_get_comercializadores(hass: HomeAssistant) -> list[str]:
 async def async_get_offer_codes_for_comercializador(hass: HomeAssistant, comercializador: str, energy_type: str = "ele") -> list[str]:
     """Get list of offer codes available for a specific comercializador and energy type."""
     try:
-        df = await async_process_csv(hass, comercializador=comercializador, energy_type=energy_type)
-        if df.empty:
+        catalogue = await async_get_catalogue(hass)
+        if catalogue is None:
             _LOGGER.warning("No data available for comercializador %s with energy type %s", comercializador, energy_type)
             return []
-        
-        # Look for the offer code column (mapped name)
-        code_col = next((c for c in CODE_COLS if c in df.columns), None)
-        if not code_col:
-            _LOGGER.warning("Offer code column not found in data")
-            return []
-        
-        # Get unique offer codes, sorted
-        offer_codes = sorted(df[code_col].dropna().unique().tolist())
+        offer_codes = catalogue.offer_codes(comercializador, energy_type)
         _LOGGER.debug("Found %d offer codes for %s (%s): %s", len(offer_codes), comercializador, energy_type, offer_codes)
         return offer_codes
     
@@ -168,11 +231,26 @@ async def async_get_offer_codes_for_comercializador(hass: HomeAssistant, comerci
         _LOGGER.error("Error extracting offer codes for %s (%s): %s", comercializador, energy_type, e)
         return []
 
-async def _async_read(csv_text: str, label: str) -> pd.DataFrame:
+def resolve_engine(engine: str | None) -> str:
+    """Requested data engine, falling back to "lite" when pandas is not installed."""
+    if engine == "lite" or importlib.util.find_spec("pandas") is None:
+        return "lite"
+    return "pandas"
+
+
+def _empty_frame() -> pd.DataFrame:
+    import pandas as pd
+
+    return pd.DataFrame()
+
+
+def _read_csv(csv_text: str, label: str) -> pd.DataFrame:
+    import pandas as pd
+
     # Try ; then ,
     for sep in (";", ","):
         try:
-            df = await asyncio.to_thread(pd.read_csv, StringIO(csv_text), sep=sep, dtype=str, na_filter=True)
+            df = pd.read_csv(StringIO(csv_text), sep=sep, dtype=str, na_filter=True)
             if len(df.columns) > 1:
                 _LOGGER.debug("%s parsed sep='%s' rows=%d cols=%s", label, sep, len(df), list(df.columns))
                 return df
@@ -181,27 +259,29 @@ async def _async_read(csv_text: str, label: str) -> pd.DataFrame:
     _LOGGER.warning("%s empty/unparsable", label)
     return pd.DataFrame()
 
-async def async_process_csv(hass: HomeAssistant, codigos_oferta=None, comercializador=None, pot_cont=None, energy_type="ele") -> pd.DataFrame:
-    try:
-        # Use new downloader instead of GitHub URLs
-        _LOGGER.debug("Downloading and extracting CSV files from ERSE...")
-        cond_txt, precos_txt = await async_download_and_extract_csvs(hass)
-    except Exception as e:
-        _LOGGER.error("Download failure: %s", e)
-        return pd.DataFrame()
 
-    cond_df, precos_df = await asyncio.gather(
-        _async_read(cond_txt, "CondComerciais"),
-        _async_read(precos_txt, "Precos_ELEGN"),
-    )
+def build_snapshot(cond_txt: str, precos_txt: str, engine: str = DEFAULT_ENGINE) -> TariffSnapshot:
+    """Parse and merge both ERSE CSVs into an unfiltered snapshot. Blocking."""
+    digest = payload_digest(cond_txt, precos_txt)
+    if resolve_engine(engine) == "lite":
+        return _build_lite_snapshot(cond_txt, precos_txt, digest)
+
+    start = time.perf_counter()
+    cond_df = _read_csv(cond_txt, "CondComerciais")
+    precos_df = _read_csv(precos_txt, "Precos_ELEGN")
 
     # Apply header mapping to convert code headers to descriptive names
     cond_df = _apply_header_mapping(cond_df)
     precos_df = _apply_header_mapping(precos_df)
+    return _merge_snapshot(cond_df, precos_df, digest, time.perf_counter() - start)
 
+
+def _merge_snapshot(cond_df: pd.DataFrame, precos_df: pd.DataFrame, digest: str, parse_seconds: float) -> TariffSnapshot:
+    """Merge the parsed, header-mapped frames into a snapshot. Blocking."""
+    parsed = time.perf_counter()
     if cond_df.empty:
         _LOGGER.warning("CondComerciais DataFrame empty.")
-        return cond_df
+        return TariffSnapshot(cond_df, cond_df, digest)
 
     code_cond = next((c for c in CODE_COLS if c in cond_df.columns), None)
     code_prec = next((c for c in CODE_COLS if c in precos_df.columns), None)
@@ -224,6 +304,102 @@ async def async_process_csv(hass: HomeAssistant, codigos_oferta=None, comerciali
         if pot_col in merged.columns:
             merged[f"{pot_col}__norm"] = _normalize_pot_val(merged[pot_col])
 
+    snapshot = TariffSnapshot(cond_df, merged, digest)
+    snapshot.timings.update(parse=parse_seconds, merge=time.perf_counter() - parsed)
+    return snapshot
+
+
+def _build_lite_snapshot(cond_txt: str, precos_txt: str, digest: str) -> TariffSnapshot:
+    """build_snapshot on the pandas-free engine."""
+    from . import lite_engine
+
+    start = time.perf_counter()
+    cond = lite_engine.parse_csv(cond_txt, "CondComerciais", HEADER_MAPPING)
+    precos = lite_engine.parse_csv(precos_txt, "Precos_ELEGN", HEADER_MAPPING)
+    return _merge_lite_snapshot(cond, precos, digest, time.perf_counter() - start)
+
+
+def _merge_lite_snapshot(cond, precos, digest: str, parse_seconds: float) -> TariffSnapshot:
+    """_merge_snapshot on the pandas-free engine, from lite_engine.LiteTable tables."""
+    from . import lite_engine
+
+    parsed = time.perf_counter()
+    cond_df = lite_engine.table_frame(cond)
+    if cond_df.empty:
+        _LOGGER.warning("CondComerciais table empty.")
+        return TariffSnapshot(cond_df, cond_df, digest, engine="lite")
+
+    code_cond = next((c for c in CODE_COLS if c in cond.columns), None)
+    code_prec = next((c for c in CODE_COLS if c in precos.columns), None)
+
+    if not precos.nrows or not code_cond or not code_prec:
+        merged = cond_df
+        _LOGGER.debug("Skipping merge (precos empty or code col missing).")
+    else:
+        merged = lite_engine.merge_tables(cond, precos, code_cond, code_prec)
+        _LOGGER.debug("Merged rows=%d cols=%d", len(merged), len(merged.columns))
+
+    for pot_col in POT_COLS:
+        if pot_col in merged.columns:
+            merged = lite_engine.normalize_pot_column(merged, pot_col)
+
+    snapshot = TariffSnapshot(cond_df, merged, digest, engine="lite")
+    snapshot.timings.update(parse=parse_seconds, merge=time.perf_counter() - parsed)
+    return snapshot
+
+
+def parse_tables(cond_txt: str, precos_txt: str) -> tuple[dict[str, list], dict[str, list]]:
+    """Header-mapped text columns (None = missing) of both CSVs, for snapshot artefacts. Blocking."""
+    from . import lite_engine
+
+    cond = lite_engine.parse_csv(cond_txt, "CondComerciais", HEADER_MAPPING)
+    precos = lite_engine.parse_csv(precos_txt, "Precos_ELEGN", HEADER_MAPPING)
+    return cond.columns, precos.columns
+
+
+def snapshot_from_tables(cond_columns: dict[str, list], precos_columns: dict[str, list], digest: str,
+                         engine: str = DEFAULT_ENGINE) -> TariffSnapshot:
+    """Snapshot of already parsed tables (parse_tables): only the merge and indexes are left. Blocking."""
+    start = time.perf_counter()
+    if resolve_engine(engine) == "lite":
+        from . import lite_engine
+
+        cond, precos = lite_engine.make_table(cond_columns), lite_engine.make_table(precos_columns)
+        return _merge_lite_snapshot(cond, precos, digest, time.perf_counter() - start)
+
+    import pandas as pd
+
+    cond_df = pd.DataFrame(cond_columns, dtype=str)
+    precos_df = pd.DataFrame(precos_columns, dtype=str)
+    return _merge_snapshot(cond_df, precos_df, digest, time.perf_counter() - start)
+
+
+def _code_selection(snapshot: TariffSnapshot, codigos_oferta, offer_filters) -> set[str] | None:
+    """Offer codes to keep: the selected codes, intersected with the compiled offer filters.
+
+    None keeps every offer.
+    """
+    selection = {c.strip() for c in codigos_oferta if c and c.strip()} if codigos_oferta else None
+    predicates = compile_filters(offer_filters)
+    if not predicates or snapshot.cond_df.empty:
+        return selection
+    allowed = snapshot.offer_index.select(predicates)
+    return set(allowed) if selection is None else selection & allowed
+
+
+def filter_snapshot(snapshot: TariffSnapshot, codigos_oferta=None, comercializador=None, pot_cont=None, energy_type="ele", offer_filters=None) -> pd.DataFrame:
+    """Apply the entry filters to a snapshot and return the matching rows."""
+    merged = snapshot.merged
+    codes = _code_selection(snapshot, codigos_oferta, offer_filters)
+    if snapshot.engine == "lite":
+        from .lite_engine import filter_frame
+
+        fornec_col = next((c for c in FORNECIMENTO_COLS if c in merged.columns), None)
+        return filter_frame(snapshot.cond_df, merged, fornec_col, CODE_COLS,
+                            codes, comercializador, pot_cont, energy_type)
+    if snapshot.cond_df.empty:
+        return snapshot.cond_df
+
     # Filter by energy type (ELE, GN, Dual, or All)
     fornec_col = next((c for c in FORNECIMENTO_COLS if c in merged.columns), None)
     if fornec_col and energy_type != "all":
@@ -246,16 +422,15 @@ async def async_process_csv(hass: HomeAssistant, codigos_oferta=None, comerciali
         
         if merged.empty:
             _LOGGER.warning("All rows removed by energy type filter (%s). Keeping original (skipping filter).", energy_type)
-            merged = cond_df.copy()
+            merged = snapshot.cond_df.copy()
 
-    # Filter by selected codes
-    if codigos_oferta:
-        sel = {c.strip() for c in codigos_oferta if c and c.strip()}
+    # Filter by selected codes and offer filters, in one selection
+    if codes is not None:
         code_final = next((c for c in CODE_COLS if c in merged.columns), None)
         if code_final:
             before = len(merged)
-            merged = merged[merged[code_final].isin(sel)]
-            _LOGGER.debug("Codes filter (%d) %d -> %d", len(sel), before, len(merged))
+            merged = merged[merged[code_final].isin(codes)]
+            _LOGGER.debug("Codes filter (%d) %d -> %d", len(codes), before, len(merged))
         else:
             _LOGGER.warning("Code column not found for codes filter.")
 
@@ -269,7 +444,7 @@ async def async_process_csv(hass: HomeAssistant, codigos_oferta=None, comerciali
         else:
             _LOGGER.warning("Comercializador column not found for comercializador filter.")
 
-    # Filter by power capacity (pot_cont)
+    # Filter by power capacity (pot_cont: one potência or a list of them)
     if pot_cont:
         # Look for power columns (both original and normalized)
         pot_cols = ["Potência contratada", "Potência contratada__norm", "Pot_Cont", "Pot_Cont__norm"]
@@ -277,17 +452,17 @@ async def async_process_csv(hass: HomeAssistant, codigos_oferta=None, comerciali
         
         if pot_col:
             before = len(merged)
-            # Normalize both config value and data for comparison
-            pot_cont_normalized = str(pot_cont).replace(",", ".").strip()
+            # Normalize both config values and data for comparison
+            pots = {normalize_pot(p) for p in pot_values(pot_cont)}
             
             # Debug what we're looking for
             available_values = sorted(merged[pot_col].dropna().unique().tolist())
-            _LOGGER.debug("Power filter looking for: '%s' (normalized: '%s')", pot_cont, pot_cont_normalized)
+            _LOGGER.debug("Power filter looking for: '%s' (normalized: %s)", pot_cont, sorted(pots))
             _LOGGER.debug("Available power values: %s", available_values)
             
-            # Filter - handle both comma and dot formats in data
+            # Filter - handle both comma and dot formats in data, all potências in one selection
             merged_filtered = merged[
-                merged[pot_col].astype(str).str.replace(",", ".").str.strip() == pot_cont_normalized
+                merged[pot_col].astype(str).str.replace(",", ".").str.strip().isin(pots)
             ]
             
             if not merged_filtered.empty:
@@ -305,41 +480,431 @@ async def async_process_csv(hass: HomeAssistant, codigos_oferta=None, comerciali
     return merged
 
 
+async def async_load_snapshot(hass: HomeAssistant, engine: str = DEFAULT_ENGINE, url: str | None = None,
+                              fontes: list[str] | None = None, caminho_local: str | None = None,
+                              artefacto: str | None = None) -> TariffSnapshot | None:
+    """Race the data sources for the latest release (the ERSE one at url) and build an unfiltered snapshot.
+
+    A release with the payload of the latest snapshot of the engine returns that same
+    snapshot object, without extracting nor parsing anything.
+    """
+    stats = get_stats(hass)
+    cache = get_snapshot_cache(hass)
+    engine = resolve_engine(engine)
+    try:
+        _LOGGER.debug("Fetching the ERSE CSV files from the data sources...")
+        release = await async_race_sources(
+            hass, build_sources(hass, fontes, caminho_local, url, artefacto),
+            target_date=release_date_from_url(url), known=cache.keys(engine),
+        )
+    except Exception as e:
+        _LOGGER.error("Download failure: %s", e)
+        return None
+
+    _LOGGER.info("Using %s release from %s (released %s)", release.source, release.url, release.release_date)
+    if release.source != "erse":
+        stats.discovered(release.url, release.source)
+    stats.source = release.source
+    stats.release_date = release.release_date
+    stats.count(f"source_{release.source}")
+    stats.downloaded(zip=release.zip_size or 0)
+
+    async with cache.lock(engine):
+        snapshot = cache.get(engine, release.key)
+        if snapshot is None:
+            try:
+                digest = await asyncio.to_thread(_read_release_digest, release)
+            except Exception as e:
+                _LOGGER.error("Invalid %s release %s: %s", release.source, release.url, e)
+                return None
+            if release.artefact is None:
+                stats.downloaded(
+                    cond_csv=len(release.cond_txt.encode("utf-8")),
+                    precos_csv=len(release.precos_txt.encode("utf-8")),
+                )
+            # A new ZIP of unchanged files (re-packed, or from another source) is not parsed again
+            snapshot = cache.get(engine, digest)
+            if snapshot is None:
+                snapshot = await asyncio.to_thread(build_release_snapshot, release, engine)
+                stats.count("snapshot_built")
+                if snapshot.empty:
+                    return snapshot
+            else:
+                stats.count("snapshot_reused")
+            cache.put(engine, snapshot, release.key)
+        else:
+            stats.count("snapshot_reused")
+    return snapshot
+
+
+def _read_release_digest(release) -> str:
+    """Extract and check a release's texts; return their digest (the snapshot hash). Blocking."""
+    read_release(release)
+    if release.artefact is not None:
+        return release.artefact.hash
+    return payload_digest(release.cond_txt, release.precos_txt)
+
+
+def build_release_snapshot(release, engine: str = DEFAULT_ENGINE) -> TariffSnapshot:
+    """Snapshot of a read release: parsed from its CSV texts, or merged from its artefact's tables. Blocking."""
+    artefact = release.artefact
+    if artefact is None:
+        return build_snapshot(release.cond_txt, release.precos_txt, engine)
+    snapshot = snapshot_from_tables(artefact.tables["cond"], artefact.tables["precos"], artefact.hash, engine)
+    snapshot.prebuilt_catalogue = artefact.catalogue
+    return snapshot
+
+
+async def async_process_csv(hass: HomeAssistant, codigos_oferta=None, comercializador=None, pot_cont=None, energy_type="ele", engine=DEFAULT_ENGINE, offer_filters=None) -> pd.DataFrame:
+    snapshot = await async_load_snapshot(hass, engine)
+    if snapshot is None:
+        if resolve_engine(engine) == "lite":
+            from .lite_engine import empty_frame
+
+            return empty_frame()
+        return await asyncio.to_thread(_empty_frame)
+    return await asyncio.to_thread(
+        filter_snapshot, snapshot, codigos_oferta, comercializador, pot_cont, energy_type, offer_filters
+    )
+
+
 class TarifariosDataUpdateCoordinator(DataUpdateCoordinator):
     """Class to manage fetching Tarifarios data from ERSE."""
 
-    def __init__(self, hass: HomeAssistant, comercializador=None, codigos_oferta=None, pot_cont=None, energy_type="ele"):
+    def __init__(self, hass: HomeAssistant, comercializador=None, codigos_oferta=None, pot_cont=None, energy_type="ele", engine=DEFAULT_ENGINE, offer_filters=None, consumo_anual=DEFAULT_CONSUMO_ANUAL, consumo_sensor=None, escalao_gn=DEFAULT_ESCALAO_GN, fontes=None, caminho_local=None, artefacto=None, contagem=DEFAULT_CONTAGEM):
         """Initialize."""
         self.comercializador = comercializador
         self.codigos_oferta = codigos_oferta
-        self.pot_cont = pot_cont
+        self._set_potencias(pot_cont)
         self.energy_type = energy_type
+        # Natural gas consumption tier the gas prices are read at
+        self.escalao_gn = escalao_gn
+        # Loyalty, renewable, price type... options (see offer_filters)
+        self.offer_filters = offer_filters or {}
+        # Annual kWh: configured, or read from an energy sensor when one is set
+        self.consumo_anual = consumo_anual
+        self.consumo_sensor = consumo_sensor
+        self._consumption_seen = None
+        self._unsub_consumption = None
+        self.engine = engine
+        # Data sources raced for each release, and the local one's path (see sources)
+        self.fontes = fontes
+        self.caminho_local = caminho_local
+        self.artefacto = artefacto
+        self.snapshot: TariffSnapshot | None = None
+        # Bumped whenever the entry filters change without a new snapshot
+        self.filters_version = 0
+        # Seconds spent filtering the snapshot for this entry, last run
+        self.filter_seconds = None
+        self.stats = get_stats(hass)
+        # ERSE release of the loaded snapshot, and when it was downloaded
+        self.release_url = None
+        self.release_date = None
+        self.last_full_refresh = None
+        # Probes in a row that found no new release (drives the backoff)
+        self.unchanged_probes = 0
+        # Timer at the next day an offer starts or stops being valid
+        self.next_validity_boundary = None
+        self._unsub_validity = None
+        # Summary of the filtered frame at the entry's contagem (catalogue sensors, offer_details),
+        # built with the frame in the executor and on consumption changes
+        self.contagem = str(contagem)
+        self._summary = OfferSummary([])
         super().__init__(
             hass,
             _LOGGER,
             # Name of the data. For logging purposes.
             name=f"Tarifarios {comercializador or 'Eletricidade PT'}",
-            # Polling interval. Will only be polled if there are subscribers.
-            update_interval=timedelta(hours=24),  # Update once per day
+            # Polling interval, adapted after every update to the ERSE publication schedule
+            update_interval=timedelta(hours=24),
         )
+        self._track_consumption_sensor()
 
     async def _async_update_data(self):
         """Update data via library."""
+        schedule = await async_get_schedule(self.hass)
+        try:
+            return await self._async_fetch(schedule)
+        finally:
+            released_today = self.release_date == datetime.now(LISBON_TZ).date()
+            self.update_interval = schedule.next_interval(
+                datetime.now(timezone.utc), released_today, self.unchanged_probes
+            )
+            _LOGGER.debug("Next ERSE check for %s in %s", self.comercializador or "all", self.update_interval)
+
+    async def _async_fetch(self, schedule: PublicationSchedule):
+        """Probe for a new release and run the full pipeline only when there is one."""
+        url = update_date = None
+        if self._full_refresh_due():
+            self.unchanged_probes = 0
+        elif datetime.now(timezone.utc) - self.last_full_refresh < PROBE_INTERVAL:
+            # Just loaded, e.g. the entities' update before add right after setup
+            return self.data
+        else:
+            probe = await schedule.async_probe(self.hass)
+            if probe is None or not is_newer_release(*probe, self.release_url, self.release_date):
+                self.unchanged_probes += 1
+                self.stats.count("release_unchanged")
+                _LOGGER.debug("No new ERSE release for %s (%d checks in a row)",
+                              self.comercializador or "all", self.unchanged_probes)
+                return self.data
+            self.stats.count("release_new")
+            self.unchanged_probes = 0
+            url, update_date = probe
         try:
             _LOGGER.debug("Fetching data from ERSE for %s (power: %s, energy: %s)...", 
                         self.comercializador or "all", self.pot_cont or "all", self.energy_type)
-            data = await async_process_csv(
-                self.hass, 
-                codigos_oferta=self.codigos_oferta,
-                comercializador=self.comercializador,
-                pot_cont=self.pot_cont,
-                energy_type=self.energy_type
-            )
+            snapshot = await async_load_snapshot(self.hass, self.engine, url, self.fontes, self.caminho_local, self.artefacto)
+            if snapshot is None or snapshot.empty:
+                raise UpdateFailed("Failed to fetch data or data is empty")
+            if snapshot is self.snapshot and self.data is not None:
+                # Same payload as the loaded release: nothing to filter, announce or archive
+                self.stats.count("release_identical")
+                _LOGGER.debug("ERSE release for %s unchanged (%s)", self.comercializador or "all", snapshot.hash[:12])
+                await self._async_record_release(schedule, self.stats.url, update_date)
+                return self.data
+            data, summary = await asyncio.to_thread(self._filter_and_prepare, snapshot, self.annual_consumption())
             if data is None or data.empty:
                 raise UpdateFailed("Failed to fetch data or data is empty")
+            previous, self.snapshot = self.snapshot, snapshot
+            self._set_summary(summary)
+            self._schedule_validity_timer()
+            await async_update_catalogue(self.hass, snapshot)
+            await self._async_fire_price_events(previous, snapshot, data)
+            await async_archive_snapshot(self.hass, snapshot, self.stats.url, self.stats.release_date)
+            await self._async_record_release(schedule, self.stats.url, update_date)
             _LOGGER.info("Successfully fetched %d records from ERSE for %s (power: %s, energy: %s)", 
                         len(data), self.comercializador or "all", self.pot_cont or "all", self.energy_type)
             return data
         except Exception as exception:
             _LOGGER.error("Error fetching data: %s", exception)
-            raise UpdateFailed(f"Error communicating with API: {exception}") from exception
\ No newline at end of file
+            raise UpdateFailed(f"Error communicating with API: {exception}") from exception
+
+    def _full_refresh_due(self) -> bool:
+        if self.snapshot is None or self.data is None or self.last_full_refresh is None:
+            return True
+        return datetime.now(timezone.utc) - self.last_full_refresh >= FULL_REFRESH_MAX_AGE
+
+    async def _async_record_release(self, schedule: PublicationSchedule, url: str | None, update_date=None) -> None:
+        """Remember the loaded release and teach the schedule its publication time."""
+        self.release_url = url
+        # The page date counts as loaded too, so a discovery that falls back to an older
+        # ZIP does not trigger a full refresh at every probe; a mirror or local copy has
+        # no date in its URL, only the one its source reported
+        dates = [d for d in (release_date_from_url(url), update_date, self.stats.release_date, self.release_date) if d is not None]
+        self.release_date = max(dates) if dates else None
+        self.last_full_refresh = datetime.now(timezone.utc)
+        if schedule.observe_url(url):
+            await schedule.async_save(self.hass)
+
+    async def async_apply_filters(self, codigos_oferta=None, pot_cont=None, energy_type="ele", offer_filters=None, consumo_anual=DEFAULT_CONSUMO_ANUAL, consumo_sensor=None, escalao_gn=DEFAULT_ESCALAO_GN) -> None:
+        """Re-filter the loaded snapshot with new entry options, without downloading."""
+        self.codigos_oferta = codigos_oferta
+        self._set_potencias(pot_cont)
+        self.energy_type = energy_type
+        self.escalao_gn = escalao_gn
+        self.offer_filters = offer_filters or {}
+        self.consumo_anual = consumo_anual
+        if consumo_sensor != self.consumo_sensor:
+            self.consumo_sensor = consumo_sensor
+            self._track_consumption_sensor()
+        self.filters_version += 1
+        if self.snapshot is None:
+            await self.async_refresh()
+            return
+        await self._async_refilter()
+
+    def _set_potencias(self, pot_cont) -> None:
+        # Every potência of the entry is served from one filtered frame; the first one
+        # (pot_cont) drives the cheapest offers ranking and the current price
+        self.potencias = pot_values(pot_cont)
+        self.pot_cont = self.potencias[0] if self.potencias else None
+
+    async def _async_refilter(self) -> None:
+        data, summary = await asyncio.to_thread(self._filter_and_prepare, self.snapshot, self.annual_consumption())
+        _LOGGER.debug("Re-filtered snapshot for %s (power: %s, energy: %s): %d rows",
+                      self.comercializador or "all", self.pot_cont or "all", self.energy_type, len(data))
+        self._set_summary(summary)
+        self.async_set_updated_data(data)
+
+    def offer_prices(self, code: str, pot_cont=None) -> dict:
+        """Electricity prices at a potência (the entry's first) and gas prices at its escalão, by PRICE_FIELDS name."""
+        if self.snapshot is None:
+            return {}
+        prices = self.snapshot.offer_prices
+        ele = prices.electricity(code, pot_cont or self.pot_cont) or (None,) * len(PRICE_FIELDS[ELE_PRICES])
+        gn = prices.gas(code, self.escalao_gn) or (None,) * len(PRICE_FIELDS[GN_PRICES])
+        return dict(zip(PRICE_FIELDS, (*ele, *gn)))
+
+    def offer_summary(self) -> OfferSummary:
+        """Summary of the entry's offers at its contagem, as last built with the filtered frame."""
+        return self._summary
+
+    def _build_summary(self, snapshot: TariffSnapshot, data, kwh: float) -> OfferSummary:
+        """Summary of a filtered frame at an annual consumption. Blocking."""
+        return build_offer_summary(snapshot, data, self.pot_cont, self.contagem, kwh, self.escalao_gn)
+
+    @callback
+    def _set_summary(self, summary: OfferSummary) -> None:
+        self._summary = summary
+        self.stats.count("summary_built")
+
+    async def _async_summarise(self, kwh: float) -> None:
+        """Rebuild the summary at a new annual consumption, then update the entities."""
+        data = self.data
+        if self.snapshot is not None:
+            summary = await asyncio.to_thread(self._build_summary, self.snapshot, data, kwh)
+            # A refilter meanwhile built the summary of a newer frame
+            if self.data is data:
+                self._set_summary(summary)
+        self.async_update_listeners()
+
+    def has_gas_prices(self, code: str) -> bool:
+        return self.snapshot is not None and code in self.snapshot.offer_prices.gn
+
+    def annual_consumption(self) -> float:
+        """Annual kWh of the household: the consumption sensor's reading, else the configured value."""
+        if self.consumo_sensor:
+            kwh = state_kwh(self.hass.states.get(self.consumo_sensor))
+            if kwh is not None:
+                return kwh
+        return float(self.consumo_anual)
+
+    @callback
+    def _track_consumption_sensor(self) -> None:
+        self.async_untrack_consumption_sensor()
+        self._consumption_seen = self.annual_consumption()
+        if self.consumo_sensor:
+            self._unsub_consumption = async_track_state_change_event(
+                self.hass, [self.consumo_sensor], self._handle_consumption_change
+            )
+
+    @callback
+    def async_untrack_consumption_sensor(self) -> None:
+        if self._unsub_consumption is not None:
+            self._unsub_consumption()
+            self._unsub_consumption = None
+
+    @callback
+    def _handle_consumption_change(self, _event) -> None:
+        """Re-rank (eligibility and costs) once the consumption moved by CONSUMPTION_STEP."""
+        kwh = self.annual_consumption()
+        if abs(kwh - self._consumption_seen) < CONSUMPTION_STEP:
+            return
+        _LOGGER.debug("Annual consumption for %s now %.0f kWh", self.comercializador or "all", kwh)
+        self._consumption_seen = kwh
+        self.hass.async_create_task(self._async_summarise(kwh))
+
+    def valid_offer_codes(self) -> frozenset[str] | None:
+        """Codes of the offers valid today (None before the first snapshot)."""
+        if self.snapshot is None or self.snapshot.empty:
+            return None
+        return self.snapshot.offer_index.valid_codes(datetime.now(LISBON_TZ).date())
+
+    def is_offer_valid(self, code: str) -> bool:
+        codes = self.valid_offer_codes()
+        return codes is None or code in codes
+
+    @callback
+    def _schedule_validity_timer(self) -> None:
+        """One timer at the next validity boundary of the snapshot (Lisbon midnight)."""
+        self.async_cancel_validity_timer()
+        if self.snapshot is None or self.snapshot.empty:
+            return
+        boundary = self.snapshot.offer_index.validity.next_boundary(datetime.now(LISBON_TZ).date())
+        self.next_validity_boundary = boundary
+        if boundary is None:
+            return
+        self._unsub_validity = async_track_point_in_time(
+            self.hass, self._handle_validity_boundary, datetime.combine(boundary, dt_time(), LISBON_TZ)
+        )
+
+    @callback
+    def async_cancel_validity_timer(self) -> None:
+        if self._unsub_validity is not None:
+            self._unsub_validity()
+            self._unsub_validity = None
+
+    @callback
+    def _handle_validity_boundary(self, _now) -> None:
+        """Offers started or expired: flip their entities, re-filter when filtering by validity."""
+        self._unsub_validity = None
+        _LOGGER.debug("Offer validity boundary %s reached for %s", self.next_validity_boundary,
+                      self.comercializador or "all")
+        if self.offer_filters.get("em_vigor"):
+            self.filters_version += 1
+            self.hass.async_create_task(self._async_refilter())
+        else:
+            self.async_update_listeners()
+        self._schedule_validity_timer()
+
+    async def _async_fire_price_events(self, previous: TariffSnapshot | None, snapshot: TariffSnapshot, data) -> None:
+        """Fire price/offer events for this entry's offers when a new ERSE release arrives."""
+        if previous is not None and previous.hash == snapshot.hash:
+            return
+        archive = get_archive(self.hass)
+        codes = {str(c) for c in column_values(data, CODE_COL) if c is not None}
+        # The entry's potências and gas escalão; every one when it has none
+        potencias = {normalize_pot(p) for p in self.potencias} or None
+        escaloes = {str(self.escalao_gn)} if self.energy_type != "ele" else set()
+
+        def _diff():
+            # Offers of the previous selection too, so the ones that left the release are reported
+            scope = set(codes)
+            if previous is not None:
+                old = previous.price_table
+                scope |= self._selection_codes(previous)
+            elif archive.has_release(snapshot.hash) and snapshot.hash not in archive.new_releases:
+                # Release already seen before Home Assistant restarted
+                return None
+            else:
+                old = archive.previous_table(snapshot.hash)
+                if self.codigos_oferta:
+                    scope |= set(self.codigos_oferta)
+                elif self.comercializador:
+                    scope |= archive.offer_codes(self.comercializador)
+                else:
+                    scope = None
+            if old is None:
+                return None
+            return diff_price_tables(old, snapshot.price_table, scope, potencias, escaloes)
+
+        try:
+            diff = await asyncio.to_thread(_diff)
+        except OSError as e:
+            _LOGGER.warning("Could not read the previous release from the price archive: %s", e)
+            return
+        if diff:
+            await async_fire_price_events(self.hass, diff, {
+                "entry_id": self.config_entry.entry_id if self.config_entry else None,
+                "comercializador": self.comercializador,
+                "snapshot_hash": snapshot.hash,
+                "previous_hash": previous.hash if previous is not None else None,
+            })
+
+    def _selection_codes(self, snapshot: TariffSnapshot) -> set[str]:
+        """Codes of the offers this entry selects in a snapshot. Blocking."""
+        data = filter_snapshot(
+            snapshot,
+            codigos_oferta=self.codigos_oferta,
+            comercializador=self.comercializador,
+            pot_cont=self.potencias,
+            energy_type=self.energy_type,
+            offer_filters=self.offer_filters,
+        )
+        return {str(c) for c in column_values(data, CODE_COL) if c is not None}
+
+    def _filter_and_prepare(self, snapshot: TariffSnapshot, kwh: float) -> tuple[pd.DataFrame, OfferSummary]:
+        """Filter the snapshot for this entry, warm its indexes and summarise the offers at kwh. Blocking."""
+        snapshot.prepare()
+        start = time.perf_counter()
+        data = filter_snapshot(
+            snapshot,
+            codigos_oferta=self.codigos_oferta,
+            comercializador=self.comercializador,
+            pot_cont=self.potencias,
+            energy_type=self.energy_type,
+            offer_filters=self.offer_filters,
+        )
+        self.filter_seconds = time.perf_counter() - start
+        return data, self._build_summary(snapshot, data, kwh)
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""Diagnostics support: download, cache, timing and payload-size internals of an entry."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import REDACTED, async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.json import json_bytes
+
+from .catalogue import DATA_CATALOGUE
+from .const import DOMAIN, VERSION
+from .scheduler import DATA_SCHEDULE
+from .stats import get_stats
+
+# Local paths and artefact URLs may carry user names, hosts or tokens
+TO_REDACT = {"caminho_local", "artefacto"}
+# Sources whose release URL is one of those locations
+LOCATION_SOURCES = {"local", "artefacto"}
+
+
+def _rounded(timings: dict[str, float]) -> dict[str, float]:
+    return {stage: round(seconds, 4) for stage, seconds in timings.items()}
+
+
+def _snapshot_info(snapshot) -> dict[str, Any] | None:
+    if snapshot is None:
+        return None
+    return {
+        "hash": snapshot.hash,
+        "engine": snapshot.engine,
+        "loaded_at": snapshot.loaded_at.isoformat(),
+        "cond_rows": len(snapshot.cond_df),
+        "cond_columns": len(snapshot.cond_df.columns),
+        "merged_rows": len(snapshot.merged),
+        "merged_columns": len(snapshot.merged.columns),
+        # Not built on the event loop for a diagnostics download: None until a sensor needs them
+        "cost_vectors": snapshot.cost_vector_count,
+        "timings_s": _rounded(snapshot.timings),
+    }
+
+
+def _entity_payloads(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Serialised size of every entity state of this entry, largest first."""
+    sizes = {}
+    for reg_entry in er.async_entries_for_config_entry(er.async_get(hass), entry.entry_id):
+        state = hass.states.get(reg_entry.entity_id)
+        if state is None:
+            continue
+        sizes[reg_entry.entity_id] = {
+            "attributes": len(state.attributes),
+            "attributes_bytes": len(json_bytes(dict(state.attributes))),
+        }
+    ordered = dict(sorted(sizes.items(), key=lambda item: item[1]["attributes_bytes"], reverse=True))
+    return {
+        "count": len(ordered),
+        "total_attributes_bytes": sum(s["attributes_bytes"] for s in ordered.values()),
+        "entities": ordered,
+    }
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    domain_data = hass.data.get(DOMAIN, {})
+    entry_data = domain_data.get(entry.entry_id, {})
+    coordinator = entry_data.get("coordinator")
+    catalogue = domain_data.get(DATA_CATALOGUE)
+    schedule = domain_data.get(DATA_SCHEDULE)
+    download = get_stats(hass).as_dict()
+    local_release = download["source"] in LOCATION_SOURCES
+    if local_release:
+        download["url"] = REDACTED
+
+    diagnostics: dict[str, Any] = {
+        "integration_version": VERSION,
+        "config": async_redact_data(entry_data.get("config", {**entry.data, **entry.options}), TO_REDACT),
+        "download": download,
+        "catalogue": {
+            "snapshot_hash": catalogue.snapshot_hash,
+            "built_at": catalogue.built_at,
+            "offers": len(catalogue.offers),
+        } if catalogue is not None else None,
+        "schedule": schedule.as_dict() if schedule is not None else None,
+        "entities": _entity_payloads(hass, entry),
+    }
+
+    if coordinator is not None:
+        data = coordinator.data
+        diagnostics["coordinator"] = {
+            "engine": coordinator.engine,
+            "last_update_success": coordinator.last_update_success,
+            "update_interval_s": coordinator.update_interval.total_seconds() if coordinator.update_interval else None,
+            "filters_version": coordinator.filters_version,
+            "release_url": REDACTED if local_release and coordinator.release_url else coordinator.release_url,
+            "release_date": coordinator.release_date.isoformat() if coordinator.release_date else None,
+            "last_full_refresh": coordinator.last_full_refresh.isoformat() if coordinator.last_full_refresh else None,
+            "unchanged_probes": coordinator.unchanged_probes,
+            "potencias": coordinator.potencias,
+            "consumo_anual_kwh": coordinator.annual_consumption(),
+            "consumo_sensor": coordinator.consumo_sensor,
+            "next_validity_boundary": (
+                coordinator.next_validity_boundary.isoformat() if coordinator.next_validity_boundary else None
+            ),
+            "filter_s": round(coordinator.filter_seconds, 4) if coordinator.filter_seconds is not None else None,
+            "data_rows": len(data) if data is not None else None,
+            "data_columns": len(data.columns) if data is not None else None,
+        }
+        diagnostics["snapshot"] = _snapshot_info(coordinator.snapshot)
+    return diagnostics
@@ -3,11 +3,13 @@ import asyncio
 import logging
 import zipfile
 import re
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from io import BytesIO
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
+from .stats import get_stats
+
 _LOGGER = logging.getLogger(__name__)
 
 # ERSE simulator page URL
@@ -33,42 +35,55 @@ def search_html_for_terms(html_content: str, search_terms: list[str]) -> dict:
     
     return results
 
+_UPDATE_TEXT = re.compile(r'Ofertas comerciais \(CSV\) - Atualizado em ([^<]*)', re.IGNORECASE)
+# Common formats: "19/09/2025", "19-09-2025" or "2025-09-19"
+_UPDATE_DATE_PATTERNS = [
+    re.compile(r'(\d{1,2})[/-](\d{1,2})[/-](\d{4})'),  # DD/MM/YYYY or DD-MM-YYYY
+    re.compile(r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})'),  # YYYY/MM/DD or YYYY-MM-DD
+]
+_ZIP_NAME = re.compile(r'/Admin/csvs/(\d{8})(?:%20|\s)(\d{6})(?:%20|\s)CSV\.zip', re.IGNORECASE)
+
+
+def parse_update_dates(html_content: str) -> list[date]:
+    """Dates of the "Ofertas comerciais (CSV) - Atualizado em ..." texts of the page."""
+    dates = []
+    for date_text in _UPDATE_TEXT.findall(html_content):
+        _LOGGER.debug("Found CSV update date text: '%s'", date_text.strip())
+        for pattern in _UPDATE_DATE_PATTERNS:
+            date_match = pattern.search(date_text)
+            if date_match:
+                if len(date_match.group(1)) == 4:  # YYYY format
+                    year, month, day = date_match.groups()
+                else:  # DD/MM format
+                    day, month, year = date_match.groups()
+                try:
+                    dates.append(date(int(year), int(month), int(day)))
+                    _LOGGER.debug("Extracted date: %s -> %s", date_text.strip(), dates[-1])
+                except ValueError:
+                    _LOGGER.debug("Invalid update date: %s", date_text.strip())
+                break
+    return dates
+
+
+def _newest_release(html_content: str) -> tuple[str | None, date | None]:
+    """Newest ZIP URL linked from the page and newest "Atualizado em" date (either may be None)."""
+    names = sorted(set(_ZIP_NAME.findall(html_content)))
+    url = f"https://simuladorprecos.erse.pt/Admin/csvs/{names[-1][0]}%20{names[-1][1]}%20CSV.zip" if names else None
+    dates = parse_update_dates(html_content)
+    return url, max(dates) if dates else None
+
+
 def _analyze_page_content(html_content: str) -> list[str]:
     """Analyze page content for CSV URLs using multiple patterns and term searching."""
     found_urls = []
     
-    # Pattern 1: Look for the specific update text to extract date
-    update_pattern = r'Ofertas comerciais \(CSV\) - Atualizado em ([^<]*)'
-    update_matches = re.findall(update_pattern, html_content, re.IGNORECASE)
-    if update_matches:
-        for date_text in update_matches:
-            _LOGGER.info("Found CSV update date text: '%s'", date_text.strip())
-            # Try to extract date components from the text
-            # Common formats: "19/09/2025" or "19-09-2025" or "2025-09-19"
-            date_patterns = [
-                r'(\d{1,2})[/-](\d{1,2})[/-](\d{4})',  # DD/MM/YYYY or DD-MM-YYYY
-                r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})',  # YYYY/MM/DD or YYYY-MM-DD
-            ]
-            
-            for pattern in date_patterns:
-                date_match = re.search(pattern, date_text)
-                if date_match:
-                    # Try both DD/MM/YYYY and YYYY/MM/DD formats
-                    if len(date_match.group(1)) == 4:  # YYYY format
-                        year, month, day = date_match.groups()
-                    else:  # DD/MM format
-                        day, month, year = date_match.groups()
-                    
-                    # Format as YYYYMMDD for URL
-                    formatted_date = f"{year}{month.zfill(2)}{day.zfill(2)}"
-                    _LOGGER.info("Extracted date: %s -> %s", date_text.strip(), formatted_date)
-                    
-                    # Try common time patterns for this date
-                    time_patterns = ["100313", "100000", "110000", "120000", "090000"]
-                    for time_str in time_patterns:
-                        csv_url = f"https://simuladorprecos.erse.pt/Admin/csvs/{formatted_date}%20{time_str}%20CSV.zip"
-                        found_urls.append(csv_url)
-                    break
+    # Pattern 1: Date of the "Atualizado em" text, tried with the usual publication times
+    for update_date in parse_update_dates(html_content):
+        formatted_date = update_date.strftime("%Y%m%d")
+        time_patterns = ["100313", "100000", "110000", "120000", "090000"]
+        for time_str in time_patterns:
+            csv_url = f"https://simuladorprecos.erse.pt/Admin/csvs/{formatted_date}%20{time_str}%20CSV.zip"
+            found_urls.append(csv_url)
     
     # Pattern 2: Direct Admin/csvs paths
     admin_paths = re.findall(r'/Admin/csvs/[^"\'>\s]*\.zip', html_content)
@@ -186,47 +201,59 @@ def _analyze_page_content(html_content: str) -> list[str]:
     _LOGGER.debug("Found potential CSV URLs in page: %s", found_urls)
     return list(set(found_urls))  # Remove duplicates
 
-async def _try_date_patterns(hass: HomeAssistant) -> str:
-    """Try date-based URL patterns using known working format."""
+# Publication times seen in ERSE ZIP names (100313 is the known working one)
+DATE_PATTERN_TIMES = [
+    "100313",
+    "100000", "110000", "120000", "090000",
+    "100300", "100330", "100315", "100310"
+]
+
+
+async def async_find_zip_for_date(hass: HomeAssistant, day) -> str:
+    """HEAD-probe the date-pattern ZIP URLs of one day; return the first that exists."""
     session = async_get_clientsession(hass)
+    stats = get_stats(hass)
     base_url = "https://simuladorprecos.erse.pt/Admin/csvs"
-    
+    date_str = day.strftime('%Y%m%d')
+
+    for time_str in DATE_PATTERN_TIMES:
+        url = f"{base_url}/{date_str}%20{time_str}%20CSV.zip"
+        stats.head_probes += 1
+        try:
+            async with session.head(url, timeout=5) as resp:
+                if resp.status == 200:
+                    return url
+        except:
+            continue
+
+    return None
+
+async def _try_date_patterns(hass: HomeAssistant) -> str:
+    """Try date-based URL patterns using known working format."""
     # Try recent dates with common time patterns
     today = datetime.now()
     
-    # Time patterns based on known working format (100313 from fallback)
-    time_patterns = [
-        "100313",  # Known working time
-        "100000", "110000", "120000", "090000",
-        "100300", "100330", "100315", "100310"
-    ]
-    
     for days_back in range(0, 10):  # Try last 10 days
         date = today - timedelta(days=days_back)
-        date_str = date.strftime('%Y%m%d')
-        
-        for time_str in time_patterns:
-            url = f"{base_url}/{date_str}%20{time_str}%20CSV.zip"
-            
-            try:
-                async with session.head(url, timeout=5) as resp:
-                    if resp.status == 200:
-                        _LOGGER.info("Found working CSV URL via date pattern: %s", url)
-                        return url
-            except:
-                continue
+        url = await async_find_zip_for_date(hass, date)
+        if url:
+            _LOGGER.debug("Found working CSV URL via date pattern: %s", url)
+            return url
     
     return None
 
 async def _test_extracted_urls(hass: HomeAssistant, urls: list[str]) -> str:
     """Test extracted URLs to find working ones."""
     session = async_get_clientsession(hass)
+    stats = get_stats(hass)
+    stats.candidate_urls += len(urls)
     
     for url in urls:
+        stats.head_probes += 1
         try:
             async with session.head(url, timeout=5) as resp:
                 if resp.status == 200:
-                    _LOGGER.info("Found working CSV URL from page analysis: %s", url)
+                    _LOGGER.debug("Found working CSV URL from page analysis: %s", url)
                     return url
         except:
             continue
@@ -236,6 +263,8 @@ async def _test_extracted_urls(hass: HomeAssistant, urls: list[str]) -> str:
 async def async_get_latest_csv_url(hass: HomeAssistant) -> str:
     """Get the latest CSV ZIP URL using multiple strategies."""
     session = async_get_clientsession(hass)
+    stats = get_stats(hass)
+    stats.start_discovery()
     
     try:
         _LOGGER.debug("Fetching ERSE simulator page...")
@@ -260,29 +289,47 @@ async def async_get_latest_csv_url(hass: HomeAssistant) -> str:
         
         # Strategy 1: Analyze page content for CSV URLs
         _LOGGER.debug("Analyzing page content for CSV URLs...")
-        extracted_urls = _analyze_page_content(html_content)
+        # Regex scanning and BeautifulSoup (imported lazily) run in the executor
+        extracted_urls = await asyncio.to_thread(_analyze_page_content, html_content)
         if extracted_urls:
             _LOGGER.debug("Found %d potential URLs: %s", len(extracted_urls), extracted_urls)
             working_url = await _test_extracted_urls(hass, extracted_urls)
             if working_url:
-                _LOGGER.info("Found working CSV URL via content analysis: %s", working_url)
+                _LOGGER.debug("Found working CSV URL via content analysis: %s", working_url)
+                stats.discovered(working_url, "page_analysis")
                 return working_url
         
         # Strategy 2: Try recent date patterns
         _LOGGER.debug("Trying date-based URL patterns...")
         pattern_url = await _try_date_patterns(hass)
         if pattern_url:
+            stats.discovered(pattern_url, "date_pattern")
             return pattern_url
         
         # Strategy 3: Fallback to known working URL
         _LOGGER.info("All discovery methods failed, using fallback URL: %s", FALLBACK_ZIP_URL)
+        stats.discovered(FALLBACK_ZIP_URL, "fallback")
         return FALLBACK_ZIP_URL
         
     except Exception as e:
         _LOGGER.error("Failed to get latest CSV URL: %s", e)
         _LOGGER.info("Using fallback CSV URL: %s", FALLBACK_ZIP_URL)
+        stats.discovered(FALLBACK_ZIP_URL, "fallback_after_error")
         return FALLBACK_ZIP_URL
 
+async def async_probe_latest_release(hass: HomeAssistant) -> tuple[str | None, date | None]:
+    """Cheap check for a new release: one GET of the simulator page, regex only.
+
+    Returns the newest ZIP URL linked from the page and the "Atualizado em" date;
+    either is None when the page does not show it.
+    """
+    session = async_get_clientsession(hass)
+    get_stats(hass).count("release_probe")
+    async with session.get(ERSE_SIMULATOR_URL, timeout=30) as resp:
+        resp.raise_for_status()
+        html_content = await resp.text()
+    return await asyncio.to_thread(_newest_release, html_content)
+
 async def async_download_erse_zip(hass: HomeAssistant, url: str = None) -> bytes:
     """Download ERSE ZIP file."""
     if not url:
@@ -297,48 +344,45 @@ async def async_download_erse_zip(hass: HomeAssistant, url: str = None) -> bytes
         resp.raise_for_status()
         return content
 
+COND_CSV = "CondComerciais.csv"
+PRECOS_CSV = "Precos_ELEGN.csv"
+
+
+def _member(zf: zipfile.ZipFile, filename: str) -> zipfile.ZipInfo:
+    info = next((i for i in zf.infolist() if i.filename.endswith(filename) or filename in i.filename), None)
+    if info is None:
+        raise FileNotFoundError(f"File '{filename}' not found in ZIP. Available files: {zf.namelist()}")
+    return info
+
+
+def read_csv_member(zf: zipfile.ZipFile, filename: str) -> str:
+    """Text of the ZIP member named like filename (the ZIP may nest it in a folder)."""
+    _LOGGER.debug("ZIP contains files: %s", zf.namelist())
+    target_file = _member(zf, filename)
+    _LOGGER.debug("Extracting '%s' from ZIP", target_file.filename)
+    return zf.read(target_file).decode('utf-8-sig')
+
+
+def zip_fingerprint(zip_content: bytes) -> str:
+    """Fingerprint of an ERSE ZIP from its central directory: CRC and size of both CSV members.
+
+    Nothing is decompressed, and a re-packed ZIP of unchanged files keeps its fingerprint.
+    """
+    with zipfile.ZipFile(BytesIO(zip_content)) as zf:
+        members = [_member(zf, name) for name in (COND_CSV, PRECOS_CSV)]
+    return "zip:" + ";".join(f"{m.CRC:08x}:{m.file_size}" for m in members)
+
+
+def extract_csvs(zip_content: bytes) -> tuple[str, str]:
+    """CondComerciais and Precos_ELEGN texts of an ERSE ZIP (blocking)."""
+    with zipfile.ZipFile(BytesIO(zip_content)) as zf:
+        return read_csv_member(zf, COND_CSV), read_csv_member(zf, PRECOS_CSV)
+
+
 async def async_extract_csv_from_zip(zip_content: bytes, filename: str) -> str:
     """Extract specific CSV file from ZIP content."""
     def _extract():
         with zipfile.ZipFile(BytesIO(zip_content)) as zf:
-            file_list = zf.namelist()
-            _LOGGER.debug("ZIP contains files: %s", file_list)
-            
-            # Find the target file
-            target_file = None
-            for file in file_list:
-                if file.endswith(filename) or filename in file:
-                    target_file = file
-                    break
-            
-            if not target_file:
-                raise FileNotFoundError(f"File '{filename}' not found in ZIP. Available files: {file_list}")
-            
-            _LOGGER.debug("Extracting '%s' from ZIP", target_file)
-            return zf.read(target_file).decode('utf-8-sig')
+            return read_csv_member(zf, filename)
     
     return await asyncio.to_thread(_extract)
-
-async def async_download_and_extract_csvs(hass: HomeAssistant) -> tuple[str, str]:
-    """Download ERSE ZIP and extract both CSV files."""
-    try:
-        _LOGGER.info("Finding latest ERSE CSV URL...")
-        csv_url = await async_get_latest_csv_url(hass)
-        
-        _LOGGER.info("Downloading ERSE data from: %s", csv_url)
-        zip_content = await async_download_erse_zip(hass, csv_url)
-        
-        _LOGGER.info("Extracting CSV files...")
-        cond_txt, precos_txt = await asyncio.gather(
-            async_extract_csv_from_zip(zip_content, "CondComerciais.csv"),
-            async_extract_csv_from_zip(zip_content, "Precos_ELEGN.csv"),
-        )
-        
-        _LOGGER.info("Successfully extracted CSV files: CondComerciais (%d chars), Precos_ELEGN (%d chars)", 
-                     len(cond_txt), len(precos_txt))
-        
-        return cond_txt, precos_txt
-        
-    except Exception as e:
-        _LOGGER.error("Download or extraction failed: %s", e)
-        raise
\ No newline at end of file
@@ -0,0 +1,99 @@
+"""Price-change events between consecutive ERSE snapshots.
+
+The previous and new price tables (snapshot.price_table) are joined on their
+(code, potência, contagem, escalão) keys in one O(n) pass. Changes are grouped per
+offer code, so one event describes every variant of an offer, and the events are
+fired in small batches that yield to the event loop in between.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .snapshot import PRICE_FIELDS
+
+_LOGGER = logging.getLogger(__name__)
+
+EVENT_PRICE_CHANGED = f"{DOMAIN}_price_changed"
+EVENT_OFFER_ADDED = f"{DOMAIN}_offer_added"
+EVENT_OFFER_REMOVED = f"{DOMAIN}_offer_removed"
+
+# Events fired before yielding to the event loop
+EVENT_BATCH_SIZE = 50
+
+
+def _prices(values) -> dict | None:
+    return dict(zip(PRICE_FIELDS, values)) if values is not None else None
+
+
+def _variant(key: tuple, old=None, new=None) -> dict:
+    _, pot, contagem, escalao = key
+    return {"potencia": pot, "contagem": contagem, "escalao": escalao or None,
+            "old": _prices(old), "new": _prices(new)}
+
+
+def _in_scope(key: tuple, codes: set | None, potencias: set | None, escaloes: set | None) -> bool:
+    code, pot, _, escalao = key
+    if codes is not None and code not in codes:
+        return False
+    if pot and potencias is not None and pot not in potencias:
+        return False
+    return not (escalao and escaloes is not None and escalao not in escaloes)
+
+
+def diff_price_tables(old: dict, new: dict, codes: set | None = None, potencias: set | None = None,
+                      escaloes: set | None = None) -> dict[str, dict[str, list]]:
+    """Hash join of two price tables: {event type: {offer code: [variant changes]}}.
+
+    Only the offers in `codes`, at the potências (dot format) and gas escalões given,
+    are compared; None compares them all. An offer is "added" or "removed" only when
+    none of its variants existed before or remain after; otherwise every changed, new
+    or dropped variant is a price change.
+    """
+    changed: dict[str, list] = {}
+    old_codes: set = set()
+    for key, old_values in old.items():
+        code = key[0]
+        if not _in_scope(key, codes, potencias, escaloes):
+            continue
+        old_codes.add(code)
+        new_values = new.get(key)
+        if new_values != old_values:
+            changed.setdefault(code, []).append(_variant(key, old_values, new_values))
+
+    new_codes: set = set()
+    for key, new_values in new.items():
+        code = key[0]
+        if not _in_scope(key, codes, potencias, escaloes):
+            continue
+        new_codes.add(code)
+        if key not in old:
+            changed.setdefault(code, []).append(_variant(key, None, new_values))
+
+    result = {EVENT_PRICE_CHANGED: {}, EVENT_OFFER_ADDED: {}, EVENT_OFFER_REMOVED: {}}
+    for code, variants in changed.items():
+        if code not in old_codes:
+            result[EVENT_OFFER_ADDED][code] = variants
+        elif code not in new_codes:
+            result[EVENT_OFFER_REMOVED][code] = variants
+        else:
+            result[EVENT_PRICE_CHANGED][code] = variants
+    return result
+
+
+async def async_fire_price_events(hass: HomeAssistant, diff: dict[str, dict[str, list]], base_data: dict) -> int:
+    """Fire one event per offer and type, in batches; return how many were fired."""
+    fired = 0
+    for event_type, offers in diff.items():
+        for code in sorted(offers):
+            hass.bus.async_fire(event_type, {**base_data, "codigo_oferta": code, "variantes": offers[code]})
+            fired += 1
+            if fired % EVENT_BATCH_SIZE == 0:
+                await asyncio.sleep(0)
+    if fired:
+        _LOGGER.debug("Fired %d price events (%s)", fired,
+                      ", ".join(f"{t}: {len(o)}" for t, o in diff.items() if o))
+    return fired
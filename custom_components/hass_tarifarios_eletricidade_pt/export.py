@@ -0,0 +1,113 @@
+"""Streaming export of the processed snapshot, or a filtered view of it, to CSV, JSON Lines or Parquet.
+
+Rows are read from the frame in chunks of CHUNK_ROWS and written as they are read,
+so an export holds one chunk in memory besides the frame itself; exporting the whole
+snapshot writes straight from the merged frame without filtering (copying) it. The
+file is written under a temporary name and renamed when complete.
+
+Parquet needs the optional pyarrow package.
+"""
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import os
+import re
+from typing import Iterator
+
+_LOGGER = logging.getLogger(__name__)
+
+EXPORT_DIR = "tarifarios_export"
+CHUNK_ROWS = 2000
+# Format -> file extension
+EXPORT_FORMATS = {"csv": "csv", "jsonl": "jsonl", "parquet": "parquet"}
+
+
+class ExportError(Exception):
+    """Export impossible: unknown columns, missing optional dependency."""
+
+
+def export_file_name(name: str, fmt: str) -> str:
+    """Safe file name for an export: letters, digits, dot, dash and underscore only."""
+    ext = EXPORT_FORMATS[fmt]
+    stem = re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("._")
+    stem = stem.removesuffix(f".{ext}") or "tarifarios"
+    return f"{stem}.{ext}"
+
+
+def iter_chunks(frame, columns: list[str], size: int = CHUNK_ROWS) -> Iterator[list[list]]:
+    """Rows of the projected columns, `size` at a time, None for missing cells (either engine)."""
+    n = len(frame)
+    if hasattr(frame, "itertuples"):
+        for start in range(0, n, size):
+            chunk = frame.iloc[start:start + size][columns]
+            yield [
+                [None if v is None or v != v else v for v in row]
+                for row in chunk.itertuples(index=False, name=None)
+            ]
+        return
+    for start in range(0, n, size):
+        rows = (frame.iloc[i] for i in range(start, min(start + size, n)))
+        yield [[row[c] for c in columns] for row in rows]
+
+
+def _write_csv(path: str, columns: list[str], chunks) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        # Same dialect as the ERSE files: semicolon separated, decimal comma
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(columns)
+        for rows in chunks:
+            writer.writerows(rows)
+            count += len(rows)
+    return count
+
+
+def _write_jsonl(path: str, columns: list[str], chunks) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for rows in chunks:
+            f.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows)
+            count += len(rows)
+    return count
+
+
+def _write_parquet(path: str, columns: list[str], chunks) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ExportError("Parquet export needs the pyarrow package") from e
+
+    # Every column of the ERSE files is text
+    schema = pa.schema([(c, pa.string()) for c in columns])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in chunks:
+            arrays = [pa.array([None if row[j] is None else str(row[j]) for row in rows], pa.string()) for j in range(len(columns))]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            count += len(rows)
+    return count
+
+
+WRITERS = {"csv": _write_csv, "jsonl": _write_jsonl, "parquet": _write_parquet}
+
+
+def export_frame(frame, path: str, fmt: str, columns: list[str] | None = None, chunk_rows: int = CHUNK_ROWS) -> dict:
+    """Write a frame to `path` chunk by chunk; return what was written."""
+    columns = list(columns) if columns else list(frame.columns)
+    unknown = [c for c in columns if c not in frame.columns]
+    if unknown:
+        raise ExportError(f"Unknown columns: {', '.join(unknown)}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    try:
+        rows = WRITERS[fmt](tmp, columns, iter_chunks(frame, columns, chunk_rows))
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    size = os.path.getsize(path)
+    _LOGGER.debug("Exported %d rows x %d columns to %s (%d bytes)", rows, len(columns), path, size)
+    return {"ficheiro": path, "formato": fmt, "linhas": rows, "colunas": len(columns), "bytes": size}
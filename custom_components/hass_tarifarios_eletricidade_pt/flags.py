@@ -0,0 +1,131 @@
+"""Digit-string bitmask columns of CondComerciais decoded into integer bitfields.
+
+ERSE encodes the contracting, billing, payment and service channels of an offer as
+positional digit strings ("110" = Eletrónica e Presencial), and the metering cycles
+as the list of cycle digits ("123" = Simples, Bi-horária e Tri-horária). Each column
+is decoded once per snapshot into a uint8 array of the IntFlag below, so a query such
+as "direct debit and electronic billing" is a bitwise AND over whole arrays.
+"""
+from __future__ import annotations
+
+from enum import IntFlag
+from typing import TYPE_CHECKING
+
+from .snapshot import text_value
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class Contratacao(IntFlag):
+    ELETRONICA = 1
+    PRESENCIAL = 2
+    TELEFONICA = 4
+
+
+class Faturacao(IntFlag):
+    ELETRONICA = 1
+    PAPEL = 2
+
+
+class Pagamento(IntFlag):
+    DEBITO_DIRETO = 1
+    MULTIBANCO = 2
+    NUMERARIO = 4
+
+
+class Atendimento(IntFlag):
+    ESCRITO = 1
+    PRESENCIAL = 2
+    TELEFONICO = 4
+    ELETRONICO = 8
+
+
+class Contagem(IntFlag):
+    SIMPLES = 1
+    BI_HORARIA = 2
+    TRI_HORARIA = 4
+
+
+CONTRATACAO_COL = (
+    "Modo de contratação - Eletrónica|Presencial|Telefónica. "
+    "Ex: 110 = Eletrónica e Presencial; 100 = Eletrónica; 111 = Eletrónica, Presencial e telefónica"
+)
+FATURACAO_COL = "Modo de faturação - Eletrónica | Papel. Ex: 10 = Eletrónica; 01 = Papel; 11 = Eletrónica e Papel"
+PAGAMENTO_COL = (
+    "Modo de pagamento - Débito direto | Multibanco | Numerário/Payshop/CTT. "
+    "Ex: 100 = Débito Direto; 101 = Débito direto e Numerário/Payshop/CTT"
+)
+ATENDIMENTO_COL = (
+    "Modo de atendimento - Escrito | Presencial | Telefónico | Eletrónico. "
+    "Ex: 1000 = Escrito; 1001 = Escrito e Eletrónico; 1101 = Escrito,  Presencial e Eletrónico"
+)
+TIPO_CONTAGEM_COL = (
+    "Ciclos de contagem com oferta - 1 = Simples | 2 = Bi-horária | 3 = Tri-horária | "
+    "ex: 12 = Simples e Bi-horária; 123 = Simples, Bi-horária e Tri-horária"
+)
+
+# Positional columns: digit i set to "1" means flag 1 << i
+POSITIONAL_COLUMNS = {
+    CONTRATACAO_COL: Contratacao,
+    FATURACAO_COL: Faturacao,
+    PAGAMENTO_COL: Pagamento,
+    ATENDIMENTO_COL: Atendimento,
+}
+# Listed columns: each digit d present means flag 1 << (d - 1)
+LISTED_COLUMNS = {
+    TIPO_CONTAGEM_COL: Contagem,
+}
+FLAG_COLUMNS = {**POSITIONAL_COLUMNS, **LISTED_COLUMNS}
+
+# Attribute names of the decoded flags on offer sensors
+FLAG_ATTRIBUTES = {
+    CONTRATACAO_COL: "modos_contratacao",
+    FATURACAO_COL: "modos_faturacao",
+    PAGAMENTO_COL: "modos_pagamento",
+    ATENDIMENTO_COL: "modos_atendimento",
+    TIPO_CONTAGEM_COL: "ciclos_contagem_oferta",
+}
+
+
+def decode_positional(text, flag_type: type[IntFlag]) -> int:
+    """ "101" -> flags 1 and 4; digits beyond the known flags are ignored."""
+    text = text_value(text)
+    value = 0
+    for i, digit in enumerate(text[:len(flag_type)]):
+        if digit == "1":
+            value |= 1 << i
+    return value
+
+
+def decode_listed(text, flag_type: type[IntFlag]) -> int:
+    """ "123" -> flags 1, 2 and 4; unknown digits and blanks are ignored."""
+    value = 0
+    for digit in text_value(text):
+        if digit.isdigit() and 1 <= int(digit) <= len(flag_type):
+            value |= 1 << (int(digit) - 1)
+    return value
+
+
+def decode_column(values: list, column: str) -> np.ndarray:
+    """Decode one flag column into a uint8 array (0 for missing cells).
+
+    The columns only hold a handful of distinct strings, so each one is decoded once.
+    """
+    import numpy as np
+
+    flag_type = FLAG_COLUMNS[column]
+    decode = decode_listed if column in LISTED_COLUMNS else decode_positional
+    decoded: dict = {}
+    out = np.empty(len(values), dtype=np.uint8)
+    for i, v in enumerate(values):
+        bits = decoded.get(v)
+        if bits is None:
+            bits = decoded[v] = decode(v, flag_type)
+        out[i] = bits
+    return out
+
+
+def flag_names(value: int, column: str) -> list[str]:
+    """Lower-case names of the flags set in a decoded value, in flag order."""
+    return [flag.name.lower() for flag in FLAG_COLUMNS[column] if value & flag]
@@ -0,0 +1,264 @@
+"""What-if costs of every offer over the consumption recorded by an energy meter.
+
+The hourly long-term statistics of the meter (the "change" of each hour, in kWh) are
+read from the recorder in batches of BATCH_DAYS and bucketed per day into the tariff
+periods of every metering cycle: simples, then bi-horária and tri-horária, daily and
+weekly cycles (see tariff_periods). An hour is spread evenly over its four 15-minute
+slots, as some periods change on the half or quarter hour. The day buckets are
+stored, so the next query only reads the hours recorded since the last one. The
+bucketing runs in the executor, on a batch of its own that is then added to the
+stored buckets on the event loop.
+
+The cost of the offers over a window of days is then one vectorised pass per
+contagem over the snapshot's cost vectors: termo fixo × days + energy terms @ kWh.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import CONTAGEM_OPTIONS, DOMAIN
+from .snapshot import TariffSnapshot
+from .tariff_periods import LISBON_TZ, PERIOD_NAMES, SCHEDULES, SLOT_MINUTES, get_calendar
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_KEY = f"{DOMAIN}.history"
+STORAGE_VERSION = 1
+# Key of the shared HistoryStore in hass.data[DOMAIN]
+DATA_HISTORY = "history"
+
+# Days of hourly statistics read per recorder query
+BATCH_DAYS = 30
+# Days of buckets kept per meter
+MAX_DAYS = 366
+SAVE_DELAY = 10
+
+# A day's buckets: the simples kWh, then the kWh of each period of every (contagem, ciclo)
+CYCLES: tuple[tuple[str, str | None], ...] = (("1", None), *sorted(SCHEDULES))
+OFFSETS: dict[tuple[str, str | None], int] = {}
+WIDTH = 0
+for _cycle in CYCLES:
+    OFFSETS[_cycle] = WIDTH
+    WIDTH += len(PERIOD_NAMES[_cycle[0]])
+
+_SLOTS_PER_HOUR = 60 // SLOT_MINUTES
+
+# (start, end) -> [(hour start as a UTC timestamp, kWh)]
+HourFetcher = Callable[[datetime, datetime], Awaitable[list[tuple[float, float]]]]
+
+
+def bucket_hours(hours: list[tuple[float, float]], days: dict[str, list[float]] | None = None) -> dict[str, list[float]]:
+    """Add hourly kWh (hour start as a UTC timestamp, kWh) to the day buckets, by local day."""
+    days = {} if days is None else days
+    for start, kwh in hours:
+        local = datetime.fromtimestamp(start, LISBON_TZ)
+        row = days.get(local.date().isoformat())
+        if row is None:
+            row = days[local.date().isoformat()] = [0.0] * WIDTH
+        row[0] += kwh
+        share = kwh / _SLOTS_PER_HOUR
+        for contagem, ciclo in CYCLES[1:]:
+            offset = OFFSETS[(contagem, ciclo)]
+            for period in get_calendar(local.year, contagem, ciclo).slot_periods(local, _SLOTS_PER_HOUR):
+                row[offset + period] += share
+    return days
+
+
+class MeterHistory:
+    """Day buckets of one energy statistic, and up to when they are complete."""
+
+    def __init__(self, statistic_id: str, through: float | None = None, days: dict[str, list[float]] | None = None):
+        self.statistic_id = statistic_id
+        # UTC timestamp of the end of the last hour bucketed
+        self.through = through
+        self.days: dict[str, list[float]] = days or {}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MeterHistory":
+        days = {day: row for day, row in data.get("days", {}).items() if len(row) == WIDTH}
+        return cls(data["statistic_id"], data.get("through"), days)
+
+    def as_dict(self) -> dict:
+        return {
+            "statistic_id": self.statistic_id,
+            "through": self.through,
+            "days": {day: [round(v, 6) for v in row] for day, row in self.days.items()},
+        }
+
+    async def async_update(self, fetch: HourFetcher, now: datetime | None = None) -> int:
+        """Read and bucket the hours recorded since the last update; return how many were read."""
+        end = (now or datetime.now(timezone.utc)).replace(minute=0, second=0, microsecond=0)
+        oldest = end - timedelta(days=MAX_DAYS)
+        start = oldest
+        if self.through is not None:
+            start = max(start, datetime.fromtimestamp(self.through, timezone.utc))
+        read = 0
+        while start < end:
+            batch_end = min(start + timedelta(days=BATCH_DAYS), end)
+            hours = await fetch(start, batch_end)
+            self._add_days(await asyncio.to_thread(bucket_hours, hours))
+            read += len(hours)
+            if batch_end < end:
+                # Older batches are settled, even where the meter recorded nothing
+                self.through = batch_end.timestamp()
+            if hours:
+                # The last hours may not be compiled yet: read again from the last one recorded
+                self.through = max(self.through or 0.0, max(h for h, _ in hours) + 3600)
+            start = batch_end
+        first_day = oldest.astimezone(LISBON_TZ).date().isoformat()
+        for day in [d for d in self.days if d < first_day]:
+            del self.days[day]
+        return read
+
+    def _add_days(self, days: dict[str, list[float]]) -> None:
+        for day, row in days.items():
+            stored = self.days.get(day)
+            if stored is None:
+                self.days[day] = row
+            else:
+                for i, value in enumerate(row):
+                    stored[i] += value
+
+    def window(self, dias: int, today: date | None = None) -> tuple[date, date] | None:
+        """First and last day with buckets among the `dias` complete days before today."""
+        today = today or datetime.now(LISBON_TZ).date()
+        first, last = (today - timedelta(days=dias)).isoformat(), (today - timedelta(days=1)).isoformat()
+        recorded = [day for day in self.days if first <= day <= last]
+        if not recorded:
+            return None
+        return date.fromisoformat(min(recorded)), date.fromisoformat(max(recorded))
+
+    def totals(self, first: date, last: date) -> list[float]:
+        """Bucket sums of the days from first to last, inclusive."""
+        first_day, last_day = first.isoformat(), last.isoformat()
+        sums = [0.0] * WIDTH
+        for day, row in self.days.items():
+            if first_day <= day <= last_day:
+                for i, value in enumerate(row):
+                    sums[i] += value
+        return sums
+
+
+def period_kwh(totals: list[float], contagem: str, ciclo: str) -> list[float]:
+    """kWh per period of a metering cycle, indexed like the energy terms of a CostVector."""
+    cycle = (contagem, None if contagem == "1" else ciclo)
+    offset = OFFSETS[cycle]
+    return totals[offset:offset + len(PERIOD_NAMES[contagem])]
+
+
+def what_if(snapshot: TariffSnapshot, statistic_id: str, first: date, last: date, totals: list[float],
+            pot_cont: str, ciclo: str, limit: int) -> dict:
+    """Cost of every electricity offer over the bucket totals of the days first..last, cheapest first. Blocking."""
+    import numpy as np
+
+    days = (last - first).days + 1
+    consumo = {"total": round(totals[0], 3)}
+    offers = []
+    for contagem, label in CONTAGEM_OPTIONS.items():
+        kwh = period_kwh(totals, contagem, ciclo)
+        if contagem != "1":
+            consumo[label] = {name: round(v, 3) for name, v in zip(PERIOD_NAMES[contagem], kwh)}
+        vector = snapshot.cost_vector(pot_cont, contagem)
+        if vector is None:
+            continue
+        costs = vector.period_costs(days, kwh)
+        for i in np.argsort(costs, kind="stable")[:limit].tolist():
+            offers.append({
+                "codigo": str(vector.codes[i]),
+                "nome": str(vector.names[i]),
+                "comercializador": str(vector.comercializadores[i]),
+                "ciclo_contagem": label,
+                "custo": round(float(costs[i]), 2),
+            })
+    offers.sort(key=lambda o: o["custo"])
+    return {
+        "statistic_id": statistic_id,
+        "inicio": first.isoformat(),
+        "fim": last.isoformat(),
+        "dias": days,
+        "consumo_kwh": consumo,
+        "ofertas": offers[:limit],
+    }
+
+
+def recorder_fetcher(hass: HomeAssistant, statistic_id: str) -> HourFetcher:
+    """Hourly kWh of a statistic from the recorder's long-term statistics."""
+    from homeassistant.components.recorder import get_instance
+    from homeassistant.components.recorder.statistics import statistics_during_period
+
+    async def fetch(start: datetime, end: datetime) -> list[tuple[float, float]]:
+        rows = await get_instance(hass).async_add_executor_job(
+            statistics_during_period, hass, start, end, {statistic_id}, "hour", {"energy": "kWh"}, {"change"}
+        )
+        return [(row["start"], row["change"]) for row in rows.get(statistic_id, []) if row.get("change") is not None]
+
+    return fetch
+
+
+class HistoryStore:
+    """Day buckets of every meter queried, persisted in one store."""
+
+    def __init__(self):
+        self.meters: dict[str, MeterHistory] = {}
+        self._lock = asyncio.Lock()
+        self._store: Store | None = None
+
+    async def async_load(self, hass: HomeAssistant) -> None:
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        try:
+            stored = await self._store.async_load()
+        except Exception as e:
+            _LOGGER.debug("Could not load stored consumption history: %s", e)
+            stored = None
+        for data in (stored or {}).get("meters", []):
+            meter = MeterHistory.from_dict(data)
+            self.meters[meter.statistic_id] = meter
+
+    async def _async_update(self, hass: HomeAssistant, statistic_id: str, fetch: HourFetcher | None) -> MeterHistory:
+        meter = self.meters.get(statistic_id)
+        if meter is None:
+            meter = self.meters[statistic_id] = MeterHistory(statistic_id)
+        read = await meter.async_update(fetch or recorder_fetcher(hass, statistic_id))
+        _LOGGER.debug("Read %d hours of %s, %d days bucketed", read, statistic_id, len(meter.days))
+        if read and self._store is not None:
+            self._store.async_delay_save(
+                lambda: {"meters": [m.as_dict() for m in self.meters.values()]}, SAVE_DELAY
+            )
+        return meter
+
+    async def async_meter(self, hass: HomeAssistant, statistic_id: str, fetch: HourFetcher | None = None) -> MeterHistory:
+        """Day buckets of a statistic, brought up to date with the hours recorded since the last query.
+
+        The meter is updated in place by later queries: read it on the event loop only.
+        """
+        async with self._lock:
+            return await self._async_update(hass, statistic_id, fetch)
+
+    async def async_totals(self, hass: HomeAssistant, statistic_id: str, dias: int,
+                           fetch: HourFetcher | None = None) -> tuple[date, date, list[float]] | None:
+        """First and last day of the last `dias` days with buckets, and their sums (None: nothing recorded).
+
+        Taken under the lock, so the sums can be handed to a worker thread.
+        """
+        async with self._lock:
+            meter = await self._async_update(hass, statistic_id, fetch)
+            window = meter.window(dias)
+            if window is None:
+                return None
+            return (*window, meter.totals(*window))
+
+
+async def async_get_history(hass: HomeAssistant) -> HistoryStore:
+    """Return the shared HistoryStore, loading it on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    history = domain_data.get(DATA_HISTORY)
+    if history is None:
+        history = domain_data[DATA_HISTORY] = HistoryStore()
+        await history.async_load(hass)
+    return history
@@ -0,0 +1,354 @@
+"""Pandas-free data engine for constrained hosts.
+
+The ERSE CSVs are parsed with the stdlib csv module into array-backed columns:
+text cells are interned strings, so repeated values (comercializador, codes, segments,
+cycles) share one object, and price columns also get an array('d') for the cost paths.
+Merged and filtered frames never copy cells; they keep array('i') row positions into
+the parsed tables.
+
+LiteFrame implements the subset of the DataFrame API used by the coordinator, the
+sensors and the snapshot indexes, so the rest of the integration works with either
+engine behind the same async_process_csv contract.
+"""
+from __future__ import annotations
+
+import csv
+import logging
+import math
+import sys
+from array import array
+from io import StringIO
+
+from .snapshot import normalize_pot, pot_values
+
+_LOGGER = logging.getLogger(__name__)
+
+# Same cells pandas.read_csv treats as missing with na_filter=True
+NA_VALUES = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+    "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+})
+
+# Price columns (mapped names) that also get an array('d') next to their text
+NUMERIC_COLUMNS = frozenset({
+    "Termo fixo (€/dia)",
+    "Termo de energia (€/kWh) - Simples | Fora de Vazio | Ponta",
+    "Termo de energia (€/kWh) - Vazio | Cheias",
+    "Termo de energia (€/kWh) - Vazio",
+    "Termo fixo (€/dia) - Gás Natural",
+    "Termo de energia (€/kWh) - Gás Natural",
+})
+
+
+def _to_float(value) -> float:
+    if value is None:
+        return math.nan
+    try:
+        return float(str(value).replace(",", ".").strip())
+    except ValueError:
+        return math.nan
+
+
+class LiteTable:
+    """Columns of one parsed CSV file: text per column, floats for the price columns."""
+
+    def __init__(self, columns: dict, floats: dict, nrows: int):
+        self.columns = columns
+        self.floats = floats
+        self.nrows = nrows
+
+
+def make_table(columns: dict[str, list]) -> LiteTable:
+    """Table of text columns (None = missing), with the floats of its price columns."""
+    floats = {
+        name: array("d", map(_to_float, values))
+        for name, values in columns.items() if name in NUMERIC_COLUMNS
+    }
+    nrows = len(next(iter(columns.values()))) if columns else 0
+    return LiteTable(columns, floats, nrows)
+
+
+def parse_csv(csv_text: str, label: str, header_mapping: dict[str, str]) -> LiteTable:
+    """Parse a CSV (';' then ',') into interned text columns and float price columns."""
+    intern = sys.intern
+    for sep in (";", ","):
+        reader = csv.reader(StringIO(csv_text), delimiter=sep)
+        header = next(reader, None)
+        if not header or len(header) <= 1:
+            _LOGGER.debug("%s parse fail sep='%s'", label, sep)
+            continue
+
+        names = [header_mapping.get(h, h) for h in header]
+        cells = [[] for _ in names]
+        width = len(names)
+        nrows = 0
+        for record in reader:
+            if not record:
+                continue
+            nrows += 1
+            if len(record) < width:
+                record = record + [""] * (width - len(record))
+            for col, value in zip(cells, record):
+                col.append(None if value in NA_VALUES else intern(value))
+
+        _LOGGER.debug("%s parsed sep='%s' rows=%d cols=%s", label, sep, nrows, names)
+        return make_table(dict(zip(names, cells)))
+
+    _LOGGER.warning("%s empty/unparsable", label)
+    return LiteTable({}, {}, 0)
+
+
+class LiteColumn:
+    """Read-only view of one column over a set of frame rows."""
+
+    __hash__ = None
+
+    def __init__(self, name: str, values, positions, missing=None, floats=None):
+        self.name = name
+        self._values = values
+        self._positions = positions
+        self._missing = missing
+        self._floats = floats
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __iter__(self):
+        values, missing = self._values, self._missing
+        for j in self._positions:
+            yield values[j] if j >= 0 else missing
+
+    def tolist(self) -> list:
+        return list(self)
+
+    def to_float_array(self) -> array:
+        """Values as array('d'), NaN where missing."""
+        if self._floats is not None:
+            floats = self._floats
+            return array("d", (floats[j] if j >= 0 else math.nan for j in self._positions))
+        return array("d", map(_to_float, self))
+
+    def astype(self, _type) -> "LiteColumn":
+        values = ["nan" if v is None else str(v) for v in self]
+        return LiteColumn(self.name, values, range(len(values)))
+
+    def isna(self) -> list[bool]:
+        return [v is None for v in self]
+
+    def notna(self) -> list[bool]:
+        return [not na for na in self.isna()]
+
+    def dropna(self) -> "LiteColumn":
+        values = [v for v, na in zip(self, self.isna()) if not na]
+        return LiteColumn(self.name, values, range(len(values)))
+
+    def unique(self) -> "LiteColumn":
+        values = list(dict.fromkeys(self))
+        return LiteColumn(self.name, values, range(len(values)))
+
+    def isin(self, values) -> list[bool]:
+        wanted = set(values)
+        return [v in wanted for v in self]
+
+    def __eq__(self, other) -> list[bool]:
+        return [v == other for v in self]
+
+    def __ne__(self, other) -> list[bool]:
+        return [v != other for v in self]
+
+
+class LiteRow(dict):
+    """One frame row; a dict keyed by column name, like a pandas row Series."""
+
+    def to_dict(self) -> dict:
+        return dict(self)
+
+
+class _ILoc:
+    def __init__(self, frame: "LiteFrame"):
+        self._frame = frame
+
+    def __getitem__(self, i: int) -> LiteRow:
+        return self._frame._row(self._frame._rows[i])
+
+
+class LiteFrame:
+    """Array-backed frame: a source per column plus the selected base row positions.
+
+    A source is (values, index, missing, floats); `index` maps a base row to a position
+    in `values` and `floats` (-1 = missing, None = identity).
+    """
+
+    def __init__(self, sources: dict, rows):
+        self._sources = sources
+        self._rows = rows
+
+    @property
+    def columns(self) -> list[str]:
+        return list(self._sources)
+
+    @property
+    def empty(self) -> bool:
+        return len(self._rows) == 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def iloc(self) -> _ILoc:
+        return _ILoc(self)
+
+    def _positions(self, index):
+        if index is None:
+            return self._rows
+        return array("i", (index[r] for r in self._rows))
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            values, index, missing, floats = self._sources[key]
+            return LiteColumn(key, values, self._positions(index), missing, floats)
+        # Boolean mask
+        return LiteFrame(self._sources, array("i", (r for r, keep in zip(self._rows, key) if keep)))
+
+    def _value(self, name: str, base_row: int):
+        values, index, missing, _ = self._sources[name]
+        j = base_row if index is None else index[base_row]
+        return values[j] if j >= 0 else missing
+
+    def _row(self, base_row: int) -> LiteRow:
+        return LiteRow((name, self._value(name, base_row)) for name in self._sources)
+
+    def iterrows(self):
+        for i, r in enumerate(self._rows):
+            yield i, self._row(r)
+
+    def with_column(self, name: str, values, index=None, missing=None) -> "LiteFrame":
+        sources = dict(self._sources)
+        sources[name] = (values, index, missing, None)
+        return LiteFrame(sources, self._rows)
+
+    def reset_index(self, drop: bool = True) -> "LiteFrame":
+        return self
+
+    def copy(self) -> "LiteFrame":
+        return self
+
+
+def table_frame(table: LiteTable) -> LiteFrame:
+    """Frame over all rows of one parsed table."""
+    sources = {
+        name: (values, None, None, table.floats.get(name))
+        for name, values in table.columns.items()
+    }
+    return LiteFrame(sources, array("i", range(table.nrows)))
+
+
+def empty_frame() -> LiteFrame:
+    return LiteFrame({}, array("i"))
+
+
+def merge_tables(cond: LiteTable, precos: LiteTable, code_cond: str, code_prec: str) -> LiteFrame:
+    """Left join like cond_df.merge(precos_df, how="left", suffixes=("", "_preco"))."""
+    matches: dict = {}
+    for j, code in enumerate(precos.columns[code_prec]):
+        matches.setdefault(code, []).append(j)
+
+    left = array("i")
+    right = array("i")
+    for i, code in enumerate(cond.columns[code_cond]):
+        for j in matches.get(code, (-1,)):
+            left.append(i)
+            right.append(j)
+
+    sources = {}
+    for name, values in cond.columns.items():
+        sources[name] = (values, left, None, cond.floats.get(name))
+    for name, values in precos.columns.items():
+        if name == code_prec and code_prec == code_cond:
+            continue
+        out = f"{name}_preco" if name in sources else name
+        sources[out] = (values, right, None, precos.floats.get(name))
+    return LiteFrame(sources, array("i", range(len(left))))
+
+
+def normalize_pot_column(frame: LiteFrame, pot_col: str) -> LiteFrame:
+    """Add `<pot_col>__norm` without copying the rows: only distinct values are normalized."""
+    values, index, _, _ = frame._sources[pot_col]
+    norm = [None if v is None else str(v).replace(",", ".").strip() for v in values]
+    return frame.with_column(f"{pot_col}__norm", norm, index)
+
+
+def _str_upper_strip(v) -> str:
+    return "" if v is None else str(v).upper().strip()
+
+
+def filter_frame(cond: LiteFrame, merged: LiteFrame, fornec_col, code_cols, codes=None,
+                 comercializador=None, pot_cont=None, energy_type="ele") -> LiteFrame:
+    """Same filters, fallbacks and logging as data_loader.filter_snapshot.
+
+    codes is the offer code selection already computed by filter_snapshot (None = all).
+    """
+    if cond.empty:
+        return cond
+
+    # Filter by energy type (ELE, GN, Dual, or All)
+    if fornec_col and fornec_col in merged.columns and energy_type != "all":
+        before = len(merged)
+        fornec = [_str_upper_strip(v) for v in merged[fornec_col]]
+        if energy_type == "ele":
+            merged = merged[[v.startswith("ELE") for v in fornec]]
+            _LOGGER.debug("ELE filter %d -> %d", before, len(merged))
+        elif energy_type == "gn":
+            merged = merged[[v.startswith("GN") for v in fornec]]
+            _LOGGER.debug("GN filter %d -> %d", before, len(merged))
+        elif energy_type == "dual":
+            merged = merged[[v in ("ELE", "DUAL") for v in fornec]]
+            _LOGGER.debug("ELE+DUAL filter %d -> %d", before, len(merged))
+
+        if merged.empty:
+            _LOGGER.warning("All rows removed by energy type filter (%s). Keeping original (skipping filter).", energy_type)
+            merged = cond
+
+    # Filter by selected codes and offer filters, in one selection
+    if codes is not None:
+        code_final = next((c for c in code_cols if c in merged.columns), None)
+        if code_final:
+            before = len(merged)
+            merged = merged[merged[code_final].isin(codes)]
+            _LOGGER.debug("Codes filter (%d) %d -> %d", len(codes), before, len(merged))
+        else:
+            _LOGGER.warning("Code column not found for codes filter.")
+
+    # Filter by comercializador
+    if comercializador:
+        comercializador_col = "Comercializador"
+        if comercializador_col in merged.columns:
+            before = len(merged)
+            merged = merged[merged[comercializador_col] == comercializador]
+            _LOGGER.debug("Comercializador filter '%s': %d -> %d", comercializador, before, len(merged))
+        else:
+            _LOGGER.warning("Comercializador column not found for comercializador filter.")
+
+    # Filter by power capacity (pot_cont: one potência or a list of them)
+    if pot_cont:
+        pot_cols = ["Potência contratada", "Potência contratada__norm", "Pot_Cont", "Pot_Cont__norm"]
+        pot_col = next((c for c in pot_cols if c in merged.columns), None)
+        if pot_col:
+            before = len(merged)
+            pots = {normalize_pot(p) for p in pot_values(pot_cont)}
+            filtered = merged[[
+                v is not None and normalize_pot(v) in pots
+                for v in merged[pot_col]
+            ]]
+            if not filtered.empty:
+                merged = filtered
+                _LOGGER.debug("Power filter '%s': %d -> %d rows", pot_cont, before, len(merged))
+            else:
+                _LOGGER.warning("Power filter '%s' removed all rows. Available: %s",
+                                pot_cont, sorted(v for v in merged[pot_col].dropna().unique()))
+        else:
+            _LOGGER.warning("Power column not found for power filter. Available columns: %s",
+                            list(merged.columns))
+
+    _LOGGER.debug("Final DF rows=%d cols=%d", len(merged), len(merged.columns))
+    return merged
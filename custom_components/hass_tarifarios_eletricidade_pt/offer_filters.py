@@ -0,0 +1,200 @@
+"""Offer filters (loyalty, renewable, price type, ...) compiled into one selection.
+
+The entry options are compiled into a tuple of predicates, (op, column, argument):
+
+    ("eq", column, "N")           the Sim/Não flag equals the argument
+    ("bits", column, flags)       every flag of a decoded bitmask column is set (see flags)
+    ("valid_on", None, ordinal)   valid on that day (see validity.ValidityIndex)
+    ("consumption", fuel, kwh)    eligible for that annual consumption (see consumption_predicate)
+
+OfferIndex decodes the per-offer columns of a snapshot once, caches one boolean array
+per predicate, and ANDs the arrays of a compiled filter into a single mask over the
+offers, so filter_snapshot applies every offer filter with one code selection.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime
+from typing import TYPE_CHECKING
+
+from .consumption import CONSUMPTION_COLUMNS, ConsumptionIndex
+from .flags import (
+    CONTRATACAO_COL,
+    FATURACAO_COL,
+    FLAG_ATTRIBUTES,
+    FLAG_COLUMNS,
+    PAGAMENTO_COL,
+    Contratacao,
+    Faturacao,
+    Pagamento,
+    decode_column,
+    flag_names,
+)
+from .snapshot import CODE_COL, column_values, float_values, text_value
+from .tariff_periods import LISBON_TZ
+from .validity import DATA_FIM_COL, DATA_INI_COL, ValidityIndex
+
+if TYPE_CHECKING:
+    import numpy as np
+
+_LOGGER = logging.getLogger(__name__)
+
+FIDELIZACAO_COL = "Tem fidelização? (Sim/Não)"
+RENOVAVEL_COL = "Tem origem 100% renovável? (Sim/Não)"
+PRECOS_INDEX_COL = "Tem preços indexados? (Sim/Não)"
+SERVICOS_ADIC_COL = "Tem serviços adicionais obrigatórios? (Sim/Não)"
+
+# Boolean entry options and the predicate each one adds when enabled
+FLAG_FILTERS = {
+    "sem_fidelizacao": ("eq", FIDELIZACAO_COL, "N"),
+    "renovavel": ("eq", RENOVAVEL_COL, "S"),
+    "sem_servicos_adicionais": ("eq", SERVICOS_ADIC_COL, "N"),
+    "contratacao_eletronica": ("bits", CONTRATACAO_COL, int(Contratacao.ELETRONICA)),
+    "fatura_eletronica": ("bits", FATURACAO_COL, int(Faturacao.ELETRONICA)),
+    "debito_direto": ("bits", PAGAMENTO_COL, int(Pagamento.DEBITO_DIRETO)),
+}
+# Values of the "tipo_precos" option (see const.PRICE_TYPE_OPTIONS)
+PRICE_TYPE_FILTERS = {
+    "fixos": ("eq", PRECOS_INDEX_COL, "N"),
+    "indexados": ("eq", PRECOS_INDEX_COL, "S"),
+}
+OFFER_FILTER_KEYS = (*FLAG_FILTERS, "tipo_precos", "em_vigor")
+
+# Compiled selections kept per snapshot (the em_vigor day makes a new one daily)
+MAX_CACHED_SELECTIONS = 32
+
+
+def offer_filters_from_config(config: dict) -> dict:
+    """The offer filter options of an entry's data/options."""
+    return {key: config[key] for key in OFFER_FILTER_KEYS if config.get(key)}
+
+
+def consumption_predicate(kwh: float, fuel: str = "ele") -> tuple:
+    """Predicate of the offers whose ConsIni/ConsFim range contains an annual consumption."""
+    return ("consumption", fuel, float(kwh))
+
+
+def compile_filters(filters: dict | None, today: date | None = None) -> tuple[tuple, ...]:
+    """Compile offer filter options into predicates; () when nothing is filtered."""
+    if not filters:
+        return ()
+    predicates = [predicate for key, predicate in FLAG_FILTERS.items() if filters.get(key)]
+    price_type = PRICE_TYPE_FILTERS.get(filters.get("tipo_precos"))
+    if price_type is not None:
+        predicates.append(price_type)
+    if filters.get("em_vigor"):
+        today = today or datetime.now(LISBON_TZ).date()
+        predicates.append(("valid_on", None, today.toordinal()))
+    return tuple(predicates)
+
+
+class OfferIndex:
+    """Per-offer columns of a snapshot decoded once into arrays aligned with the offer codes."""
+
+    def __init__(self, cond_df):
+        import numpy as np
+
+        self._cond = cond_df
+        codes = column_values(cond_df, CODE_COL) if not cond_df.empty else []
+        self.codes = np.array([text_value(c) for c in codes], dtype=object)
+        self._has_code = np.array([c is not None for c in codes], dtype=bool)
+        self._positions = {code: i for i, code in enumerate(self.codes.tolist())}
+        # Bitmask columns decoded into uint8 bitfields (flags.FLAG_COLUMNS)
+        self.bits: dict[str, np.ndarray] = {
+            column: decode_column(column_values(cond_df, column), column) for column in FLAG_COLUMNS
+        }
+        self._masks: dict[tuple, np.ndarray] = {}
+        self._selections: dict[tuple, frozenset] = {}
+        self._validity = None
+        # Valid offer codes per validity segment
+        self._valid_codes: dict[int, frozenset] = {}
+        self._consumption: dict[str, ConsumptionIndex] = {}
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def _upper_values(self, column: str) -> list[str]:
+        return [text_value(v).upper() for v in column_values(self._cond, column)]
+
+    @property
+    def validity(self) -> ValidityIndex:
+        """Interval index of the offers' validity dates, parsed once."""
+        if self._validity is None:
+            self._validity = ValidityIndex.from_values(
+                column_values(self._cond, DATA_INI_COL),
+                column_values(self._cond, DATA_FIM_COL),
+            )
+        return self._validity
+
+    def valid_codes(self, day: date) -> frozenset[str]:
+        """Codes of the offers valid on `day` (one binary search, then cached per segment)."""
+        segment = self.validity.segment(day)
+        codes = self._valid_codes.get(segment)
+        if codes is None:
+            codes = self._valid_codes[segment] = frozenset(
+                self.codes[self.validity.masks[segment] & self._has_code].tolist()
+            )
+        return codes
+
+    def consumption(self, fuel: str = "ele") -> ConsumptionIndex:
+        """Range index of the offers' consumption limits for one fuel, parsed once."""
+        index = self._consumption.get(fuel)
+        if index is None:
+            lower, upper = CONSUMPTION_COLUMNS[fuel]
+            index = self._consumption[fuel] = ConsumptionIndex(
+                float_values(self._cond, lower), float_values(self._cond, upper)
+            )
+        return index
+
+    def eligible_codes(self, kwh: float, fuel: str = "ele") -> frozenset[str]:
+        """Codes of the offers whose consumption range contains `kwh`."""
+        return self.select((consumption_predicate(kwh, fuel),))
+
+    def mask(self, predicate: tuple) -> np.ndarray:
+        """Boolean array of the offers matching one predicate (cached)."""
+        import numpy as np
+
+        op, column, argument = predicate
+        if op == "consumption":
+            # Cached per consumption region by the index, not per kWh value
+            return self.consumption(column).eligible_mask(argument)
+        cached = self._masks.get(predicate)
+        if cached is not None:
+            return cached
+        if op == "eq":
+            result = np.array(self._upper_values(column), dtype=object) == argument
+        elif op == "bits":
+            result = (self.bits[column] & argument) == argument
+        elif op == "valid_on":
+            result = self.validity.valid_mask(date.fromordinal(argument))
+        else:
+            raise ValueError(f"Unknown offer filter predicate: {op}")
+        self._masks[predicate] = result
+        return result
+
+    def flags(self, code: str) -> dict[str, list[str]]:
+        """Decoded flags of one offer, by attribute name ({} for an unknown code)."""
+        i = self._positions.get(code)
+        if i is None:
+            return {}
+        return {
+            FLAG_ATTRIBUTES[column]: flag_names(int(values[i]), column)
+            for column, values in self.bits.items()
+        }
+
+    def select(self, predicates: tuple[tuple, ...]) -> frozenset[str]:
+        """Codes of the offers matching every predicate: one AND of the cached masks."""
+        import numpy as np
+
+        cached = self._selections.get(predicates)
+        if cached is not None:
+            return cached
+        mask = self._has_code.copy()
+        if predicates:
+            mask &= np.logical_and.reduce([self.mask(p) for p in predicates])
+        selection = frozenset(self.codes[mask].tolist())
+        if len(self._selections) >= MAX_CACHED_SELECTIONS:
+            self._selections.clear()
+        self._selections[predicates] = selection
+        _LOGGER.debug("Offer filters %s select %d of %d offers", predicates, len(selection), len(self.codes))
+        return selection
@@ -0,0 +1,211 @@
+"""Offer queries over an in-memory snapshot: filters, sort keys, column projection and cursor pages.
+
+A query is filtered (filter_snapshot) and sorted once into an OfferView, the row
+order of the result; pages then only read the projected columns of their rows. Views
+are kept per (snapshot, filters, sort) in a small LRU, so paging through a result does
+not filter or sort again.
+
+Cursors are opaque to clients: they carry the offset of the next page and the
+snapshot and query they belong to, and expire when a new ERSE release replaces the
+snapshot.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .data_loader import filter_snapshot
+from .offer_filters import OFFER_FILTER_KEYS, offer_filters_from_config
+from .snapshot import column_values, text_value
+
+if TYPE_CHECKING:
+    from .snapshot import TariffSnapshot
+
+_LOGGER = logging.getLogger(__name__)
+
+# Key of the shared OfferQueries in hass.data[DOMAIN]
+DATA_OFFER_QUERIES = "offer_queries"
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+MAX_CACHED_VIEWS = 16
+
+# Keys of a query's "filters": the entry filters, then the offer filter options
+QUERY_FILTER_KEYS = ("comercializador", "codigos_oferta", "pot_cont", "energy_type", *OFFER_FILTER_KEYS)
+
+
+class QueryError(ValueError):
+    """Invalid query: unknown column, malformed or expired cursor."""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def query_key(filters: dict, sort: list[str]) -> str:
+    """Stable digest of a query's filters and sort keys (the column projection is per page)."""
+    payload = json.dumps({"filters": filters, "sort": sort}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def encode_cursor(snapshot_hash: str, key: str, offset: int) -> str:
+    payload = json.dumps({"s": snapshot_hash[:16], "q": key, "o": offset}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, snapshot_hash: str, key: str) -> int:
+    """Offset of a cursor of this snapshot and query; QueryError otherwise."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        offset = int(payload["o"])
+        snapshot, query = payload["s"], payload["q"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise QueryError("invalid_cursor", "Malformed cursor") from e
+    if query != key:
+        raise QueryError("invalid_cursor", "Cursor belongs to another query")
+    if snapshot != snapshot_hash[:16]:
+        raise QueryError("cursor_expired", "A new ERSE release replaced the data of this cursor")
+    return max(offset, 0)
+
+
+def _sort_value(value):
+    """Sort key of a cell: numbers (Portuguese decimal comma) before text, None for missing."""
+    text = text_value(value)
+    if not text:
+        return None
+    try:
+        return (0, float(text.replace(",", ".")), "")
+    except ValueError:
+        return (1, 0.0, text.casefold())
+
+
+class OfferView:
+    """Rows of a filtered frame in query order, with lazily extracted columns."""
+
+    def __init__(self, frame, order: list[int]):
+        self.frame = frame
+        self.order = order
+        self._columns: dict[str, list] = {}
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def _column(self, name: str) -> list:
+        values = self._columns.get(name)
+        if values is None:
+            values = self._columns[name] = column_values(self.frame, name)
+        return values
+
+    def rows(self, offset: int, limit: int, columns: list[str]) -> list[dict]:
+        """Rows offset..offset + limit with only the projected columns."""
+        positions = self.order[offset:offset + limit]
+        values = [self._column(c) for c in columns]
+        return [{c: v[i] for c, v in zip(columns, values)} for i in positions]
+
+
+def query_frame(snapshot: TariffSnapshot, filters: dict):
+    """Rows of a snapshot matching a query's filters (QUERY_FILTER_KEYS); every energy type by default."""
+    return filter_snapshot(
+        snapshot,
+        codigos_oferta=filters.get("codigos_oferta"),
+        comercializador=filters.get("comercializador"),
+        pot_cont=filters.get("pot_cont"),
+        energy_type=filters.get("energy_type", "all"),
+        offer_filters=offer_filters_from_config(filters),
+    )
+
+
+def build_view(snapshot: TariffSnapshot, filters: dict, sort: list[str]) -> OfferView:
+    """Filter a snapshot and order its rows by the sort keys ("-column" descending, missing values last)."""
+    frame = query_frame(snapshot, filters)
+    check_columns(frame, [key.lstrip("-") for key in sort])
+    order = list(range(len(frame)))
+    # Stable sorts from the last key to the first give the multi-key order
+    for key in reversed(sort):
+        descending = key.startswith("-")
+        keys = [_sort_value(v) for v in column_values(frame, key.lstrip("-"))]
+        present = sorted((i for i in order if keys[i] is not None), key=keys.__getitem__, reverse=descending)
+        order = present + [i for i in order if keys[i] is None]
+    return OfferView(frame, order)
+
+
+def check_columns(frame, columns: list[str]) -> None:
+    unknown = [c for c in columns if c not in frame.columns]
+    if unknown:
+        raise QueryError("unknown_column", f"Unknown columns: {', '.join(unknown)}")
+
+
+class OfferQueries:
+    """Views of the recent queries, least recently used evicted first (shared by executor threads)."""
+
+    def __init__(self, size: int = MAX_CACHED_VIEWS):
+        self._size = size
+        self._views: OrderedDict[tuple, OfferView] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._views)
+
+    def get(self, snapshot_hash: str, key: str) -> OfferView | None:
+        with self._lock:
+            view = self._views.get((snapshot_hash, key))
+            if view is not None:
+                self._views.move_to_end((snapshot_hash, key))
+            return view
+
+    def put(self, snapshot_hash: str, key: str, view: OfferView) -> None:
+        with self._lock:
+            self._views[(snapshot_hash, key)] = view
+            self._views.move_to_end((snapshot_hash, key))
+            while len(self._views) > self._size:
+                self._views.popitem(last=False)
+
+
+def loaded_snapshot(hass: HomeAssistant, entry_id: str | None = None) -> TariffSnapshot | None:
+    """Snapshot of an entry's coordinator, or of any loaded entry when no entry is given."""
+    domain_data = hass.data.get(DOMAIN, {})
+    entries = [domain_data.get(entry_id)] if entry_id else list(domain_data.values())
+    for entry_data in entries:
+        if isinstance(entry_data, dict) and "coordinator" in entry_data:
+            snapshot = entry_data["coordinator"].snapshot
+            if snapshot is not None and not snapshot.empty:
+                return snapshot
+    return None
+
+
+def get_offer_queries(hass: HomeAssistant) -> OfferQueries:
+    """Return the shared OfferQueries, creating it on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    queries = domain_data.get(DATA_OFFER_QUERIES)
+    if queries is None:
+        queries = domain_data[DATA_OFFER_QUERIES] = OfferQueries()
+    return queries
+
+
+def run_query(queries: OfferQueries, snapshot: TariffSnapshot, filters: dict, sort: list[str],
+              columns: list[str] | None, cursor: str | None, limit: int = DEFAULT_LIMIT) -> dict:
+    """One page of a query: rows, total, and the cursor of the next page (None on the last)."""
+    key = query_key(filters, sort)
+    offset = decode_cursor(cursor, snapshot.hash, key) if cursor else 0
+    view = queries.get(snapshot.hash, key)
+    if view is None:
+        view = build_view(snapshot, filters, sort)
+        queries.put(snapshot.hash, key, view)
+        _LOGGER.debug("Offer query %s: %d rows", key, len(view))
+    columns = list(columns) if columns else list(view.frame.columns)
+    check_columns(view.frame, columns)
+    end = offset + limit
+    return {
+        "rows": view.rows(offset, limit, columns),
+        "columns": columns,
+        "total": len(view),
+        "next_cursor": encode_cursor(snapshot.hash, key, end) if end < len(view) else None,
+        "snapshot_hash": snapshot.hash,
+    }
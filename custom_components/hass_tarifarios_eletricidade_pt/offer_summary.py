@@ -0,0 +1,100 @@
+"""Aggregate view of an entry's offers: summary statistics and paginated details.
+
+In catalogue mode an entry gets a handful of summary sensors instead of one sensor
+per offer, so large suppliers (over a hundred EDPC offers) are tracked with a
+constant entity count. The summary is built once per filtered frame from the
+snapshot's price index and cost vector; the sensors only read it, and the
+offer_details service pages through its rows.
+"""
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING
+
+from .snapshot import CODE_COL, NAME_COL, column_values, text_value
+from .tariff_periods import PERIOD_NAMES
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from .snapshot import TariffSnapshot
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def offer_names(df: pd.DataFrame) -> dict[str, str]:
+    """Commercial name of every offer code of a filtered frame, in frame order."""
+    names: dict[str, str] = {}
+    for code, name in zip(column_values(df, CODE_COL), column_values(df, NAME_COL)):
+        if code is not None:
+            names.setdefault(text_value(code), text_value(name))
+    return names
+
+
+class OfferSummary:
+    """Offers of an entry sorted by estimated annual cost, with termo fixo statistics."""
+
+    def __init__(self, offers: list[dict]):
+        import numpy as np
+
+        self.offers = offers
+        termos = np.array([o["termo_fixo_eur_dia"] for o in offers if o["termo_fixo_eur_dia"] is not None], dtype=float)
+        self.termo_fixo_min = round(float(termos.min()), 4) if len(termos) else None
+        self.termo_fixo_mediano = round(float(np.median(termos)), 4) if len(termos) else None
+        self.termo_fixo_max = round(float(termos.max()), 4) if len(termos) else None
+        # Offers without an electricity price at the entry's potência have no cost and sort last
+        self.cheapest = offers[0] if offers and offers[0]["custo_anual"] is not None else None
+
+    def __len__(self) -> int:
+        return len(self.offers)
+
+    def page(self, offset: int = 0, limit: int = DEFAULT_PAGE_SIZE, valid_codes=None) -> dict:
+        """Rows offset..offset + limit; `valida` is filled from valid_codes (None: unknown)."""
+        rows = self.offers[offset:offset + limit]
+        if valid_codes is not None:
+            rows = [{**row, "valida": row["codigo"] in valid_codes} for row in rows]
+        return {
+            "total": len(self.offers),
+            "offset": offset,
+            "limit": limit,
+            "next_offset": offset + limit if offset + limit < len(self.offers) else None,
+            "ofertas": rows,
+        }
+
+
+def build_offer_summary(snapshot: TariffSnapshot, data: pd.DataFrame, pot_cont, contagem: str, kwh: float, escalao_gn) -> OfferSummary:
+    """Summarise an entry's filtered frame at one potência, metering cycle, consumption and escalão."""
+    if data is None or snapshot is None:
+        return OfferSummary([])
+    names = offer_names(data)
+    prices = snapshot.offer_prices
+    periods = PERIOD_NAMES.get(str(contagem), ())
+    # Energy terms and annual cost from the (potência, contagem) cost vector
+    cycle: dict[str, tuple[dict, float]] = {}
+    vector = snapshot.cost_vector(pot_cont, contagem)
+    vector = vector.restrict(names) if vector is not None else None
+    if vector is not None:
+        costs = vector.annual_costs(kwh, contagem).round(2).tolist()
+        for code, terms, cost in zip(vector.codes.tolist(), vector.energy_terms.tolist(), costs):
+            cycle[code] = (dict(zip(periods, terms)), cost)
+
+    offers = []
+    for code, name in names.items():
+        termo_fixo = (prices.electricity(code, pot_cont) or (None,))[0]
+        termo_fixo_gn, termo_energia_gn = prices.gas(code, escalao_gn) or (None, None)
+        termos_energia, custo_anual = cycle.get(code, ({}, None))
+        offers.append({
+            "codigo": code,
+            "nome": name,
+            "termo_fixo_eur_dia": termo_fixo,
+            "termos_energia_eur_kwh": termos_energia,
+            "custo_anual": custo_anual,
+            "termo_fixo_gn_eur_dia": termo_fixo_gn,
+            "termo_energia_gn_eur_kwh": termo_energia_gn,
+        })
+    offers.sort(key=lambda o: (o["custo_anual"] is None, o["custo_anual"] or 0.0, o["codigo"]))
+    _LOGGER.debug("Offer summary: %d offers, %d with an annual cost", len(offers), len(cycle))
+    return OfferSummary(offers)
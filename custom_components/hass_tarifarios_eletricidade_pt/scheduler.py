@@ -0,0 +1,224 @@
+"""Refresh schedule learned from the ERSE publication cadence.
+
+ERSE publishes new CSVs on working days around mid-morning, but not every day. The
+publication dates and times seen in ZIP names and in the "Atualizado em" text of the
+simulator page are kept, and the coordinators poll on an interval derived from them:
+a cheap page probe every PROBE_INTERVAL inside the publication window, backing off
+outside it, with the full download only when the probe shows a new release.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .archive import get_archive, release_datetime_from_url
+from .const import DOMAIN
+from .stats import get_stats
+from .tariff_periods import LISBON_TZ
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_KEY = f"{DOMAIN}.schedule"
+STORAGE_VERSION = 1
+# Key of the shared PublicationSchedule in hass.data[DOMAIN]
+DATA_SCHEDULE = "schedule"
+
+# Probe interval inside the publication window
+PROBE_INTERVAL = timedelta(minutes=15)
+# Outside the window the interval doubles after each unchanged probe, up to BACKOFF_MAX
+BACKOFF_START = timedelta(hours=1)
+BACKOFF_MAX = timedelta(hours=6)
+# Full refresh even when the probes never report a new release
+FULL_REFRESH_MAX_AGE = timedelta(days=7)
+# Publication window around the learned publication times
+WINDOW_BEFORE = timedelta(minutes=30)
+WINDOW_AFTER = timedelta(hours=2)
+# Until enough releases are seen: working days, around the known 10:03:13 publication
+DEFAULT_PUBLICATION_TIMES = [time(10, 3, 13)]
+DEFAULT_WEEKDAYS = {0, 1, 2, 3, 4}
+MIN_OBSERVATIONS = 3
+MAX_OBSERVATIONS = 60
+# Entries refreshing together share one probe
+PROBE_CACHE = timedelta(minutes=2)
+
+
+def is_newer_release(url: str | None, update_date: date | None,
+                     current_url: str | None, current_date: date | None) -> bool:
+    """Whether a probed release (ZIP URL and/or page date) is newer than the loaded one."""
+    if url is not None and url != current_url:
+        published = release_datetime_from_url(url)
+        current = release_datetime_from_url(current_url)
+        if current is None and published is not None and current_date is not None:
+            # Loaded from a mirror or local copy: only its date tells how recent it is
+            if published.date() > current_date:
+                return True
+        elif published is None or current is None or published > current:
+            return True
+    return update_date is not None and current_date is not None and update_date > current_date
+
+
+class PublicationSchedule:
+    """Learned ERSE publication days and times, and the polling interval they imply."""
+
+    def __init__(self):
+        # ISO date -> "HH:MM:SS" publication time, or None when only the date is known
+        self.observations: dict[str, str | None] = {}
+        self._probe: tuple[str | None, date | None] | None = None
+        self._probed_at: datetime | None = None
+        self._lock = asyncio.Lock()
+
+    # Learning ------------------------------------------------------------
+
+    def observe(self, day: date, at: time | None = None) -> bool:
+        """Record a publication; return True when it was not known yet."""
+        key = day.isoformat()
+        if key in self.observations and (self.observations[key] is not None or at is None):
+            return False
+        self.observations[key] = at.isoformat() if at is not None else None
+        for old in sorted(self.observations)[:-MAX_OBSERVATIONS]:
+            del self.observations[old]
+        return True
+
+    def observe_url(self, url: str | None) -> bool:
+        published = release_datetime_from_url(url)
+        return published is not None and self.observe(published.date(), published.time())
+
+    def publication_times(self) -> list[time]:
+        times = sorted(time.fromisoformat(t) for t in self.observations.values() if t)
+        if len(times) >= 10:
+            # Ignore the earliest and latest 10% (e.g. an exceptional afternoon release)
+            cut = len(times) // 10
+            times = times[cut:len(times) - cut]
+        return times or DEFAULT_PUBLICATION_TIMES
+
+    def weekdays(self) -> set[int]:
+        if len(self.observations) < MIN_OBSERVATIONS:
+            return DEFAULT_WEEKDAYS
+        return {date.fromisoformat(day).weekday() for day in self.observations}
+
+    # Scheduling ----------------------------------------------------------
+
+    def window(self, day: date) -> tuple[datetime, datetime] | None:
+        """Publication window of a day (Lisbon time), or None when ERSE does not publish then."""
+        if day.weekday() not in self.weekdays():
+            return None
+        times = self.publication_times()
+        return (
+            datetime.combine(day, times[0], LISBON_TZ) - WINDOW_BEFORE,
+            datetime.combine(day, times[-1], LISBON_TZ) + WINDOW_AFTER,
+        )
+
+    def next_window_start(self, now: datetime) -> datetime | None:
+        now = now.astimezone(LISBON_TZ)
+        for days in range(8):
+            window = self.window(now.date() + timedelta(days=days))
+            if window is not None and window[0] > now:
+                return window[0]
+        return None
+
+    def next_interval(self, now: datetime, released_today: bool, unchanged_probes: int) -> timedelta:
+        """Delay until the next probe.
+
+        PROBE_INTERVAL inside today's window until today's release is loaded; otherwise
+        an exponential backoff that never sleeps past the start of the next window.
+        """
+        now = now.astimezone(LISBON_TZ)
+        window = self.window(now.date())
+        if window is not None and window[0] <= now < window[1] and not released_today:
+            return PROBE_INTERVAL
+        interval = min(BACKOFF_START * 2 ** min(unchanged_probes, 8), BACKOFF_MAX)
+        next_start = self.next_window_start(now)
+        if next_start is not None:
+            interval = min(interval, next_start - now)
+        return max(interval, PROBE_INTERVAL)
+
+    def in_window(self, now: datetime) -> bool:
+        now = now.astimezone(LISBON_TZ)
+        window = self.window(now.date())
+        return window is not None and window[0] <= now < window[1]
+
+    # Probing -------------------------------------------------------------
+
+    async def async_probe(self, hass: HomeAssistant) -> tuple[str | None, date | None] | None:
+        """Latest release as shown by ERSE: (ZIP URL, update date), or None when unreachable.
+
+        The simulator page is fetched at most once per PROBE_CACHE. When it shows neither
+        a ZIP link nor a date, today's date-pattern URLs are HEAD-probed, but only inside
+        the publication window.
+        """
+        from .downloader import async_find_zip_for_date, async_probe_latest_release
+
+        async with self._lock:
+            now = datetime.now(timezone.utc)
+            if self._probed_at is not None and now - self._probed_at < PROBE_CACHE:
+                return self._probe
+            self._probed_at = now
+            try:
+                url, update_date = await async_probe_latest_release(hass)
+                if url is None and update_date is None and self.in_window(now):
+                    url = await async_find_zip_for_date(hass, now.astimezone(LISBON_TZ).date())
+            except Exception as e:
+                _LOGGER.debug("ERSE release probe failed: %s", e)
+                get_stats(hass).count("release_probe_failed")
+                self._probe = None
+                return None
+            self._probe = (url, update_date)
+            learned = self.observe_url(url)
+            if update_date is not None:
+                learned = self.observe(update_date) or learned
+            if learned:
+                await self.async_save(hass)
+            _LOGGER.debug("ERSE release probe: url=%s, updated=%s", url, update_date)
+            return self._probe
+
+    # Storage -------------------------------------------------------------
+
+    async def async_load(self, hass: HomeAssistant) -> None:
+        """Restore the observations, then learn from the releases in the price archive."""
+        try:
+            stored = await _store(hass).async_load()
+        except Exception as e:
+            _LOGGER.debug("Could not load stored publication schedule: %s", e)
+            stored = None
+        if stored:
+            self.observations.update(stored.get("observations", {}))
+
+        archive = get_archive(hass)
+        try:
+            await asyncio.to_thread(archive.load)
+        except OSError:
+            return
+        for release in archive.releases:
+            self.observe_url(release.get("url"))
+
+    async def async_save(self, hass: HomeAssistant) -> None:
+        await _store(hass).async_save({"observations": self.observations})
+
+    def as_dict(self) -> dict:
+        now = datetime.now(LISBON_TZ)
+        next_start = self.next_window_start(now)
+        return {
+            "observations": len(self.observations),
+            "publication_times": [t.isoformat() for t in self.publication_times()],
+            "weekdays": sorted(self.weekdays()),
+            "in_window": self.in_window(now),
+            "next_window_start": next_start.isoformat() if next_start else None,
+        }
+
+
+def _store(hass: HomeAssistant) -> Store:
+    return Store(hass, STORAGE_VERSION, STORAGE_KEY)
+
+
+async def async_get_schedule(hass: HomeAssistant) -> PublicationSchedule:
+    """Return the shared PublicationSchedule, loading it on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    schedule = domain_data.get(DATA_SCHEDULE)
+    if schedule is None:
+        schedule = domain_data[DATA_SCHEDULE] = PublicationSchedule()
+        await schedule.async_load(hass)
+    return schedule
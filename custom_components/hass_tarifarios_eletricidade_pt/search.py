@@ -0,0 +1,65 @@
+"""Accent-insensitive prefix search over the offers of a catalogue.
+
+Offer names, codes and comercializadores are normalised (NFKD without the combining
+marks, case-folded) and split into words, a code into its parts ("EDPC_86": "edpc", "86").
+The tokens are kept sorted, so the offers of a prefix are a bisect and a short scan
+away, and a query matches the offers with a token starting with each of its words:
+"cooper base" finds "Coopérnico BASE 2.0", "edpc_8" finds EDPC_86.
+"""
+from __future__ import annotations
+
+import re
+import unicodedata
+from bisect import bisect_left
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def normalize(text: str | None) -> str:
+    """Text without accents, case-folded: "Coopérnico" -> "coopernico"."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def tokens(text: str | None) -> set[str]:
+    """Searchable words of a text."""
+    return set(_WORD.findall(normalize(text)))
+
+
+def _offer_tokens(offer: dict) -> set[str]:
+    return tokens(offer.get("codigo")) | tokens(offer.get("nome")) | tokens(offer.get("comercializador"))
+
+
+class SearchIndex:
+    """Sorted tokens of a list of offers, each with the positions of the offers holding it."""
+
+    def __init__(self, offers: list[dict]):
+        postings: dict[str, set[int]] = {}
+        for i, offer in enumerate(offers):
+            for token in _offer_tokens(offer):
+                postings.setdefault(token, set()).add(i)
+        self._tokens = sorted(postings)
+        self._postings = [frozenset(postings[t]) for t in self._tokens]
+        self.size = len(offers)
+
+    def _prefix(self, prefix: str) -> set[int]:
+        found: set[int] = set()
+        for i in range(bisect_left(self._tokens, prefix), len(self._tokens)):
+            if not self._tokens[i].startswith(prefix):
+                break
+            found |= self._postings[i]
+        return found
+
+    def match(self, query: str | None) -> set[int] | None:
+        """Positions of the offers matching every word of the query; None for an empty query."""
+        words = _WORD.findall(normalize(query))
+        if not words:
+            return None
+        # Longest words first: their prefixes have the fewest offers
+        words.sort(key=len, reverse=True)
+        found = self._prefix(words[0])
+        for word in words[1:]:
+            if not found:
+                break
+            found &= self._prefix(word)
+        return found
@@ -1,18 +1,35 @@
-"""Sensor platform for Tarifários Eletricidade PT (only offer sensors)."""
+"""Sensor platform for Tarifários Eletricidade PT (offer, gas price and market ranking sensors)."""
 from __future__ import annotations
 
+import asyncio
 from datetime import datetime, timezone
 import math
 import unicodedata
 import logging
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.components.sensor import SensorEntity, SensorDeviceClass
+from homeassistant.helpers.event import async_track_point_in_time
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import dt as dt_util
 
-from .const import DOMAIN, VERSION
+from .const import (
+    CHEAPEST_OFFERS_COUNT,
+    CICLO_OPTIONS,
+    CONTAGEM_OPTIONS,
+    DEFAULT_CICLO,
+    DEFAULT_CONTAGEM,
+    DEFAULT_SENSOR_MODE,
+    DOMAIN,
+    ESCALAO_GN_OPTIONS,
+    VERSION,
+)
+from .offer_filters import compile_filters, consumption_predicate
+from .snapshot import CostVector, column_values, rank_offers
+from .tariff_periods import PERIOD_NAMES, YEAR_END_MARGIN, current_period, warm_calendars
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -70,6 +87,62 @@ def _clean_for_display(v, field_name=None):
     return cleaned
 
 
+def _code_col(df):
+    return next((c for c in CODE_COL_CANDIDATES if c in df.columns), None)
+
+
+def _offer_codes(df) -> list[str]:
+    code_col = _code_col(df)
+    if not code_col:
+        return []
+    return df[code_col].dropna().astype(str).unique().tolist()
+
+
+def _offer_keys(df, by_potencia: bool) -> set[tuple[str, str | None]]:
+    """(code, potência) of every offer sensor of the frame; potência is None for single-potência entries."""
+    if not by_potencia:
+        return {(codigo, None) for codigo in _offer_codes(df)}
+    code_col = _code_col(df)
+    pot_col = next((c for c in POT_COL_CANDIDATES if c in df.columns), None)
+    if not code_col or not pot_col:
+        return set()
+    return {
+        (str(codigo), _norm_pot(pot))
+        for codigo, pot in zip(column_values(df, code_col), column_values(df, pot_col))
+        if codigo is not None and _norm_pot(pot)
+    }
+
+
+def _offer_sensor(coordinator, entry_id: str, key: tuple[str, str | None], offer_data: dict, ts: datetime) -> "OfferSensor":
+    codigo, potencia = key
+    return OfferSensor(
+        coordinator,
+        entry_id,
+        codigo,
+        offer_data['display_name'],
+        offer_data['attrs'],
+        ts,
+        offer_data['termo_fixo_value'],
+        offer_data['offer_name'],
+        potencia,
+    )
+
+
+def _gas_codes(coordinator, codes) -> list[str]:
+    """Offers of an entry that get a gas price sensor (gas, dual or all energy types)."""
+    if coordinator.energy_type == "ele":
+        return []
+    return [codigo for codigo in codes if coordinator.has_gas_prices(codigo)]
+
+
+def _own_offers(coordinator, vector: CostVector) -> CostVector | None:
+    """Restrict a market cost vector to the offers of the entry's filtered frame."""
+    data = coordinator.data
+    if data is None:
+        return None
+    return vector.restrict(_offer_codes(data))
+
+
 def _norm_pot(val):
     if not val:
         return None
@@ -77,19 +150,11 @@ def _norm_pot(val):
     return str(val).replace(",", ".").strip()
 
 
-async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
-    """Set up the sensor platform."""
-    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
-    config = hass.data[DOMAIN][entry.entry_id]["config"]
-    
-    # Get data from coordinator
-    df = coordinator.data
-    if df is None or df.empty:
-        _LOGGER.warning("No data available from coordinator.")
-        return
-
-    ts = datetime.now(timezone.utc)
+def _group_offers(df, comercializador: str, ts: datetime, by_potencia: bool = False) -> dict:
+    """Group the frame rows by (offer code, potência) into display name, attributes and termo fixo.
 
+    Potência is None in the keys unless by_potencia, when an entry tracks several potências.
+    """
     code_col = next((c for c in CODE_COL_CANDIDATES if c in df.columns), None)
     name_col = next((c for c in NAME_COL_CANDIDATES if c in df.columns), None)
     pot_norm_col = next((c for c in POT_COL_CANDIDATES if c in df.columns), None)
@@ -97,22 +162,23 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_e
 
     if not code_col:
         _LOGGER.error("Code column not found. Columns=%s", list(df.columns))
-        return
+        return {}
 
-    entities = []
-    comercializador = config.get("comercializador", "unknown")
-    
     # Group by offer code to avoid creating multiple entities for the same offer
     # (which can happen when there are multiple billing cycles)
     grouped_offers = {}
     
     for _, row in df.iterrows():
         codigo = str(row[code_col])
+        potencia = _norm_pot(row[pot_norm_col]) if by_potencia and pot_norm_col else None
+        if by_potencia and not potencia:
+            continue
+        key = (codigo, potencia)
         
         # Skip if we already processed this offer code
-        if codigo in grouped_offers:
+        if key in grouped_offers:
             # Merge billing cycle data into existing offer
-            existing_attrs = grouped_offers[codigo]['attrs']
+            existing_attrs = grouped_offers[key]['attrs']
             
             # Add billing cycle specific data
             ciclo_col = "Ciclo de contagem"
@@ -132,10 +198,11 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_e
         
         # Create display name: Provider - Commercial Offer Name
         if offer_name:
-            full_display_name = f"{comercializador} - {offer_name}"
+            base_name = f"{comercializador} - {offer_name}"
         else:
             # Fallback if no offer name available
-            full_display_name = f"{comercializador} - Tarifa {codigo}"
+            base_name = f"{comercializador} - Tarifa {codigo}"
+        full_display_name = f"{base_name} ({potencia.replace('.', ',')} kVA)" if potencia else base_name
 
         # Get the termo fixo value for this row (prefer the first encountered)
         termo_fixo_value = None
@@ -165,28 +232,154 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_e
             attrs["potencia_norm"] = row[pot_norm_col]
 
         # Store the offer data
-        grouped_offers[codigo] = {
+        grouped_offers[key] = {
+            'base_name': base_name,
             'display_name': full_display_name,
             'attrs': attrs,
             'termo_fixo_value': termo_fixo_value,
             'offer_name': offer_name
         }
+
+    return grouped_offers
+
+
+async def _async_ranking_sensors(coordinator, entry_id: str, comercializador: str, config: dict) -> list:
+    """Cheapest offers and current price sensors (entries with a potência)."""
+    if not coordinator.pot_cont:
+        return []
+    # The current price sensor looks its period up from its first update on
+    await asyncio.to_thread(
+        warm_calendars, dt_util.now(), config.get("contagem", DEFAULT_CONTAGEM), config.get("ciclo", DEFAULT_CICLO)
+    )
+    return [
+        CheapestOffersSensor(
+            coordinator,
+            entry_id,
+            comercializador,
+            config.get("contagem", DEFAULT_CONTAGEM),
+        ),
+        CurrentPriceSensor(
+            coordinator,
+            entry_id,
+            comercializador,
+            config.get("contagem", DEFAULT_CONTAGEM),
+            config.get("ciclo", DEFAULT_CICLO),
+        ),
+    ]
+
+
+@callback
+def async_remove_other_mode_entities(hass: HomeAssistant, entry_id: str, mode: str) -> None:
+    """Drop the registry entries of the sensors the other sensor mode created (ranking sensors stay)."""
+    registry = er.async_get(hass)
+    shared = {f"{entry_id}_cheapest_offers", f"{entry_id}_current_price"}
+    for entity in er.async_entries_for_config_entry(registry, entry_id):
+        if entity.domain != "sensor" or entity.unique_id in shared:
+            continue
+        is_summary = entity.unique_id.startswith(f"{entry_id}_summary_")
+        if is_summary != (mode == "catalogo"):
+            _LOGGER.debug("Removing %s sensor %s", "catalogue" if is_summary else "offer", entity.entity_id)
+            registry.async_remove(entity.entity_id)
+
+
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
+    """Set up the sensor platform."""
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+    config = hass.data[DOMAIN][entry.entry_id]["config"]
     
+    # Get data from coordinator
+    df = coordinator.data
+    if df is None or df.empty:
+        _LOGGER.warning("No data available from coordinator.")
+        return
+
+    ts = datetime.now(timezone.utc)
+    comercializador = config.get("comercializador", "unknown")
+    if config.get("modo_sensores", DEFAULT_SENSOR_MODE) == "catalogo":
+        # Constant entity count: summary sensors, offer details through the offer_details service
+        contagem = config.get("contagem", DEFAULT_CONTAGEM)
+        entities = [
+            OfferSummarySensor(coordinator, entry.entry_id, comercializador, contagem, kind)
+            for kind in SUMMARY_SENSORS
+        ]
+        async_add_entities([*entities, *await _async_ranking_sensors(coordinator, entry.entry_id, comercializador, config)], True)
+        return
+
+    # One sensor per (offer, potência) when the entry tracks several potências
+    by_potencia = len(coordinator.potencias) > 1
+    grouped_offers = _group_offers(df, comercializador, ts, by_potencia)
+    if not grouped_offers:
+        return
+
     # Create entities from grouped offers
-    for codigo, offer_data in grouped_offers.items():
-        entities.append(OfferSensor(
-            coordinator, 
-            entry.entry_id, 
-            codigo, 
-            offer_data['display_name'], 
-            offer_data['attrs'], 
-            ts, 
-            offer_data['termo_fixo_value'], 
-            offer_data['offer_name']
-        ))
+    offer_entities = {
+        key: _offer_sensor(coordinator, entry.entry_id, key, offer_data, ts)
+        for key, offer_data in grouped_offers.items()
+    }
+    # Offer names without the potência, for the gas price sensors
+    offer_names = {codigo: offer_data['base_name'] for (codigo, _), offer_data in grouped_offers.items()}
+    gas_entities = {
+        codigo: GasOfferSensor(coordinator, entry.entry_id, codigo, offer_names[codigo])
+        for codigo in _gas_codes(coordinator, offer_names)
+    }
+    entities = [*offer_entities.values(), *gas_entities.values()]
+    entities.extend(await _async_ranking_sensors(coordinator, entry.entry_id, comercializador, config))
 
     async_add_entities(entities, True)
 
+    @callback
+    def _async_reconcile_offers() -> None:
+        """Add and remove offer and gas price sensors in place when the filtered frame changes."""
+        nonlocal by_potencia
+        df = coordinator.data
+        if df is None or df.empty:
+            return
+        if by_potencia != (len(coordinator.potencias) > 1):
+            # Switching between one and several potências changes every offer sensor
+            by_potencia = not by_potencia
+        keys = _offer_keys(df, by_potencia)
+        gas_codes = set(_gas_codes(coordinator, {codigo for codigo, _ in keys}))
+        removed = [key for key in offer_entities if key not in keys]
+        added = keys.difference(offer_entities)
+        gas_removed = [codigo for codigo in gas_entities if codigo not in gas_codes]
+        gas_added = gas_codes.difference(gas_entities)
+        if not removed and not added and not gas_removed and not gas_added:
+            return
+
+        registry = er.async_get(hass)
+        removed_entities = [offer_entities.pop(c) for c in removed] + [gas_entities.pop(c) for c in gas_removed]
+        for entity in removed_entities:
+            _LOGGER.debug("Removing sensor %s", entity.unique_id)
+            if entity.entity_id and registry.async_get(entity.entity_id):
+                registry.async_remove(entity.entity_id)
+            else:
+                hass.async_create_task(entity.async_remove())
+
+        if added:
+            ts = datetime.now(timezone.utc)
+            added_codes = {codigo for codigo, _ in added}
+            grouped = _group_offers(df[df[_code_col(df)].astype(str).isin(added_codes)], comercializador, ts, by_potencia)
+            new_entities = []
+            for key, offer_data in grouped.items():
+                offer_names[key[0]] = offer_data['base_name']
+                if key not in added:
+                    continue
+                offer_entities[key] = _offer_sensor(coordinator, entry.entry_id, key, offer_data, ts)
+                new_entities.append(offer_entities[key])
+            _LOGGER.debug("Adding sensors for offers %s", sorted(added, key=str))
+            async_add_entities(new_entities, True)
+
+        if gas_added:
+            new_entities = []
+            for codigo in gas_added:
+                if codigo in offer_names:
+                    gas_entities[codigo] = GasOfferSensor(coordinator, entry.entry_id, codigo, offer_names[codigo])
+                    new_entities.append(gas_entities[codigo])
+            _LOGGER.debug("Adding gas price sensors for offers %s", sorted(gas_added))
+            async_add_entities(new_entities, True)
+
+    entry.async_on_unload(coordinator.async_add_listener(_async_reconcile_offers))
+
 
 class OfferSensor(CoordinatorEntity, SensorEntity):
     """Representation of a Tarifarios offer sensor."""
@@ -194,45 +387,38 @@ class OfferSensor(CoordinatorEntity, SensorEntity):
     _attr_device_class = None  # No device class for price values
     _attr_unit_of_measurement = "€/day"
 
-    def __init__(self, coordinator, entry_id: str, codigo: str, name: str, attrs: dict, ts: datetime, termo_fixo_value: float = None, offer_name: str = None):
+    def __init__(self, coordinator, entry_id: str, codigo: str, name: str, attrs: dict, ts: datetime, termo_fixo_value: float = None, offer_name: str = None, potencia: str = None):
         """Initialize the sensor."""
         super().__init__(coordinator)
         self._attr_name = name
         
-        # Simplified unique ID based on offer code only
-        # since we now group by offer and don't create separate entities for billing cycles
-        self._attr_unique_id = f"{entry_id}_{codigo}"
+        # Simplified unique ID based on offer code only (plus the potência when the
+        # entry tracks several), since we don't create separate entities for billing cycles
+        self._attr_unique_id = f"{entry_id}_{codigo}_{potencia}" if potencia else f"{entry_id}_{codigo}"
         
         # Debug log for troubleshooting
         _LOGGER.debug("Creating sensor unique_id for offer %s: %s", codigo, self._attr_unique_id)
             
         self._codigo = codigo
+        self._potencia = potencia
         self._attrs = attrs
         self._ts = ts
         self._termo_fixo_value = termo_fixo_value
 
+    @property
+    def available(self) -> bool:
+        """Unavailable outside the offer's validity dates (flipped by the coordinator's boundary timer)."""
+        return super().available and self.coordinator.is_offer_valid(self._codigo)
+
     @property
     def native_value(self):
         """Return the daily fixed term value in euros."""
-        if self.coordinator.last_update_success and self.coordinator.data is not None and not self.coordinator.data.empty:
-            # Try to get fresh termo fixo value from coordinator data
-            # Use the first matching row (since we group by offer code)
-            try:
-                code_col = next((c for c in CODE_COL_CANDIDATES if c in self.coordinator.data.columns), None)
-                termo_fixo_col = next((c for c in TERMO_FIXO_CANDIDATES if c in self.coordinator.data.columns), None)
-                
-                if code_col and termo_fixo_col:
-                    matching_rows = self.coordinator.data[self.coordinator.data[code_col].astype(str) == self._codigo]
-                    if not matching_rows.empty:
-                        row = matching_rows.iloc[0]  # Take first row for this offer
-                        if row.get(termo_fixo_col):
-                            try:
-                                return float(str(row[termo_fixo_col]).replace(",", "."))
-                            except (ValueError, TypeError):
-                                pass
-            except Exception as e:
-                _LOGGER.debug("Error getting fresh termo fixo for %s: %s", self._codigo, e)
-        
+        if self.coordinator.last_update_success:
+            # Fresh termo fixo at the entry's potência, from the snapshot's price index
+            termo_fixo = self.coordinator.offer_prices(self._codigo, self._potencia).get("termo_fixo")
+            if termo_fixo is not None:
+                return termo_fixo
+
         # Fallback to stored value
         return self._termo_fixo_value
 
@@ -246,6 +432,9 @@ class OfferSensor(CoordinatorEntity, SensorEntity):
                 code_col = next((c for c in CODE_COL_CANDIDATES if c in self.coordinator.data.columns), None)
                 if code_col:
                     matching_rows = self.coordinator.data[self.coordinator.data[code_col].astype(str) == self._codigo]
+                    pot_col = next((c for c in POT_COL_CANDIDATES if c in matching_rows.columns), None)
+                    if self._potencia and pot_col:
+                        matching_rows = matching_rows[[_norm_pot(v) == self._potencia for v in matching_rows[pot_col]]]
                     if not matching_rows.empty:
                         # Merge data from all rows (billing cycles) for this offer
                         fresh_attrs = {}
@@ -268,6 +457,9 @@ class OfferSensor(CoordinatorEntity, SensorEntity):
                                         fresh_attrs[normalized_key] = _clean_for_display(v, k)
                         
                         fresh_attrs["codigo_original"] = self._codigo
+                        # Channels and metering cycles decoded from the Filtro*/TipoContagem bitmasks
+                        if self.coordinator.snapshot is not None:
+                            fresh_attrs.update(self.coordinator.snapshot.offer_index.flags(self._codigo))
                         fresh_attrs["integration_version"] = VERSION
                         fresh_attrs["last_refresh_iso"] = datetime.now(timezone.utc).isoformat()
                         
@@ -288,3 +480,278 @@ class OfferSensor(CoordinatorEntity, SensorEntity):
     def unique_id(self) -> str:
         """Return a unique ID for the sensor."""
         return self._attr_unique_id
+
+
+class GasOfferSensor(CoordinatorEntity, SensorEntity):
+    """Natural gas energy term of one offer at the entry's escalão de consumo."""
+    _attr_icon = "mdi:fire"
+    _attr_device_class = None
+    _attr_unit_of_measurement = "€/kWh"
+
+    def __init__(self, coordinator, entry_id: str, codigo: str, name: str):
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self._attr_name = f"{name} - Gás Natural"
+        self._attr_unique_id = f"{entry_id}_{codigo}_gn"
+        self._codigo = codigo
+
+    @property
+    def available(self) -> bool:
+        return super().available and self.coordinator.is_offer_valid(self._codigo)
+
+    @property
+    def native_value(self):
+        """Return the gas energy term (€/kWh) at the entry's escalão."""
+        return self.coordinator.offer_prices(self._codigo).get("termo_energia_gn")
+
+    @property
+    def extra_state_attributes(self):
+        """Return the gas fixed term and the escalões the offer is priced for."""
+        snapshot = self.coordinator.snapshot
+        return {
+            "codigo_original": self._codigo,
+            "escalao": self.coordinator.escalao_gn,
+            "escalao_descricao": ESCALAO_GN_OPTIONS.get(str(self.coordinator.escalao_gn)),
+            "escaloes_disponiveis": snapshot.offer_prices.escaloes(self._codigo) if snapshot is not None else [],
+            "termo_fixo_gn_eur_dia": self.coordinator.offer_prices(self._codigo).get("termo_fixo_gn"),
+            "integration_version": VERSION,
+        }
+
+
+# Catalogue mode sensors: kind -> (name, icon, unit)
+SUMMARY_SENSORS = {
+    "ofertas": ("Número de ofertas", "mdi:format-list-numbered", None),
+    "termo_fixo_min": ("Termo fixo mínimo", "mdi:arrow-collapse-down", "€/day"),
+    "termo_fixo_mediano": ("Termo fixo mediano", "mdi:approximately-equal", "€/day"),
+    "termo_fixo_max": ("Termo fixo máximo", "mdi:arrow-collapse-up", "€/day"),
+    "oferta_mais_barata": ("Oferta mais barata", "mdi:trophy", None),
+}
+
+
+class OfferSummarySensor(CoordinatorEntity, SensorEntity):
+    """One statistic of the entry's offers (catalogue mode), read from the coordinator's summary."""
+    _attr_device_class = None
+
+    def __init__(self, coordinator, entry_id: str, comercializador: str, contagem: str, kind: str):
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        name, icon, unit = SUMMARY_SENSORS[kind]
+        self._attr_name = f"{comercializador} - {name}"
+        self._attr_unique_id = f"{entry_id}_summary_{kind}"
+        self._attr_icon = icon
+        self._attr_unit_of_measurement = unit
+        self._contagem = str(contagem)
+        self._kind = kind
+
+    @property
+    def native_value(self):
+        """Return the statistic over the entry's filtered offers."""
+        summary = self.coordinator.offer_summary()
+        if self._kind == "ofertas":
+            return len(summary)
+        if self._kind == "oferta_mais_barata":
+            return summary.cheapest["codigo"] if summary.cheapest else None
+        return getattr(summary, self._kind)
+
+    @property
+    def extra_state_attributes(self):
+        """Return the cheapest offer's details, and how to page through the others."""
+        attrs = {
+            "ciclo_contagem": CONTAGEM_OPTIONS.get(self._contagem, self._contagem),
+            "potencia_norm": str(self.coordinator.pot_cont).replace(",", ".").strip() if self.coordinator.pot_cont else None,
+            "integration_version": VERSION,
+        }
+        if self._kind == "oferta_mais_barata":
+            cheapest = self.coordinator.offer_summary().cheapest or {}
+            attrs["nome_oferta_comercial"] = cheapest.get("nome")
+            attrs["custo_anual"] = cheapest.get("custo_anual")
+            attrs["termo_fixo_eur_dia"] = cheapest.get("termo_fixo_eur_dia")
+            attrs["consumo_anual_kwh"] = self.coordinator.annual_consumption()
+        return attrs
+
+
+class CheapestOffersSensor(CoordinatorEntity, SensorEntity):
+    """Cheapest offers across all comercializadores for the entry's consumption profile."""
+    _attr_icon = "mdi:podium-gold"
+    _attr_device_class = None
+    _attr_unit_of_measurement = "€/year"
+
+    def __init__(self, coordinator, entry_id: str, comercializador: str, contagem: str, count: int = CHEAPEST_OFFERS_COUNT):
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self._attr_name = f"{comercializador} - Ofertas mais baratas"
+        self._attr_unique_id = f"{entry_id}_cheapest_offers"
+        self._contagem = str(contagem)
+        self._consumo_anual = coordinator.annual_consumption()
+        self._count = count
+        self._snapshot_hash = None
+        self._view = None
+        self._ranking: list[dict] = []
+        self._current: dict | None = None
+        self._refresh_ranking()
+
+    def _refresh_ranking(self) -> None:
+        """Recompute the top-k only when the snapshot, the entry filters or the consumption change."""
+        snapshot = self.coordinator.snapshot
+        kwh = self.coordinator.annual_consumption()
+        view = (snapshot.hash, self.coordinator.filters_version, kwh) if snapshot is not None else None
+        if view is None or view == self._view:
+            if view is not None:
+                self.coordinator.stats.count("ranking_cache_hit")
+            return
+        self.coordinator.stats.count("ranking_cache_miss")
+        self._view = view
+        self._snapshot_hash = snapshot.hash
+        self._consumo_anual = kwh
+        self._ranking = []
+        self._current = None
+
+        vector = snapshot.cost_vector(self.coordinator.pot_cont, self._contagem)
+        if vector is None or not len(vector):
+            _LOGGER.debug("No cost vector for pot_cont=%s contagem=%s", self.coordinator.pot_cont, self._contagem)
+            return
+        # The market ranking honours the entry's offer filters (renewable, no loyalty...)
+        # and only holds offers whose consumption limits (ConsIni/ConsFim) allow the household's
+        predicates = (*compile_filters(self.coordinator.offer_filters), consumption_predicate(kwh))
+        vector = vector.restrict(snapshot.offer_index.select(predicates))
+        if vector is None:
+            _LOGGER.debug("No offer matches the offer filters %s", predicates)
+            return
+        self._ranking = rank_offers(vector, self._consumo_anual, self._contagem, self._count)
+
+        own_vector = _own_offers(self.coordinator, vector)
+        if own_vector is not None:
+            self._current = rank_offers(own_vector, self._consumo_anual, self._contagem, 1)[0]
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        self._refresh_ranking()
+        super()._handle_coordinator_update()
+
+    @property
+    def native_value(self):
+        """Return the estimated yearly cost of the cheapest offer."""
+        if not self._ranking:
+            return None
+        return self._ranking[0]["custo_anual"]
+
+    @property
+    def extra_state_attributes(self):
+        """Return the ranking and the gap to the entry's current offer."""
+        attrs = {
+            "ofertas": self._ranking,
+            "ciclo_contagem": CONTAGEM_OPTIONS.get(self._contagem, self._contagem),
+            "consumo_anual_kwh": self._consumo_anual,
+            "potencia_norm": str(self.coordinator.pot_cont).replace(",", ".").strip(),
+            "oferta_atual": self._current,
+            "diferenca_oferta_atual": None,
+            "snapshot_hash": self._snapshot_hash,
+            "integration_version": VERSION,
+        }
+        if self._current and self._ranking:
+            attrs["diferenca_oferta_atual"] = round(self._current["custo_anual"] - self._ranking[0]["custo_anual"], 2)
+        return attrs
+
+
+class CurrentPriceSensor(CoordinatorEntity, SensorEntity):
+    """Energy price of the entry's current offer in the tariff period in force now."""
+    _attr_icon = "mdi:clock-time-four-outline"
+    _attr_device_class = None
+    _attr_unit_of_measurement = "€/kWh"
+
+    def __init__(self, coordinator, entry_id: str, comercializador: str, contagem: str, ciclo: str):
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self._attr_name = f"{comercializador} - Preço atual"
+        self._attr_unique_id = f"{entry_id}_current_price"
+        self._contagem = str(contagem)
+        self._ciclo = ciclo
+        self._snapshot_hash = None
+        self._view = None
+        self._offer: dict | None = None
+        self._prices: tuple[float, ...] = ()
+        self._period = 0
+        self._next_change = None
+        self._unsub_boundary = None
+        self._refresh_offer()
+        self._refresh_period()
+
+    def _refresh_offer(self) -> None:
+        """Pick the entry's current offer again only when the snapshot, the entry filters or the consumption change."""
+        snapshot = self.coordinator.snapshot
+        kwh = self.coordinator.annual_consumption()
+        view = (snapshot.hash, self.coordinator.filters_version, kwh) if snapshot is not None else None
+        if view is None or view == self._view:
+            if view is not None:
+                self.coordinator.stats.count("offer_cache_hit")
+            return
+        self.coordinator.stats.count("offer_cache_miss")
+        self._view = view
+        self._snapshot_hash = snapshot.hash
+        self._offer = None
+        self._prices = ()
+
+        vector = snapshot.cost_vector(self.coordinator.pot_cont, self._contagem)
+        own_vector = _own_offers(self.coordinator, vector) if vector is not None else None
+        if own_vector is None:
+            return
+        costs = own_vector.annual_costs(kwh, self._contagem)
+        i = int(costs.argmin())
+        self._offer = {"codigo": str(own_vector.codes[i]), "nome": str(own_vector.names[i])}
+        self._prices = tuple(float(p) for p in own_vector.energy_terms[i][:len(PERIOD_NAMES[self._contagem])])
+
+    def _refresh_period(self) -> None:
+        self._period, self._next_change = current_period(dt_util.now(), self._contagem, self._ciclo)
+
+    def _schedule_boundary(self) -> None:
+        if self._next_change is None:
+            return
+        self._unsub_boundary = async_track_point_in_time(self.hass, self._handle_boundary, self._next_change)
+        if (self._next_change + YEAR_END_MARGIN).year != dt_util.now().astimezone(self._next_change.tzinfo).year:
+            # The next lookups may read next year's calendar: build it before the boundary, off the event loop
+            self.hass.async_add_executor_job(warm_calendars, self._next_change, self._contagem, self._ciclo)
+
+    @callback
+    def _handle_boundary(self, _now) -> None:
+        self._unsub_boundary = None
+        self._refresh_period()
+        self._schedule_boundary()
+        self.async_write_ha_state()
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self._refresh_period()
+        self._schedule_boundary()
+
+    async def async_will_remove_from_hass(self) -> None:
+        if self._unsub_boundary:
+            self._unsub_boundary()
+            self._unsub_boundary = None
+        await super().async_will_remove_from_hass()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        self._refresh_offer()
+        super()._handle_coordinator_update()
+
+    @property
+    def native_value(self):
+        """Return the energy term in force now."""
+        if self._period >= len(self._prices):
+            return None
+        return self._prices[self._period]
+
+    @property
+    def extra_state_attributes(self):
+        """Return the current period, the next boundary and all period prices."""
+        names = PERIOD_NAMES.get(self._contagem, ())
+        return {
+            "periodo": names[self._period] if self._period < len(names) else None,
+            "proxima_mudanca": self._next_change.isoformat() if self._next_change else None,
+            "ciclo": CICLO_OPTIONS.get(self._ciclo, self._ciclo),
+            "ciclo_contagem": CONTAGEM_OPTIONS.get(self._contagem, self._contagem),
+            "precos_periodo": dict(zip(names, self._prices)),
+            "codigo_oferta": self._offer["codigo"] if self._offer else None,
+            "nome_oferta_comercial": self._offer["nome"] if self._offer else None,
+            "integration_version": VERSION,
+        }
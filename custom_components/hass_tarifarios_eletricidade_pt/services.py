@@ -0,0 +1,237 @@
+"""Integration services."""
+from __future__ import annotations
+
+import asyncio
+import inspect
+
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.exceptions import ServiceValidationError, Unauthorized, UnknownUser
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.service import async_register_admin_service
+
+from .archive import async_backfill, get_archive
+from .const import CICLO_OPTIONS, DEFAULT_CICLO, DOMAIN, ENERGY_TYPE_OPTIONS
+from .data_loader import async_get_catalogue
+from .history import MAX_DAYS, async_get_history, what_if
+from .export import EXPORT_DIR, EXPORT_FORMATS, ExportError, export_file_name, export_frame
+from .offer_query import QUERY_FILTER_KEYS, loaded_snapshot, query_frame
+from .offer_summary import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from .snapshot import pot_values
+
+SERVICE_PRICE_HISTORY = "price_history"
+SERVICE_BACKFILL_ARCHIVE = "backfill_archive"
+SERVICE_OFFER_DETAILS = "offer_details"
+SERVICE_EXPORT = "export"
+SERVICE_SEARCH_OFFERS = "search_offers"
+SERVICE_WHAT_IF = "what_if"
+
+# Older cores register admin services without their response
+_ADMIN_RESPONSES = "supports_response" in inspect.signature(async_register_admin_service).parameters
+
+PRICE_HISTORY_SCHEMA = vol.Schema({
+    vol.Required("codigo_oferta"): cv.string,
+    vol.Optional("data"): cv.date,
+})
+BACKFILL_ARCHIVE_SCHEMA = vol.Schema({
+    vol.Optional("dias", default=30): vol.All(vol.Coerce(int), vol.Range(min=1, max=365)),
+})
+OFFER_DETAILS_SCHEMA = vol.Schema({
+    vol.Required("config_entry_id"): cv.string,
+    vol.Optional("offset", default=0): vol.All(vol.Coerce(int), vol.Range(min=0)),
+    vol.Optional("limit", default=DEFAULT_PAGE_SIZE): vol.All(vol.Coerce(int), vol.Range(min=1, max=MAX_PAGE_SIZE)),
+})
+EXPORT_SCHEMA = vol.Schema({
+    vol.Optional("formato", default="csv"): vol.In(EXPORT_FORMATS),
+    # The entry's filtered offers, or the whole snapshot narrowed by the filters
+    vol.Exclusive("config_entry_id", "fonte"): cv.string,
+    vol.Exclusive("filtros", "fonte"): vol.Schema({vol.Optional(key): object for key in QUERY_FILTER_KEYS}),
+    vol.Optional("colunas"): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional("nome"): cv.string,
+})
+SEARCH_OFFERS_SCHEMA = vol.Schema({
+    vol.Required("pesquisa"): cv.string,
+    vol.Optional("comercializador"): cv.string,
+    vol.Optional("energy_type", default="all"): vol.In(ENERGY_TYPE_OPTIONS),
+    vol.Optional("limit", default=DEFAULT_PAGE_SIZE): vol.All(vol.Coerce(int), vol.Range(min=1, max=MAX_PAGE_SIZE)),
+})
+WHAT_IF_SCHEMA = vol.Schema({
+    vol.Required("statistic_id"): cv.string,
+    # Potência and cycle of the entry, unless given
+    vol.Optional("config_entry_id"): cv.string,
+    vol.Optional("pot_cont"): cv.string,
+    vol.Optional("ciclo"): vol.In(CICLO_OPTIONS),
+    vol.Optional("dias", default=365): vol.All(vol.Coerce(int), vol.Range(min=1, max=MAX_DAYS - 1)),
+    vol.Optional("limit", default=DEFAULT_PAGE_SIZE): vol.All(vol.Coerce(int), vol.Range(min=1, max=MAX_PAGE_SIZE)),
+})
+
+
+async def _async_price_history(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Prices of an offer on a date, or every change of the offer when no date is given."""
+    archive = get_archive(hass)
+    codigo = call.data["codigo_oferta"].strip()
+    day = call.data.get("data")
+    if day is not None:
+        precos = await asyncio.to_thread(archive.price_on, codigo, day)
+        return {"codigo_oferta": codigo, "data": day.isoformat(), "precos": precos}
+    alteracoes = await asyncio.to_thread(archive.changes, codigo)
+    return {"codigo_oferta": codigo, "alteracoes": alteracoes}
+
+
+async def _async_backfill_archive(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Archive the past ERSE releases still published under the date-pattern URLs."""
+    added = await async_backfill(hass, call.data["dias"])
+    return {"releases_added": added, "releases": len(get_archive(hass).releases)}
+
+
+async def _async_offer_details(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """One page of an entry's offers, cheapest first (the details behind the catalogue sensors)."""
+    entry_data = hass.data.get(DOMAIN, {}).get(call.data["config_entry_id"])
+    if entry_data is None:
+        raise ServiceValidationError(f"Unknown config entry: {call.data['config_entry_id']}")
+    coordinator = entry_data["coordinator"]
+    # Built in the executor with the filtered frame, and shared with the catalogue sensors
+    summary = coordinator.offer_summary()
+    return summary.page(call.data["offset"], call.data["limit"], coordinator.valid_offer_codes())
+
+
+async def _async_export(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Write the processed snapshot, an entry's offers or a filtered view to the config dir."""
+    entry_id = call.data.get("config_entry_id")
+    if entry_id is not None:
+        entry_data = hass.data.get(DOMAIN, {}).get(entry_id)
+        if entry_data is None:
+            raise ServiceValidationError(f"Unknown config entry: {entry_id}")
+        snapshot = entry_data["coordinator"].snapshot
+        frame = entry_data["coordinator"].data
+    else:
+        snapshot = loaded_snapshot(hass)
+        frame = None
+    if snapshot is None:
+        raise ServiceValidationError("No ERSE data loaded yet")
+
+    fmt = call.data["formato"]
+    name = export_file_name(call.data.get("nome") or f"tarifarios_{snapshot.hash[:12]}", fmt)
+    path = hass.config.path(EXPORT_DIR, name)
+    filters = call.data.get("filtros")
+
+    def export():
+        # The whole snapshot is streamed from the merged frame itself, without a filtered copy
+        source = frame if frame is not None else query_frame(snapshot, filters) if filters else snapshot.merged
+        return export_frame(source, path, fmt, call.data.get("colunas"))
+
+    try:
+        return await asyncio.to_thread(export)
+    except ExportError as e:
+        raise ServiceValidationError(str(e)) from e
+
+
+async def _async_search_offers(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Offers whose name, code or comercializador start with the words searched, accents and case ignored."""
+    catalogue = await async_get_catalogue(hass)
+    if catalogue is None:
+        raise ServiceValidationError("No ERSE data loaded yet")
+    offers = catalogue.offers_for(call.data.get("comercializador"), call.data["energy_type"], pesquisa=call.data["pesquisa"])
+    return {
+        "pesquisa": call.data["pesquisa"],
+        "total": len(offers),
+        "comercializadores": sorted({o["comercializador"] for o in offers if o["comercializador"]}),
+        "ofertas": [
+            {key: o[key] for key in ("codigo", "nome", "comercializador", "fornecimento", "potencias")}
+            for o in offers[:call.data["limit"]]
+        ],
+    }
+
+
+async def _async_what_if(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Cost of every offer over the consumption an energy meter recorded in the last days."""
+    entry_id = call.data.get("config_entry_id")
+    config = {}
+    if entry_id is not None:
+        entry_data = hass.data.get(DOMAIN, {}).get(entry_id)
+        if entry_data is None:
+            raise ServiceValidationError(f"Unknown config entry: {entry_id}")
+        config = entry_data["config"]
+    snapshot = loaded_snapshot(hass, entry_id)
+    if snapshot is None:
+        raise ServiceValidationError("No ERSE data loaded yet")
+    pot_cont = call.data.get("pot_cont") or next(iter(pot_values(config.get("pot_cont"))), None)
+    if not pot_cont:
+        raise ServiceValidationError("A potência (pot_cont) or a config entry is needed")
+    if "recorder" not in hass.config.components:
+        raise ServiceValidationError("The recorder is not running")
+
+    statistic_id = call.data["statistic_id"]
+    history = await async_get_history(hass)
+    recorded = await history.async_totals(hass, statistic_id, call.data["dias"])
+    if recorded is None:
+        raise ServiceValidationError(f"No hourly statistics of {statistic_id} in the last {call.data['dias']} days")
+    first, last, totals = recorded
+    ciclo = call.data.get("ciclo") or config.get("ciclo", DEFAULT_CICLO)
+    return await asyncio.to_thread(what_if, snapshot, statistic_id, first, last, totals, pot_cont, ciclo, call.data["limit"])
+
+
+def _async_register_admin(hass: HomeAssistant, service: str, service_func, schema: vol.Schema,
+                          supports_response: SupportsResponse) -> None:
+    """Register a service only admin users may call, keeping its response on every core."""
+    if _ADMIN_RESPONSES:
+        async_register_admin_service(hass, DOMAIN, service, service_func, schema, supports_response=supports_response)
+        return
+
+    async def admin_only(call: ServiceCall) -> ServiceResponse:
+        # The check of async_register_admin_service
+        if call.context.user_id:
+            user = await hass.auth.async_get_user(call.context.user_id)
+            if user is None:
+                raise UnknownUser(context=call.context)
+            if not user.is_admin:
+                raise Unauthorized(context=call.context)
+        return await service_func(call)
+
+    hass.services.async_register(DOMAIN, service, admin_only, schema=schema, supports_response=supports_response)
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the integration services once."""
+    if hass.services.has_service(DOMAIN, SERVICE_PRICE_HISTORY):
+        return
+
+    async def price_history(call: ServiceCall) -> ServiceResponse:
+        return await _async_price_history(hass, call)
+
+    async def backfill_archive(call: ServiceCall) -> ServiceResponse:
+        return await _async_backfill_archive(hass, call)
+
+    async def offer_details(call: ServiceCall) -> ServiceResponse:
+        return await _async_offer_details(hass, call)
+
+    async def export(call: ServiceCall) -> ServiceResponse:
+        return await _async_export(hass, call)
+
+    async def search_offers(call: ServiceCall) -> ServiceResponse:
+        return await _async_search_offers(hass, call)
+
+    async def what_if_call(call: ServiceCall) -> ServiceResponse:
+        return await _async_what_if(hass, call)
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_PRICE_HISTORY, price_history,
+        schema=PRICE_HISTORY_SCHEMA, supports_response=SupportsResponse.ONLY,
+    )
+    # Downloads up to a year of ERSE releases into the archive
+    _async_register_admin(hass, SERVICE_BACKFILL_ARCHIVE, backfill_archive, BACKFILL_ARCHIVE_SCHEMA, SupportsResponse.OPTIONAL)
+    hass.services.async_register(
+        DOMAIN, SERVICE_OFFER_DETAILS, offer_details,
+        schema=OFFER_DETAILS_SCHEMA, supports_response=SupportsResponse.ONLY,
+    )
+    # Writes files under the configuration directory
+    _async_register_admin(hass, SERVICE_EXPORT, export, EXPORT_SCHEMA, SupportsResponse.OPTIONAL)
+    hass.services.async_register(
+        DOMAIN, SERVICE_SEARCH_OFFERS, search_offers,
+        schema=SEARCH_OFFERS_SCHEMA, supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_WHAT_IF, what_if_call,
+        schema=WHAT_IF_SCHEMA, supports_response=SupportsResponse.ONLY,
+    )
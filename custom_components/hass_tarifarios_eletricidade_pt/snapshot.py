@@ -0,0 +1,409 @@
+"""In-memory snapshot of one processed ERSE release and its derived indexes.
+
+numpy and pandas are imported inside the functions that need them, which only run in
+executor jobs (or after a snapshot exists), so importing the integration stays cheap.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+from .const import CONSUMPTION_PROFILES, DOMAIN
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+    from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+# Key of the shared SnapshotCache in hass.data[DOMAIN]
+DATA_SNAPSHOTS = "snapshots"
+
+CODE_COL = "Código da oferta comercial"
+NAME_COL = "Nome da oferta comercial"
+COMERCIALIZADOR_COL = "Comercializador"
+SEGMENT_COL = "Segmento da oferta comercial"
+CONTAGEM_COL = "Ciclo de contagem"
+POT_NORM_COL = "Potência contratada__norm"
+TERMO_FIXO_COL = "Termo fixo (€/dia)"
+# Energy terms in the order used by CONSUMPTION_PROFILES:
+# simples | fora de vazio | ponta, then vazio | cheias, then vazio (tri-horária)
+ENERGY_TERM_COLS = [
+    "Termo de energia (€/kWh) - Simples | Fora de Vazio | Ponta",
+    "Termo de energia (€/kWh) - Vazio | Cheias",
+    "Termo de energia (€/kWh) - Vazio",
+]
+# Segments that are not offered to households
+NON_DOMESTIC_SEGMENTS = {"NDOM"}
+ESCALAO_COL = "Escalão de consumo"
+# Every price of a Precos_ELEGN row, in price-table value order
+PRICE_COLS = [
+    TERMO_FIXO_COL,
+    *ENERGY_TERM_COLS,
+    "Termo fixo (€/dia) - Gás Natural",
+    "Termo de energia (€/kWh) - Gás Natural",
+]
+# Names of the PRICE_COLS values in archive queries and events
+PRICE_FIELDS = ("termo_fixo", "termo_energia_1", "termo_energia_2", "termo_energia_3",
+                "termo_fixo_gn", "termo_energia_gn")
+# PRICE_COLS values of each commodity
+ELE_PRICES = slice(0, 4)
+GN_PRICES = slice(4, 6)
+
+
+def to_float(s: pd.Series) -> pd.Series:
+    """Convert a Portuguese-formatted numeric column ("0,1234") to floats."""
+    import pandas as pd
+
+    return pd.to_numeric(s.astype(str).str.replace(",", ".", regex=False).str.strip(), errors="coerce")
+
+
+class CostVector:
+    """Price terms of every offer for one (potência, contagem) pair."""
+
+    def __init__(self, codes, names, comercializadores, termo_fixo, energy_terms):
+        self.codes = codes
+        self.names = names
+        self.comercializadores = comercializadores
+        self.termo_fixo = termo_fixo
+        self.energy_terms = energy_terms
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def subset(self, mask) -> "CostVector":
+        """Return the offers selected by a boolean mask or index array."""
+        return CostVector(
+            self.codes[mask],
+            self.names[mask],
+            self.comercializadores[mask],
+            self.termo_fixo[mask],
+            self.energy_terms[mask],
+        )
+
+    def restrict(self, codes) -> "CostVector | None":
+        """Return only the offers whose code is in `codes`, or None if there are none."""
+        import numpy as np
+
+        mask = np.isin(self.codes, list(codes))
+        if not mask.any():
+            return None
+        return self.subset(mask)
+
+    def annual_costs(self, consumo_anual: float, contagem: str) -> np.ndarray:
+        """Estimated yearly cost of every offer in one vectorised pass."""
+        import numpy as np
+
+        weights = np.asarray(CONSUMPTION_PROFILES[contagem], dtype=float) * float(consumo_anual)
+        return self.termo_fixo * 365 + self.energy_terms @ weights
+
+    def period_costs(self, days: float, kwh: list[float]) -> np.ndarray:
+        """Cost of every offer over `days` days of the kWh of each period, indexed like the energy terms."""
+        import numpy as np
+
+        weights = np.zeros(self.energy_terms.shape[1])
+        weights[:len(kwh)] = kwh
+        return self.termo_fixo * float(days) + self.energy_terms @ weights
+
+
+def column_values(frame, name: str) -> list:
+    """Column as a list with None for missing cells, for either engine's frame."""
+    if name not in frame.columns:
+        return [None] * len(frame)
+    return [None if v is None or v != v else v for v in frame[name].tolist()]
+
+
+def float_values(frame, name: str) -> np.ndarray:
+    """Column as floats (NaN for missing or unparsable cells), for either engine's frame."""
+    import numpy as np
+
+    if name not in frame.columns:
+        return np.full(len(frame), np.nan)
+    column = frame[name]
+    if hasattr(column, "to_float_array"):
+        return np.frombuffer(column.to_float_array(), dtype=float)
+    return to_float(column).to_numpy(dtype=float)
+
+
+def normalize_pot(value) -> str:
+    """Potência in the dot format of the __norm columns ("6,9" -> "6.9")."""
+    return str(value).replace(",", ".").strip()
+
+
+def pot_values(pot_cont) -> list[str]:
+    """Potências of the pot_cont option: one string (older entries) or a list, without duplicates."""
+    if not pot_cont:
+        return []
+    values = {}
+    for value in [pot_cont] if isinstance(pot_cont, str) else pot_cont:
+        text = str(value).strip()
+        if text:
+            values.setdefault(normalize_pot(text), text)
+    return list(values.values())
+
+
+def text_value(v) -> str:
+    """Stripped text of a cell, "" when missing."""
+    return "" if v is None else str(v).strip()
+
+
+def build_cost_vectors(merged) -> dict[tuple[str, str], CostVector]:
+    """Group electricity price rows into one CostVector per (potência, contagem)."""
+    import numpy as np
+
+    required = [CODE_COL, CONTAGEM_COL, POT_NORM_COL, TERMO_FIXO_COL]
+    if merged.empty or any(c not in merged.columns for c in required):
+        return {}
+
+    domestic = np.array([text_value(v).upper() not in NON_DOMESTIC_SEGMENTS for v in column_values(merged, SEGMENT_COL)], dtype=bool)
+    termo_fixo = float_values(merged, TERMO_FIXO_COL)
+    terms = np.column_stack([float_values(merged, c) for c in ENERGY_TERM_COLS])
+    contagem = [text_value(v) for v in column_values(merged, CONTAGEM_COL)]
+
+    # An offer is priceable for a cycle only when every term the cycle uses is known
+    term_counts = {c: sum(1 for w in p if w) for c, p in CONSUMPTION_PROFILES.items()}
+    n_terms = np.array([term_counts.get(c, 0) for c in contagem], dtype=int)
+    used = np.arange(len(ENERGY_TERM_COLS)) < n_terms[:, None]
+    valid = domestic & ~np.isnan(termo_fixo) & ~(used & np.isnan(terms)).any(axis=1) & (n_terms > 0)
+    terms = np.where(used, np.nan_to_num(terms), 0.0)
+
+    codes = ["nan" if v is None else str(v) for v in column_values(merged, CODE_COL)]
+    names = ["" if v is None else str(v) for v in column_values(merged, NAME_COL)]
+    comercializadores = ["" if v is None else str(v) for v in column_values(merged, COMERCIALIZADOR_COL)]
+    pots = ["nan" if v is None else str(v) for v in column_values(merged, POT_NORM_COL)]
+
+    # Dual offers repeat the electricity rows once per gas escalão: keep the first one
+    groups: dict[tuple[str, str], list[int]] = {}
+    seen = set()
+    for i in np.flatnonzero(valid).tolist():
+        key = (pots[i], contagem[i], codes[i])
+        if key in seen:
+            continue
+        seen.add(key)
+        groups.setdefault(key[:2], []).append(i)
+
+    codes_arr = np.array(codes, dtype=object)
+    names_arr = np.array(names, dtype=object)
+    com_arr = np.array(comercializadores, dtype=object)
+    vectors = {}
+    for key, idx in groups.items():
+        vectors[key] = CostVector(codes_arr[idx], names_arr[idx], com_arr[idx], termo_fixo[idx], terms[idx])
+    _LOGGER.debug("Built %d cost vectors from %d price rows", len(vectors), len(seen))
+    return vectors
+
+
+def build_price_table(merged) -> dict[tuple[str, str, str, str], tuple]:
+    """Map (code, potência, contagem, escalão) to the row's PRICE_COLS values (None = missing)."""
+    import numpy as np
+
+    if merged.empty or CODE_COL not in merged.columns:
+        return {}
+    prices = np.column_stack([float_values(merged, c) for c in PRICE_COLS])
+    has_price = ~np.isnan(prices).all(axis=1)
+    values = np.where(np.isnan(prices), None, prices).tolist()
+    keys = zip(
+        column_values(merged, CODE_COL),
+        column_values(merged, POT_NORM_COL),
+        column_values(merged, CONTAGEM_COL),
+        column_values(merged, ESCALAO_COL),
+    )
+
+    table = {}
+    for i, (code, pot, contagem, escalao) in enumerate(keys):
+        if code is None or not has_price[i]:
+            continue
+        key = (str(code), text_value(pot), text_value(contagem), text_value(escalao))
+        previous = table.get(key)
+        if previous is None:
+            table[key] = tuple(values[i])
+        else:
+            # Rows repeated by the merge carry the same prices, but some dual offers
+            # split one key into an electricity row and a gas row: fill in the gaps
+            table[key] = tuple(v if v is not None else n for v, n in zip(previous, values[i]))
+    return table
+
+
+class OfferPrices:
+    """Electricity prices by potência and gas prices by escalão of every offer.
+
+    Built from the price table: a dual offer resolves both commodities with two dict
+    lookups instead of a scan of the merged frame.
+    """
+
+    def __init__(self, price_table: dict[tuple[str, str, str, str], tuple]):
+        # code -> {potência: ELE_PRICES values}, first row (and metering cycle) per potência
+        self.ele: dict[str, dict[str, tuple]] = {}
+        # code -> {escalão: GN_PRICES values}; the regulated tariff keeps its first network operator
+        self.gn: dict[str, dict[str, tuple]] = {}
+        for (code, pot, _contagem, escalao), values in price_table.items():
+            if pot and values[0] is not None:
+                self.ele.setdefault(code, {}).setdefault(pot, values[ELE_PRICES])
+            if escalao and any(v is not None for v in values[GN_PRICES]):
+                self.gn.setdefault(code, {}).setdefault(escalao, values[GN_PRICES])
+        _LOGGER.debug("Indexed prices of %d electricity and %d gas offers", len(self.ele), len(self.gn))
+
+    def electricity(self, code: str, pot_cont=None) -> tuple | None:
+        """ELE_PRICES of an offer at a potência (its first potência when None)."""
+        by_pot = self.ele.get(code)
+        if not by_pot:
+            return None
+        if pot_cont is None:
+            return next(iter(by_pot.values()))
+        return by_pot.get(normalize_pot(pot_cont))
+
+    def gas(self, code: str, escalao) -> tuple | None:
+        """GN_PRICES (termo fixo €/dia, termo de energia €/kWh) of an offer at an escalão."""
+        return self.gn.get(code, {}).get(str(escalao))
+
+    def escaloes(self, code: str) -> list[str]:
+        return sorted(self.gn.get(code, {}))
+
+
+def rank_offers(vector: CostVector, consumo_anual: float, contagem: str, count: int) -> list[dict]:
+    """Return the `count` cheapest offers of a cost vector, cheapest first."""
+    import numpy as np
+
+    costs = vector.annual_costs(consumo_anual, contagem)
+    count = max(0, min(count, len(costs)))
+    if 0 < count < len(costs):
+        # Vectorised top-k: partition the `count` cheapest to the front, then sort only those.
+        # Offers tied with the last one are all kept, so ties resolve in vector order.
+        kth = costs[np.argpartition(costs, count - 1)[count - 1]]
+        candidates = np.flatnonzero(costs <= kth)
+    else:
+        candidates = np.arange(len(costs))
+    # Cheapest first, ties in vector order
+    best = candidates[np.lexsort((candidates, costs[candidates]))][:count].tolist()
+    return [
+        {
+            "codigo": str(vector.codes[i]),
+            "nome": str(vector.names[i]),
+            "comercializador": str(vector.comercializadores[i]),
+            "custo_anual": round(float(costs[i]), 2),
+        }
+        for i in best
+    ]
+
+
+class TariffSnapshot:
+    """A processed ERSE release: the merged offers frame plus lazily built indexes."""
+
+    def __init__(self, cond_df: pd.DataFrame, merged: pd.DataFrame, digest: str, engine: str = "pandas"):
+        self.cond_df = cond_df
+        self.merged = merged
+        self.hash = digest
+        # "pandas" (DataFrames) or "lite" (lite_engine.LiteFrame)
+        self.engine = engine
+        # Seconds spent per build stage ("parse", "merge", "indexes")
+        self.timings: dict[str, float] = {}
+        self.loaded_at = datetime.now(timezone.utc)
+        # Catalogue.as_dict() shipped with a snapshot artefact, installed instead of rebuilt
+        self.prebuilt_catalogue: dict | None = None
+        self._cost_vectors = None
+        self._price_table = None
+        self._offer_prices = None
+        self._offer_index = None
+
+    @property
+    def empty(self) -> bool:
+        return self.merged.empty
+
+    @property
+    def cost_vectors(self) -> dict[tuple[str, str], CostVector]:
+        if self._cost_vectors is None:
+            self._cost_vectors = build_cost_vectors(self.merged)
+        return self._cost_vectors
+
+    @property
+    def cost_vector_count(self) -> int | None:
+        """Number of cost vectors, None while they are not built (never builds them)."""
+        return len(self._cost_vectors) if self._cost_vectors is not None else None
+
+    @property
+    def price_table(self) -> dict[tuple[str, str, str, str], tuple]:
+        if self._price_table is None:
+            self._price_table = build_price_table(self.merged)
+        return self._price_table
+
+    @property
+    def offer_prices(self) -> OfferPrices:
+        if self._offer_prices is None:
+            self._offer_prices = OfferPrices(self.price_table)
+        return self._offer_prices
+
+    @property
+    def offer_index(self):
+        """offer_filters.OfferIndex of the offers, for the compiled offer filters."""
+        if self._offer_index is None:
+            from .offer_filters import OfferIndex
+
+            self._offer_index = OfferIndex(self.cond_df)
+        return self._offer_index
+
+    def prepare(self) -> None:
+        """Build the derived indexes. Blocking; run it in an executor."""
+        if self._cost_vectors is None:
+            start = time.perf_counter()
+            self.cost_vectors
+            self.offer_prices
+            self.offer_index.validity
+            self.timings["indexes"] = time.perf_counter() - start
+
+    def cost_vector(self, pot_cont, contagem) -> CostVector | None:
+        pot = normalize_pot(pot_cont) if pot_cont else None
+        return self.cost_vectors.get((pot, str(contagem)))
+
+
+def payload_digest(cond_txt: str, precos_txt: str) -> str:
+    """Content hash of the two CSV texts of a release (the snapshot hash)."""
+    digest = hashlib.sha256()
+    digest.update(cond_txt.encode("utf-8"))
+    digest.update(precos_txt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SnapshotCache:
+    """The latest snapshot per engine, under every payload key it was loaded from.
+
+    A payload key is the fingerprint of a downloaded ZIP (its members' CRCs) or the
+    digest of the CSV texts; a release whose key is known is not extracted nor parsed
+    again, and loading it returns the same snapshot object.
+    """
+
+    def __init__(self):
+        self._latest: dict[str, tuple[set[str], TariffSnapshot]] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def keys(self, engine: str) -> frozenset[str]:
+        latest = self._latest.get(engine)
+        return frozenset(latest[0]) if latest else frozenset()
+
+    def get(self, engine: str, key: str) -> TariffSnapshot | None:
+        latest = self._latest.get(engine)
+        return latest[1] if latest and key in latest[0] else None
+
+    def put(self, engine: str, snapshot: TariffSnapshot, *keys: str) -> None:
+        """Remember a snapshot under its hash and keys; an alias when it is already the latest."""
+        latest = self._latest.get(engine)
+        if latest and latest[1] is snapshot:
+            latest[0].update(keys)
+        else:
+            self._latest[engine] = ({snapshot.hash, *keys}, snapshot)
+
+    def lock(self, engine: str) -> asyncio.Lock:
+        """Lock held while a snapshot of the engine is looked up and built."""
+        return self._locks.setdefault(engine, asyncio.Lock())
+
+
+def get_snapshot_cache(hass: HomeAssistant) -> SnapshotCache:
+    """Return the shared SnapshotCache, creating it on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    cache = domain_data.get(DATA_SNAPSHOTS)
+    if cache is None:
+        cache = domain_data[DATA_SNAPSHOTS] = SnapshotCache()
+    return cache
@@ -0,0 +1,371 @@
+"""Data sources of the ERSE CSV files, raced for the newest valid release.
+
+Three sources can provide a release: the ERSE simulator ZIP, raw copies of the two
+CSV files on a GitHub mirror, and a directory or ZIP on disk (air-gapped installs).
+Only ERSE is used by default; the mirror and the local source are opt-in, the
+latter also when an entry sets a local path.
+A fourth, opt-in one reads a snapshot artefact made by the build tool (see artefact)
+from a path or URL: its tables are already parsed, so only the merge is left.
+They are fetched concurrently; once RACE_DEADLINE has passed the newest valid
+release received so far wins, earlier arrivals winning ties. A source that answers
+with the release the caller is waiting for ends the race early, and when nothing
+valid has arrived by the deadline the first valid release to arrive wins.
+
+Every release carries a payload key (the CRCs of its ZIP members, else the digest
+of its CSV texts; the snapshot hash for an artefact). A release whose key the caller already has a snapshot for is
+neither extracted nor checked again.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import zipfile
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from email.utils import parsedate_to_datetime
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from .archive import release_date_from_url
+from .artefact import Artefact, ArtefactError, read_artefact, read_manifest
+from .const import DEFAULT_SOURCES, LOCAL_DATA_DIR
+from .downloader import (
+    COND_CSV,
+    PRECOS_CSV,
+    async_download_erse_zip,
+    async_get_latest_csv_url,
+    extract_csvs,
+    zip_fingerprint,
+)
+from .snapshot import payload_digest
+from .stats import get_stats
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds the sources are raced before the newest valid release so far wins
+RACE_DEADLINE = 30
+
+MIRROR_COND_URL = "https://raw.githubusercontent.com/lui54lb3rt0/hass_tarifarios_eletricidade_PT/refs/heads/main/data/CondComerciais.csv"
+MIRROR_PRECOS_URL = "https://raw.githubusercontent.com/lui54lb3rt0/hass_tarifarios_eletricidade_PT/refs/heads/main/data/Precos_ELEGN.csv"
+
+# Header columns a file must have to be taken for the ERSE one
+COND_HEADER = {"COM", "COD_Proposta", "NomeProposta"}
+PRECOS_HEADER = {"COD_Proposta", "Pot_Cont", "Contagem"}
+
+
+class SourceError(Exception):
+    """A source has no valid release: unreachable, missing or malformed files."""
+
+
+class SourceUnavailable(SourceError):
+    """A source has nothing where it looks by default, as nobody set it up."""
+
+
+@dataclass
+class Release:
+    """The two CSV texts of one release (or the ZIP holding them) and where they came from."""
+
+    source: str
+    url: str
+    # Payload key: "zip:" and the members' CRCs, else the digest of the CSV texts (the
+    # snapshot hash, which is also the key of an artefact)
+    key: str
+    # Publication date when the source tells it (ZIP name, Last-Modified, file time)
+    release_date: date | None = None
+    zip_size: int | None = None
+    cond_txt: str | None = None
+    precos_txt: str | None = None
+    zip_content: bytes | None = field(default=None, repr=False)
+    # zip_content is a snapshot artefact, decoded into artefact by read()
+    prebuilt: bool = False
+    artefact: Artefact | None = field(default=None, repr=False)
+
+    def read(self) -> None:
+        """Extract the CSV texts from the ZIP, or decode the artefact, once (blocking)."""
+        if self.prebuilt:
+            if self.artefact is None:
+                try:
+                    self.artefact = read_artefact(self.zip_content)
+                except ArtefactError as e:
+                    raise SourceError(f"{self.url}: {e}") from e
+        elif self.cond_txt is None:
+            try:
+                self.cond_txt, self.precos_txt = extract_csvs(self.zip_content)
+            except (zipfile.BadZipFile, FileNotFoundError) as e:
+                raise SourceError(f"{self.url}: {e}") from e
+        self.zip_content = None
+
+
+def _header(text: str) -> set[str]:
+    first_line = text.lstrip("\ufeff").split("\n", 1)[0]
+    return {name.strip() for name in first_line.split(";")}
+
+
+def check_release(release: Release) -> Release:
+    """The release itself when both files look like the ERSE ones; SourceError otherwise."""
+    if release.artefact is not None:
+        # Checked when it was built; only its tables are left to check
+        if not all(t["rows"] for t in release.artefact.manifest["tables"].values()):
+            raise SourceError(f"Artefact from {release.url} has an empty table")
+        return release
+    for name, text, columns in (
+        (COND_CSV, release.cond_txt, COND_HEADER),
+        (PRECOS_CSV, release.precos_txt, PRECOS_HEADER),
+    ):
+        missing = columns - _header(text or "")
+        if missing:
+            raise SourceError(f"{name} from {release.source} lacks columns {sorted(missing)}")
+        if text.strip().count("\n") < 1:
+            raise SourceError(f"{name} from {release.source} has no rows")
+    return release
+
+
+class DataSource:
+    """Somewhere a release of the ERSE files can be fetched from."""
+
+    name = ""
+
+    async def async_fetch(self, hass: HomeAssistant) -> Release:
+        raise NotImplementedError
+
+
+class ErseSource(DataSource):
+    """The simulator ZIP: the one at url, or the latest the page discovery finds."""
+
+    name = "erse"
+
+    def __init__(self, url: str | None = None):
+        self.url = url
+
+    async def async_fetch(self, hass: HomeAssistant) -> Release:
+        url = self.url
+        if url:
+            stats = get_stats(hass)
+            stats.start_discovery()
+            stats.discovered(url, "release_probe")
+        else:
+            _LOGGER.info("Finding latest ERSE CSV URL...")
+            url = await async_get_latest_csv_url(hass)
+
+        _LOGGER.info("Downloading ERSE data from: %s", url)
+        zip_content = await async_download_erse_zip(hass, url)
+        try:
+            key = await asyncio.to_thread(zip_fingerprint, zip_content)
+        except (zipfile.BadZipFile, FileNotFoundError) as e:
+            raise SourceError(f"{url}: {e}") from e
+        return Release(self.name, url, key, release_date_from_url(url), len(zip_content), zip_content=zip_content)
+
+
+class MirrorSource(DataSource):
+    """Raw copies of the two CSV files, e.g. on GitHub."""
+
+    name = "github"
+
+    def __init__(self, cond_url: str = MIRROR_COND_URL, precos_url: str = MIRROR_PRECOS_URL):
+        self.cond_url = cond_url
+        self.precos_url = precos_url
+
+    async def _async_get(self, hass: HomeAssistant, url: str) -> tuple[str, date | None]:
+        session = async_get_clientsession(hass)
+        async with session.get(url, timeout=60) as resp:
+            resp.raise_for_status()
+            content = await resp.read()
+            modified = resp.headers.get("Last-Modified")
+        try:
+            modified = parsedate_to_datetime(modified).date() if modified else None
+        except (TypeError, ValueError):
+            modified = None
+        return content.decode("utf-8-sig"), modified
+
+    async def async_fetch(self, hass: HomeAssistant) -> Release:
+        (cond_txt, cond_date), (precos_txt, precos_date) = await asyncio.gather(
+            self._async_get(hass, self.cond_url), self._async_get(hass, self.precos_url)
+        )
+        # A mirror is as recent as the older of its two files
+        dated = None if cond_date is None or precos_date is None else min(cond_date, precos_date)
+        key = await asyncio.to_thread(payload_digest, cond_txt, precos_txt)
+        return Release(self.name, self.cond_url, key, dated, cond_txt=cond_txt, precos_txt=precos_txt)
+
+
+def _file_date(path: str) -> date:
+    return datetime.fromtimestamp(os.path.getmtime(path)).date()
+
+
+def read_local_release(path: str) -> Release:
+    """Release in a ZIP file, or in a directory holding the two CSV files or ERSE ZIPs (blocking)."""
+    if os.path.isdir(path):
+        names = os.listdir(path)
+        csvs = {
+            wanted: next((os.path.join(path, n) for n in sorted(names) if n.endswith(wanted)), None)
+            for wanted in (COND_CSV, PRECOS_CSV)
+        }
+        if all(csvs.values()):
+            texts = []
+            for csv_path in csvs.values():
+                # Line endings kept as published, like the texts read from a ZIP
+                with open(csv_path, encoding="utf-8-sig", newline="") as f:
+                    texts.append(f.read())
+            dated = min(_file_date(p) for p in csvs.values())
+            return Release(LocalSource.name, path, payload_digest(*texts), dated, cond_txt=texts[0], precos_txt=texts[1])
+        zips = [os.path.join(path, n) for n in names if n.lower().endswith(".zip")]
+        if not zips:
+            raise SourceError(f"No {COND_CSV}/{PRECOS_CSV} nor ZIP in {path}")
+        # Newest ERSE release by its name, by file time for other names
+        path = max(zips, key=lambda p: (release_date_from_url(p) or _file_date(p), os.path.getmtime(p)))
+    if not os.path.isfile(path):
+        raise SourceError(f"{path} does not exist")
+    with open(path, "rb") as f:
+        zip_content = f.read()
+    try:
+        key = zip_fingerprint(zip_content)
+    except (zipfile.BadZipFile, FileNotFoundError) as e:
+        raise SourceError(f"{path}: {e}") from e
+    dated = release_date_from_url(os.path.abspath(path)) or _file_date(path)
+    return Release(LocalSource.name, path, key, dated, len(zip_content), zip_content=zip_content)
+
+
+class LocalSource(DataSource):
+    """A directory or ZIP on disk, for installs without internet access."""
+
+    name = "local"
+
+    def __init__(self, path: str, default: bool = False):
+        self.path = path
+        # The default directory under the configuration directory, not a path the user set
+        self.default = default
+
+    def _read(self) -> Release:
+        if self.default and not os.path.exists(self.path):
+            raise SourceUnavailable(f"{self.path} does not exist")
+        return read_local_release(self.path)
+
+    async def async_fetch(self, hass: HomeAssistant) -> Release:
+        return await asyncio.to_thread(self._read)
+
+
+def _is_url(location: str) -> bool:
+    return location.startswith(("http://", "https://"))
+
+
+class ArtefactSource(DataSource):
+    """A snapshot artefact of the build tool, on disk or at an http(s) URL."""
+
+    name = "artefacto"
+
+    def __init__(self, location: str):
+        self.location = location
+
+    async def _async_get(self, hass: HomeAssistant) -> bytes:
+        if not _is_url(self.location):
+            def _read() -> bytes:
+                with open(self.location, "rb") as f:
+                    return f.read()
+
+            try:
+                return await asyncio.to_thread(_read)
+            except OSError as e:
+                raise SourceError(f"{self.location}: {e}") from e
+        session = async_get_clientsession(hass)
+        async with session.get(self.location, timeout=60) as resp:
+            resp.raise_for_status()
+            return await resp.read()
+
+    async def async_fetch(self, hass: HomeAssistant) -> Release:
+        content = await self._async_get(hass)
+        try:
+            manifest = await asyncio.to_thread(read_manifest, content)
+        except ArtefactError as e:
+            raise SourceError(f"{self.location}: {e}") from e
+        released = manifest["release"].get("date")
+        return Release(
+            self.name, self.location, manifest["hash"], date.fromisoformat(released) if released else None,
+            len(content), zip_content=content, prebuilt=True,
+        )
+
+
+def build_sources(hass: HomeAssistant, fontes: list[str] | None = None, caminho_local: str | None = None,
+                  url: str | None = None, artefacto: str | None = None) -> list[DataSource]:
+    """Sources of an entry's options; relative local paths are under the configuration directory.
+
+    A local path adds the local source even when the options do not list it.
+    """
+    fontes = list(fontes or DEFAULT_SOURCES)
+    if caminho_local and "local" not in fontes:
+        fontes.append("local")
+    sources: list[DataSource] = []
+    if "erse" in fontes:
+        sources.append(ErseSource(url))
+    if "github" in fontes:
+        sources.append(MirrorSource())
+    if "local" in fontes:
+        sources.append(LocalSource(hass.config.path(caminho_local or LOCAL_DATA_DIR), default=not caminho_local))
+    if "artefacto" in fontes and artefacto:
+        sources.append(ArtefactSource(artefacto if _is_url(artefacto) else hass.config.path(artefacto)))
+    return sources
+
+
+def _newer(release: Release, best: Release | None) -> bool:
+    if best is None:
+        return True
+    return (release.release_date or date.min) > (best.release_date or date.min)
+
+
+def read_release(release: Release) -> Release:
+    """Extract and check the texts of a release (blocking)."""
+    release.read()
+    return check_release(release)
+
+
+async def _async_fetch_valid(hass: HomeAssistant, source: DataSource, known: frozenset[str]) -> Release:
+    release = await source.async_fetch(hass)
+    if release.key in known:
+        _LOGGER.debug("Data source %s payload %s already loaded", source.name, release.key[:24])
+        return release
+    return await asyncio.to_thread(read_release, release)
+
+
+async def async_race_sources(hass: HomeAssistant, sources: list[DataSource], deadline: float = RACE_DEADLINE,
+                             target_date: date | None = None, known: frozenset[str] = frozenset()) -> Release:
+    """Fetch every source concurrently; return the newest valid release (see module docstring).
+
+    target_date is the date of the release being waited for, when a probe has seen it:
+    the first valid release that recent ends the race. Releases whose payload key is in
+    known are returned unread.
+    """
+    if not sources:
+        raise SourceError("No data source configured")
+    loop = asyncio.get_running_loop()
+    tasks = {asyncio.create_task(_async_fetch_valid(hass, source, known)): source for source in sources}
+    pending = set(tasks)
+    end = loop.time() + deadline
+    best = None
+    try:
+        while pending:
+            # Until the deadline wait for better releases; after it only for a first one
+            timeout = None if best is None else end - loop.time()
+            if timeout is not None and timeout <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                source = tasks[task]
+                try:
+                    release = task.result()
+                except SourceUnavailable as e:
+                    _LOGGER.debug("Data source %s skipped: %s", source.name, e)
+                    continue
+                except Exception as e:
+                    _LOGGER.warning("Data source %s failed: %s", source.name, e)
+                    continue
+                _LOGGER.debug("Data source %s returned %s (released %s)", source.name, release.url, release.release_date)
+                if _newer(release, best):
+                    best = release
+            if best is not None and target_date is not None and best.release_date is not None and best.release_date >= target_date:
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+    if best is None:
+        raise SourceError(f"No valid release from {', '.join(s.name for s in sources)}")
+    return best
@@ -0,0 +1,66 @@
+"""Counters and sizes of the download pipeline, shared by every entry, for diagnostics."""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+# Key of the shared PipelineStats in hass.data[DOMAIN]
+DATA_STATS = "stats"
+
+
+class PipelineStats:
+    """What the last download did, plus cache hit/miss counters since startup."""
+
+    def __init__(self):
+        self.url = None
+        self.strategy = None
+        # Data source of the last release loaded (see sources)
+        self.source = None
+        self.release_date = None
+        self.head_probes = 0
+        self.candidate_urls = 0
+        self.sizes: dict[str, int] = {}
+        self.counters: dict[str, int] = {}
+        self.last_download = None
+
+    def start_discovery(self) -> None:
+        self.url = None
+        self.strategy = None
+        self.head_probes = 0
+        self.candidate_urls = 0
+
+    def discovered(self, url: str, strategy: str) -> None:
+        self.url = url
+        self.strategy = strategy
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def downloaded(self, **sizes: int) -> None:
+        self.sizes.update(sizes)
+        self.last_download = datetime.now(timezone.utc).isoformat()
+
+    def as_dict(self) -> dict:
+        return {
+            "url": self.url,
+            "strategy": self.strategy,
+            "source": self.source,
+            "release_date": self.release_date.isoformat() if self.release_date else None,
+            "head_probes": self.head_probes,
+            "candidate_urls": self.candidate_urls,
+            "sizes_bytes": dict(self.sizes),
+            "counters": dict(sorted(self.counters.items())),
+            "last_download": self.last_download,
+        }
+
+
+def get_stats(hass: HomeAssistant) -> PipelineStats:
+    """Return the shared PipelineStats, creating it on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    stats = domain_data.get(DATA_STATS)
+    if stats is None:
+        stats = domain_data[DATA_STATS] = PipelineStats()
+    return stats
@@ -0,0 +1,207 @@
+"""ERSE tariff-period calendar for bi-horária and tri-horária offers (BTN, mainland).
+
+The calendar for one (year, contagem, ciclo) is precomputed into a compact table of
+15-minute slots, so the current period and the next period boundary are O(1) lookups.
+"""
+from __future__ import annotations
+
+from array import array
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+LISBON_TZ = ZoneInfo("Europe/Lisbon")
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+# Period names per contagem, indexed like the energy terms of a CostVector
+# (Simples | Fora de Vazio | Ponta, then Vazio | Cheias, then Vazio)
+PERIOD_NAMES = {
+    "1": ("simples",),
+    "2": ("fora_vazio", "vazio"),
+    "3": ("ponta", "cheias", "vazio"),
+}
+
+_FV, _V2 = 0, 1
+_P, _C, _V3 = 0, 1, 2
+
+
+def _hm(value: str) -> int:
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _profile(*changes) -> tuple[tuple[int, int], ...]:
+    """Day profile as (start minute, period) pairs, starting at 00:00."""
+    return tuple((_hm(start), period) for start, period in changes)
+
+
+# Bi-horária: the daily cycle is the same all year round
+_BI_DIARIO = _profile(("00:00", _V2), ("08:00", _FV), ("22:00", _V2))
+_BI_SEMANAL_UTEIS = _profile(("00:00", _V2), ("07:00", _FV))
+_BI_SEMANAL_SABADO_INVERNO = _profile(
+    ("00:00", _V2), ("09:30", _FV), ("13:00", _V2), ("18:30", _FV), ("22:00", _V2)
+)
+_BI_SEMANAL_SABADO_VERAO = _profile(
+    ("00:00", _V2), ("09:00", _FV), ("14:00", _V2), ("20:00", _FV), ("22:00", _V2)
+)
+_BI_DOMINGO = _profile(("00:00", _V2))
+
+_TRI_DIARIO_INVERNO = _profile(
+    ("00:00", _V3), ("08:00", _C), ("09:00", _P), ("10:30", _C),
+    ("18:00", _P), ("20:30", _C), ("22:00", _V3),
+)
+_TRI_DIARIO_VERAO = _profile(
+    ("00:00", _V3), ("08:00", _C), ("10:30", _P), ("13:00", _C),
+    ("19:30", _P), ("21:00", _C), ("22:00", _V3),
+)
+_TRI_SEMANAL_UTEIS_INVERNO = _profile(
+    ("00:00", _V3), ("07:00", _C), ("09:30", _P), ("12:00", _C), ("18:30", _P), ("21:00", _C),
+)
+_TRI_SEMANAL_UTEIS_VERAO = _profile(
+    ("00:00", _V3), ("07:00", _C), ("09:15", _P), ("12:15", _C),
+)
+_TRI_SEMANAL_SABADO_INVERNO = _profile(
+    ("00:00", _V3), ("09:30", _C), ("13:00", _V3), ("18:30", _C), ("22:00", _V3)
+)
+_TRI_SEMANAL_SABADO_VERAO = _profile(
+    ("00:00", _V3), ("09:00", _C), ("14:00", _V3), ("20:00", _C), ("22:00", _V3)
+)
+_TRI_DOMINGO = _profile(("00:00", _V3))
+
+# (contagem, ciclo) -> (season, day type) -> profile
+# season: "inverno" | "verao" (legal time); day type: "uteis" | "sabado" | "domingo"
+SCHEDULES = {
+    ("2", "diario"): {
+        (season, day): _BI_DIARIO
+        for season in ("inverno", "verao") for day in ("uteis", "sabado", "domingo")
+    },
+    ("2", "semanal"): {
+        ("inverno", "uteis"): _BI_SEMANAL_UTEIS,
+        ("verao", "uteis"): _BI_SEMANAL_UTEIS,
+        ("inverno", "sabado"): _BI_SEMANAL_SABADO_INVERNO,
+        ("verao", "sabado"): _BI_SEMANAL_SABADO_VERAO,
+        ("inverno", "domingo"): _BI_DOMINGO,
+        ("verao", "domingo"): _BI_DOMINGO,
+    },
+    ("3", "diario"): {
+        (season, day): _TRI_DIARIO_INVERNO if season == "inverno" else _TRI_DIARIO_VERAO
+        for season in ("inverno", "verao") for day in ("uteis", "sabado", "domingo")
+    },
+    ("3", "semanal"): {
+        ("inverno", "uteis"): _TRI_SEMANAL_UTEIS_INVERNO,
+        ("verao", "uteis"): _TRI_SEMANAL_UTEIS_VERAO,
+        ("inverno", "sabado"): _TRI_SEMANAL_SABADO_INVERNO,
+        ("verao", "sabado"): _TRI_SEMANAL_SABADO_VERAO,
+        ("inverno", "domingo"): _TRI_DOMINGO,
+        ("verao", "domingo"): _TRI_DOMINGO,
+    },
+}
+
+
+def _season(day: date) -> str:
+    """Summer schedule applies while legal (DST) time is in force."""
+    noon = datetime.combine(day, time(12), tzinfo=LISBON_TZ)
+    return "verao" if noon.dst() else "inverno"
+
+
+def _day_type(day: date) -> str:
+    return ("uteis", "uteis", "uteis", "uteis", "uteis", "sabado", "domingo")[day.weekday()]
+
+
+@lru_cache(maxsize=None)
+def _day_slots(profile: tuple[tuple[int, int], ...]) -> bytes:
+    slots = bytearray(SLOTS_PER_DAY)
+    bounds = [start // SLOT_MINUTES for start, _ in profile] + [SLOTS_PER_DAY]
+    for (_, period), start, end in zip(profile, bounds, bounds[1:]):
+        slots[start:end] = bytes([period]) * (end - start)
+    return bytes(slots)
+
+
+class TariffCalendar:
+    """Period of every 15-minute slot of one year, plus the next change per slot."""
+
+    def __init__(self, year: int, contagem: str, ciclo: str):
+        self.year = year
+        self.contagem = contagem
+        self.ciclo = ciclo
+        self._first_day = date(year, 1, 1)
+        days = (date(year + 1, 1, 1) - self._first_day).days
+
+        schedule = SCHEDULES[(contagem, ciclo)]
+        periods = bytearray()
+        for d in range(days):
+            day = self._first_day + timedelta(days=d)
+            periods += _day_slots(schedule[(_season(day), _day_type(day))])
+        self.periods = bytes(periods)
+
+        # next_change[i]: first slot after i with a different period (len() if none this year)
+        size = len(self.periods)
+        next_change = array("I", bytes(4 * size))
+        next_change[size - 1] = size
+        for i in range(size - 2, -1, -1):
+            next_change[i] = i + 1 if periods[i + 1] != periods[i] else next_change[i + 1]
+        self.next_change = next_change
+
+    def _slot(self, local: datetime) -> int:
+        day = (local.date() - self._first_day).days
+        return day * SLOTS_PER_DAY + (local.hour * 60 + local.minute) // SLOT_MINUTES
+
+    def _slot_start(self, slot: int) -> datetime:
+        day, minute = divmod(slot, SLOTS_PER_DAY)
+        return datetime.combine(
+            self._first_day + timedelta(days=day),
+            time(minute * SLOT_MINUTES // 60, minute * SLOT_MINUTES % 60),
+            tzinfo=LISBON_TZ,
+        )
+
+    def slot_periods(self, moment: datetime, count: int) -> bytes:
+        """Periods of the `count` 15-minute slots from `moment` (an aware datetime of this year)."""
+        slot = self._slot(moment.astimezone(LISBON_TZ))
+        return self.periods[slot:slot + count]
+
+    def lookup(self, moment: datetime) -> tuple[int, datetime]:
+        """Return (period index, start of the next period) for an aware datetime.
+
+        A period still in force when the year ends runs on into next year's calendar,
+        so New Year is only a boundary when the period changes there.
+        """
+        local = moment.astimezone(LISBON_TZ)
+        slot = self._slot(local)
+        period, change = self.periods[slot], self.next_change[slot]
+        if change == len(self.periods):
+            following = get_calendar(self.year + 1, self.contagem, self.ciclo)
+            if following.periods[0] == period:
+                return period, following._slot_start(following.next_change[0])
+        return period, self._slot_start(change)
+
+
+# Days before New Year from which a lookup may read next year's calendar (the longest
+# run of one period, a weekend of vazio, carried over the year end)
+YEAR_END_MARGIN = timedelta(days=7)
+
+# Three years of every schedule: the what-if window and this year's and next year's sensors
+@lru_cache(maxsize=3 * len(SCHEDULES))
+def get_calendar(year: int, contagem: str, ciclo: str) -> TariffCalendar:
+    """Calendar for one year, built once and shared by every sensor."""
+    return TariffCalendar(year, contagem, ciclo)
+
+
+def warm_calendars(moment: datetime, contagem: str, ciclo: str) -> None:
+    """Build the calendars of the year of `moment` and the next one, so lookups never build one. Blocking."""
+    contagem = str(contagem)
+    if (contagem, ciclo) not in SCHEDULES:
+        return
+    year = moment.astimezone(LISBON_TZ).year
+    get_calendar(year, contagem, ciclo)
+    get_calendar(year + 1, contagem, ciclo)
+
+
+def current_period(moment: datetime, contagem: str, ciclo: str) -> tuple[int, datetime | None]:
+    """Return (period index, next boundary) at `moment`; no boundary for simples."""
+    contagem = str(contagem)
+    if (contagem, ciclo) not in SCHEDULES:
+        return 0, None
+    local = moment.astimezone(LISBON_TZ)
+    return get_calendar(local.year, contagem, ciclo).lookup(local)
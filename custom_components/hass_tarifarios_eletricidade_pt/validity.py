@@ -0,0 +1,98 @@
+"""Interval index over the offers' validity dates (Data de início / Data de fim).
+
+Both columns are parsed once into datetime64[D] arrays. The sorted, distinct days on
+which any offer starts or stops being valid split time into segments where the set
+of valid offers is constant; the mask of every segment is precomputed, so "offers
+valid on a day" and "next day the set changes" are one binary search each.
+
+An offer is valid from its start day through its end day, inclusive. A missing start
+or end leaves that side of the interval open.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime
+from typing import TYPE_CHECKING
+
+from .snapshot import text_value
+
+if TYPE_CHECKING:
+    import numpy as np
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_INI_COL = "Data de início da oferta comercial"
+DATA_FIM_COL = "Data de fim da oferta comercial"
+
+
+def parse_dates(values: list) -> np.ndarray:
+    """ERSE date cells ("01/09/2025", or ISO) to datetime64[D], NaT when missing or invalid."""
+    import numpy as np
+
+    parsed: dict = {}
+    out = np.empty(len(values), dtype="datetime64[D]")
+    for i, value in enumerate(values):
+        day = parsed.get(value, False)
+        if day is False:
+            day = parsed[value] = _parse_date(value)
+        out[i] = np.datetime64(day, "D") if day is not None else np.datetime64("NaT")
+    return out
+
+
+def _parse_date(value) -> date | None:
+    text = text_value(value)
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+class ValidityIndex:
+    """Offers valid on a given day, by binary search over the validity boundaries."""
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray):
+        import numpy as np
+
+        self.starts = starts
+        self.ends = ends
+        open_start = np.isnat(starts)
+        open_end = np.isnat(ends)
+        # Days on which the set of valid offers changes: a start, or the day after an end
+        self.boundaries = np.unique(np.concatenate([
+            starts[~open_start],
+            ends[~open_end] + np.timedelta64(1, "D"),
+        ]))
+        # masks[i]: offers valid from boundaries[i - 1] (inclusive) to boundaries[i];
+        # without boundaries every interval is open and masks[0] selects all offers
+        points = np.concatenate([
+            self.boundaries[:1] - np.timedelta64(1, "D"),
+            self.boundaries,
+        ]) if len(self.boundaries) else [np.datetime64("NaT")]
+        self.masks = [
+            (open_start | (starts <= point)) & (open_end | (point <= ends))
+            for point in points
+        ]
+        _LOGGER.debug("Validity index: %d offers, %d boundaries", len(starts), len(self.boundaries))
+
+    @classmethod
+    def from_values(cls, start_values: list, end_values: list) -> "ValidityIndex":
+        return cls(parse_dates(start_values), parse_dates(end_values))
+
+    def segment(self, day: date) -> int:
+        """Index of the validity segment containing `day` (into masks)."""
+        import numpy as np
+
+        return int(np.searchsorted(self.boundaries, np.datetime64(day, "D"), side="right"))
+
+    def valid_mask(self, day: date) -> np.ndarray:
+        """Boolean array of the offers valid on `day` (shared, do not modify)."""
+        return self.masks[self.segment(day)]
+
+    def next_boundary(self, day: date) -> date | None:
+        """First day after `day` on which some offer starts or stops being valid."""
+        i = self.segment(day)
+        if i >= len(self.boundaries):
+            return None
+        return self.boundaries[i].astype(object)
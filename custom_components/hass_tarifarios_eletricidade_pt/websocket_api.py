@@ -0,0 +1,49 @@
+"""Websocket API: paginated offer queries for dashboards."""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import config_validation as cv
+
+from .const import DOMAIN
+from .offer_query import DEFAULT_LIMIT, MAX_LIMIT, QUERY_FILTER_KEYS, QueryError, get_offer_queries, loaded_snapshot, run_query
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@websocket_api.websocket_command({
+    vol.Required("type"): f"{DOMAIN}/offers",
+    vol.Optional("entry_id"): cv.string,
+    vol.Optional("filters", default={}): vol.Schema({vol.Optional(key): object for key in QUERY_FILTER_KEYS}),
+    vol.Optional("sort", default=[]): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional("columns"): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional("cursor"): cv.string,
+    vol.Optional("limit", default=DEFAULT_LIMIT): vol.All(vol.Coerce(int), vol.Range(min=1, max=MAX_LIMIT)),
+})
+@websocket_api.async_response
+async def ws_offers(hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict) -> None:
+    """One page of offer rows: filtered, sorted ("-column" descending) and projected to the asked columns."""
+    snapshot = loaded_snapshot(hass, msg.get("entry_id"))
+    if snapshot is None:
+        connection.send_error(msg["id"], "not_loaded", "No ERSE data loaded yet")
+        return
+    try:
+        result = await asyncio.to_thread(
+            run_query, get_offer_queries(hass), snapshot, msg["filters"], msg["sort"], msg.get("columns"), msg.get("cursor"), msg["limit"]
+        )
+    except QueryError as e:
+        _LOGGER.debug("Offer query rejected: %s", e)
+        connection.send_error(msg["id"], e.code, str(e))
+        return
+    connection.send_result(msg["id"], result)
+
+
+@callback
+def async_setup_websocket_api(hass: HomeAssistant) -> None:
+    """Register the websocket commands."""
+    websocket_api.async_register_command(hass, ws_offers)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""Test script for the catalogue sensor mode and the offer_details pages (offline, a bare Home Assistant core on the local data/ source)."""
+
+import asyncio
+import sys
+import threading
+from unittest.mock import patch
+sys.path.append('custom_components')
+
+from homeassistant import config_entries
+from homeassistant.helpers import entity_registry as er
+
+from test_entry_options import DATA_DIR, DOMAIN, PACKAGE, _options, async_add_entry, async_hass, offer_entities
+
+SUMMARY_KINDS = ("ofertas", "termo_fixo_min", "termo_fixo_mediano", "termo_fixo_max", "oferta_mais_barata")
+
+
+def summary_entities(hass, entry) -> dict[str, str]:
+    """kind -> entity_id of the entry's catalogue sensors."""
+    prefix = f"{entry.entry_id}_summary_"
+    return {
+        e.unique_id.removeprefix(prefix): e.entity_id
+        for e in er.async_entries_for_config_entry(er.async_get(hass), entry.entry_id)
+        if e.unique_id.startswith(prefix)
+    }
+
+
+async def _test_catalogue_sensors():
+    async with async_hass() as hass:
+        entry = await async_add_entry(hass, modo_sensores="catalogo")
+        coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+        summary = coordinator.offer_summary()
+        assert len(summary) > 5 and not offer_entities(hass, entry)
+
+        entities = summary_entities(hass, entry)
+        assert sorted(entities) == sorted(SUMMARY_KINDS)
+        states = {kind: hass.states.get(entity_id) for kind, entity_id in entities.items()}
+        assert int(states["ofertas"].state) == len(summary)
+        for kind in ("termo_fixo_min", "termo_fixo_mediano", "termo_fixo_max"):
+            assert float(states[kind].state) == getattr(summary, kind), kind
+        assert summary.termo_fixo_min <= summary.termo_fixo_mediano <= summary.termo_fixo_max
+
+        cheapest = states["oferta_mais_barata"]
+        assert cheapest.state == summary.cheapest["codigo"]
+        assert cheapest.attributes["custo_anual"] == summary.cheapest["custo_anual"]
+        assert cheapest.attributes["nome_oferta_comercial"] == summary.cheapest["nome"]
+        assert cheapest.attributes["consumo_anual_kwh"] == coordinator.annual_consumption()
+        assert cheapest.attributes["potencia_norm"] == "6.9"
+        # Only the cheapest offer's details live in the state machine
+        assert "custo_anual" not in states["ofertas"].attributes
+
+        # The other offers are paged through the service, cheapest first
+        valid = coordinator.valid_offer_codes()
+        seen, offset, limit = [], 0, 4
+        while offset is not None:
+            page = await hass.services.async_call(
+                DOMAIN, "offer_details", {"config_entry_id": entry.entry_id, "offset": offset, "limit": limit},
+                blocking=True, return_response=True,
+            )
+            assert page["total"] == len(summary) and page["offset"] == offset and len(page["ofertas"]) <= limit
+            assert all(row["valida"] == (row["codigo"] in valid) for row in page["ofertas"])
+            seen.extend(row["codigo"] for row in page["ofertas"])
+            assert (page["next_offset"] is None) == (offset + limit >= len(summary))
+            offset = page["next_offset"]
+        assert seen == [o["codigo"] for o in summary.offers]
+        assert seen[0] == cheapest.state
+
+
+def test_catalogue_sensors():
+    """Catalogue sensors report the summary of the entry's offers, offer_details pages through all of them."""
+    asyncio.run(_test_catalogue_sensors())
+
+
+async def _test_summary_off_loop():
+    async with async_hass() as hass:
+        hass.states.async_set("sensor.consumo_anual", "2500", {"unit_of_measurement": "kWh"})
+        entry = await async_add_entry(hass, modo_sensores="catalogo", consumo_sensor="sensor.consumo_anual")
+        coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+        cheapest = summary_entities(hass, entry)["oferta_mais_barata"]
+        summary = coordinator.offer_summary()
+        assert hass.states.get(cheapest).attributes["custo_anual"] == summary.cheapest["custo_anual"]
+
+        data_loader = sys.modules[f"{PACKAGE}.data_loader"]
+        build = data_loader.build_offer_summary
+        threads = []
+
+        def recording_build(*args):
+            threads.append(threading.current_thread())
+            return build(*args)
+
+        with patch.object(data_loader, "build_offer_summary", side_effect=recording_build):
+            # Reading the summary (sensors, offer_details) never builds it
+            assert coordinator.offer_summary() is summary
+            await hass.services.async_call(
+                DOMAIN, "offer_details", {"config_entry_id": entry.entry_id}, blocking=True, return_response=True,
+            )
+            assert not threads
+
+            # A new annual consumption rebuilds it in the executor, then updates the sensors
+            hass.states.async_set("sensor.consumo_anual", "5000", {"unit_of_measurement": "kWh"})
+            await hass.async_block_till_done()
+            assert len(threads) == 1
+            assert coordinator.offer_summary() is not summary
+            assert hass.states.get(cheapest).attributes["consumo_anual_kwh"] == 5000
+            assert hass.states.get(cheapest).attributes["custo_anual"] == coordinator.offer_summary().cheapest["custo_anual"]
+
+            # So does a refilter, with the frame
+            await coordinator.async_apply_filters(pot_cont=["3,45"], consumo_sensor="sensor.consumo_anual")
+            await hass.async_block_till_done()
+            assert len(threads) == 2
+            assert hass.states.get(cheapest).attributes["potencia_norm"] == "3.45"
+        assert threading.main_thread() not in threads
+
+
+def test_summary_off_loop():
+    """The summary is built in the executor with the frame and on consumption changes, never when read."""
+    asyncio.run(_test_summary_off_loop())
+
+
+async def _test_mode_switch():
+    async with async_hass() as hass:
+        entry = await async_add_entry(hass)
+        coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+        offers = offer_entities(hass, entry)
+        assert offers and not summary_entities(hass, entry)
+
+        init = {"energy_type": "ele", "pot_cont": ["6,9"], "escalao_gn": "1", "engine": coordinator.engine,
+                "fontes": ["local"], "caminho_local": DATA_DIR}
+        await _options(hass, entry, init, {}, {"codigos_oferta": [], "modo_sensores": "catalogo"})
+        # The entry was reloaded with the catalogue sensors only
+        assert entry.state is config_entries.ConfigEntryState.LOADED
+        assert hass.data[DOMAIN][entry.entry_id]["config"]["modo_sensores"] == "catalogo"
+        assert not offer_entities(hass, entry)
+        assert all(hass.states.get(entity_id) is None for entity_id in offers.values())
+        assert sorted(summary_entities(hass, entry)) == sorted(SUMMARY_KINDS)
+
+        await _options(hass, entry, init, {}, {"codigos_oferta": [], "modo_sensores": "ofertas"})
+        assert entry.state is config_entries.ConfigEntryState.LOADED
+        assert not summary_entities(hass, entry)
+        assert offer_entities(hass, entry).keys() == offers.keys()
+
+
+def test_mode_switch():
+    """Switching the sensor mode in the options replaces the per-offer sensors by the catalogue ones and back."""
+    asyncio.run(_test_mode_switch())
+
+
+if __name__ == "__main__":
+    test_catalogue_sensors()
+    test_summary_off_loop()
+    test_mode_switch()
+    print("All catalogue mode tests passed")
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""Test script for the market-wide cheapest-offer ranking (offline, uses data/*.csv)."""
+
+import sys
+sys.path.append('custom_components')
+
+from hass_tarifarios_eletricidade_pt.data_loader import build_snapshot
+from hass_tarifarios_eletricidade_pt.snapshot import rank_offers
+
+
+def load_local_snapshot():
+    with open('data/CondComerciais.csv', encoding='utf-8-sig') as f:
+        cond_txt = f.read()
+    with open('data/Precos_ELEGN.csv', encoding='utf-8-sig') as f:
+        precos_txt = f.read()
+    return build_snapshot(cond_txt, precos_txt)
+
+
+def test_cheapest_offers():
+    """Rank all offers for 6,9 kVA bi-horária and check against a brute-force scan."""
+    snapshot = load_local_snapshot()
+    vector = snapshot.cost_vector("6,9", "2")
+    assert vector is not None and len(vector) > 0
+
+    ranking = rank_offers(vector, 2500, "2", 5)
+    print(f"Cheapest of {len(vector)} offers:")
+    for offer in ranking:
+        print(f"  {offer['codigo']:<20} {offer['comercializador']:<12} {offer['custo_anual']:>8.2f} €/ano")
+
+    costs = [round(vector.termo_fixo[i] * 365 + 2500 * (0.65 * vector.energy_terms[i][0] + 0.35 * vector.energy_terms[i][1]), 2)
+             for i in range(len(vector))]
+    assert [o["custo_anual"] for o in ranking] == sorted(costs)[:5]
+    assert len({o["codigo"] for o in ranking}) == len(ranking)
+
+    # Same order as a full stable sort, for any count (ties in vector order)
+    import numpy as np
+
+    full = np.argsort(vector.annual_costs(2500, "2"), kind="stable").tolist()
+    for count in (0, 1, 7, len(vector) - 1, len(vector), len(vector) + 10):
+        assert [o["codigo"] for o in rank_offers(vector, 2500, "2", count)] == [str(vector.codes[i]) for i in full[:count]]
+
+    # The vectors are built once per snapshot
+    assert snapshot.cost_vector("6.9", "2") is vector
+
+
+if __name__ == "__main__":
+    test_cheapest_offers()
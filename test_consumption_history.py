@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Test script for the what-if costs over recorded consumption (offline, uses data/*.csv and an in-memory recorder)."""
+
+import asyncio
+import math
+import sys
+from datetime import date, datetime, timedelta, timezone
+sys.path.append('custom_components')
+
+from hass_tarifarios_eletricidade_pt.data_loader import build_snapshot
+from hass_tarifarios_eletricidade_pt.history import (
+    BATCH_DAYS,
+    CYCLES,
+    MAX_DAYS,
+    OFFSETS,
+    HistoryStore,
+    MeterHistory,
+    bucket_hours,
+    period_kwh,
+    what_if,
+)
+from hass_tarifarios_eletricidade_pt.tariff_periods import LISBON_TZ, current_period
+
+from test_lite_engine import read_csvs
+
+NOW = datetime(2025, 10, 20, 9, 40, tzinfo=timezone.utc)
+
+
+class MemoryRecorder:
+    """Hourly long-term statistics held in memory, queried like the recorder's."""
+
+    def __init__(self, until: datetime):
+        self.rows = {}
+        self.queries = []
+        self.record(until - timedelta(days=400), until)
+
+    def record(self, start: datetime, end: datetime):
+        hour = start
+        while hour < end:
+            local = hour.astimezone(LISBON_TZ)
+            # A daily shape, so the periods get different shares
+            self.rows[hour.timestamp()] = 0.2 + 0.1 * (local.hour % 7) + (0.5 if local.weekday() == 6 else 0.0)
+            hour += timedelta(hours=1)
+
+    async def fetch(self, start: datetime, end: datetime):
+        self.queries.append((start, end))
+        return sorted((t, v) for t, v in self.rows.items() if start.timestamp() <= t < end.timestamp())
+
+
+def _slot_kwh(hours, contagem, ciclo, periods):
+    """Brute force: kWh per period from the current period of every 15-minute slot."""
+    sums = [0.0] * periods
+    for start, kwh in hours:
+        for quarter in range(4):
+            moment = datetime.fromtimestamp(start, timezone.utc) + timedelta(minutes=15 * quarter)
+            sums[current_period(moment, contagem, ciclo)[0]] += kwh / 4
+    return sums
+
+
+def test_buckets():
+    """Every hour is split into the periods of each cycle, quarter by quarter, across DST changes."""
+    recorder = MemoryRecorder(datetime(2025, 11, 1, tzinfo=timezone.utc))
+    # A week around the end of summer time, in Lisbon days
+    start = datetime(2025, 10, 22, 23, tzinfo=timezone.utc)
+    hours = sorted((t, v) for t, v in recorder.rows.items() if start.timestamp() <= t < (start + timedelta(days=7)).timestamp())
+    days = bucket_hours(hours)
+    assert sorted(days) == [(date(2025, 10, 23) + timedelta(days=i)).isoformat() for i in range(7)]
+    # The day summer time ends has 25 hours
+    assert days["2025-10-26"][0] == sum(v for t, v in hours if datetime.fromtimestamp(t, LISBON_TZ).date() == date(2025, 10, 26))
+    for row in days.values():
+        for cycle in CYCLES:
+            assert math.isclose(sum(period_kwh(row, cycle[0], cycle[1] or "diario")), row[0])
+
+    totals = [sum(row[i] for row in days.values()) for i in range(len(next(iter(days.values()))))]
+    for contagem, ciclo in CYCLES[1:]:
+        expected = _slot_kwh(hours, contagem, ciclo, len(period_kwh(totals, contagem, ciclo)))
+        got = period_kwh(totals, contagem, ciclo)
+        assert all(math.isclose(a, b) for a, b in zip(got, expected)), (contagem, ciclo)
+    assert OFFSETS[("1", None)] == 0
+
+
+def test_incremental_update():
+    """The first update reads the window in batches; later ones only the hours recorded since."""
+    recorder = MemoryRecorder(NOW.replace(minute=0) - timedelta(hours=2))
+    meter = MeterHistory("sensor.energia")
+    read = asyncio.run(meter.async_update(recorder.fetch, NOW))
+    assert read == MAX_DAYS * 24 - 2
+    assert len(recorder.queries) == math.ceil(MAX_DAYS / BATCH_DAYS)
+    assert max(e - s for s, e in recorder.queries) <= timedelta(days=BATCH_DAYS)
+
+    # The last hours are compiled later: they are read by the next update, and nothing else is
+    recorder.record(NOW.replace(minute=0) - timedelta(hours=2), NOW + timedelta(hours=1))
+    recorder.queries.clear()
+    read = asyncio.run(meter.async_update(recorder.fetch, NOW + timedelta(hours=1)))
+    assert read == 3 and len(recorder.queries) == 1
+
+    # Same buckets as reading the window at once; days older than the window are dropped
+    end = (NOW + timedelta(hours=1)).replace(minute=0)
+    window = sorted((t, v) for t, v in recorder.rows.items() if (end - timedelta(days=MAX_DAYS)).timestamp() <= t < end.timestamp())
+    expected = bucket_hours(window)
+    assert meter.days.keys() == expected.keys()
+    # The first day is partial (the window starts at an hour), and never within `dias` days
+    complete = sorted(expected)[1:]
+    assert all(math.isclose(a, b) for d in complete for a, b in zip(meter.days[d], expected[d]))
+
+    restored = MeterHistory.from_dict(meter.as_dict())
+    assert restored.through == meter.through and restored.days.keys() == meter.days.keys()
+
+
+def test_what_if():
+    """Offer costs are termo fixo × days plus each period's kWh at its price, cheapest first."""
+    cond_txt, precos_txt = read_csvs()
+    snapshot = build_snapshot(cond_txt, precos_txt, "lite")
+    recorder = MemoryRecorder(NOW.replace(minute=0))
+    meter = MeterHistory("sensor.energia")
+    asyncio.run(meter.async_update(recorder.fetch, NOW))
+    first, last = meter.window(30, NOW.astimezone(LISBON_TZ).date())
+    assert (first, last) == (date(2025, 9, 20), date(2025, 10, 19))
+
+    # The store hands out the sums taken under its lock, not the meter it keeps updating
+    history = HistoryStore()
+    today = MemoryRecorder(datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0))
+    start, end, totals = asyncio.run(history.async_totals(None, "sensor.energia", 30, today.fetch))
+    assert (end - start).days == 29 and totals == history.meters["sensor.energia"].totals(start, end)
+    history.meters["sensor.energia"].days[end.isoformat()][0] += 1.0
+    assert math.isclose(totals[0], history.meters["sensor.energia"].totals(start, end)[0] - 1.0)
+
+    result = what_if(snapshot, "sensor.energia", first, last, meter.totals(first, last), "6,9", "semanal", limit=2000)
+    assert result["statistic_id"] == "sensor.energia"
+    assert result["dias"] == 30
+    costs = [o["custo"] for o in result["ofertas"]]
+    assert costs == sorted(costs) and len(costs) > 100
+
+    hours = [(t, v) for t, v in recorder.rows.items() if first.isoformat() <= datetime.fromtimestamp(t, LISBON_TZ).date().isoformat() <= last.isoformat()]
+    assert math.isclose(result["consumo_kwh"]["total"], sum(v for _, v in hours), abs_tol=0.01)
+    for contagem, label in (("1", "Simples"), ("2", "Bi-horária"), ("3", "Tri-horária")):
+        vector = snapshot.cost_vector("6,9", contagem)
+        offer = next(o for o in result["ofertas"] if o["ciclo_contagem"] == label)
+        i = list(vector.codes).index(offer["codigo"])
+        kwh = _slot_kwh(hours, contagem, "semanal", 3) if contagem != "1" else [sum(v for _, v in hours)]
+        expected = vector.termo_fixo[i] * 30 + sum(p * k for p, k in zip(vector.energy_terms[i], kwh))
+        assert math.isclose(offer["custo"], expected, abs_tol=0.01), label
+    assert meter.window(30, date(2024, 1, 1)) is None
+
+
+if __name__ == "__main__":
+    test_buckets()
+    test_incremental_update()
+    test_what_if()
+    print("All consumption history tests passed")
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""Test script for the data sources, their racing and the payload dedupe (offline, uses data/*.csv)."""
+
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import zipfile
+from datetime import date
+sys.path.append('custom_components')
+
+from hass_tarifarios_eletricidade_pt.data_loader import build_snapshot
+from hass_tarifarios_eletricidade_pt.downloader import zip_fingerprint
+from hass_tarifarios_eletricidade_pt.scheduler import is_newer_release
+from hass_tarifarios_eletricidade_pt.snapshot import SnapshotCache, payload_digest
+from hass_tarifarios_eletricidade_pt.sources import (
+    DataSource,
+    ErseSource,
+    LocalSource,
+    MirrorSource,
+    Release,
+    SourceError,
+    SourceUnavailable,
+    async_race_sources,
+    build_sources,
+    check_release,
+    read_local_release,
+    read_release,
+)
+
+from test_lite_engine import read_csvs
+
+URL = "https://simuladorprecos.erse.pt/Admin/csvs/{}%20100313%20CSV.zip"
+
+
+class FakeSource(DataSource):
+    """Answers after `delay` seconds with a release of `release_date`, or fails."""
+
+    def __init__(self, name, delay, release_date=None, fail=False, key=None):
+        self.name = name
+        self.delay = delay
+        self.release_date = release_date
+        self.fail = fail
+        self.key = key
+
+    async def async_fetch(self, hass):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise SourceError(f"{self.name} is down")
+        if self.key:
+            # A ZIP that is not a ZIP: only valid when its key is known
+            return Release(self.name, self.name, self.key, self.release_date, zip_content=b"")
+        cond_txt, precos_txt = read_csvs()
+        return Release(self.name, self.name, payload_digest(cond_txt, precos_txt), self.release_date,
+                       cond_txt=cond_txt, precos_txt=precos_txt)
+
+
+def _race(*sources, deadline=0.2, target_date=None, known=frozenset()):
+    return asyncio.run(async_race_sources(None, list(sources), deadline, target_date, known)).source
+
+
+def _zip(path, members):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name in members:
+            zf.write(f"data/{os.path.basename(name)}", name)
+
+
+def test_local_source():
+    """The data directory, an ERSE-named ZIP and a directory of ZIPs are read; other paths are rejected."""
+    cond_txt, precos_txt = read_csvs()
+    release = read_local_release("data")
+    published = (release.cond_txt, release.precos_txt)
+    assert tuple(t.replace("\r\n", "\n") for t in published) == (cond_txt, precos_txt)
+    assert release.source == "local" and release.release_date is not None
+    check_release(release)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for day in ("20250912", "20250919"):
+            _zip(os.path.join(tmp, f"{day} 100313 CSV.zip"), ["csv/CondComerciais.csv", "csv/Precos_ELEGN.csv"])
+        release = read_local_release(tmp)
+        assert release.url.endswith("20250919 100313 CSV.zip")
+        assert release.release_date == date(2025, 9, 19) and release.zip_size > 0
+        # The ZIP is only extracted when asked to
+        assert release.cond_txt is None and release.key.startswith("zip:")
+        read_release(release)
+        assert (release.cond_txt, release.precos_txt) == published and release.zip_content is None
+
+        empty = os.path.join(tmp, "empty")
+        os.mkdir(empty)
+        for path in (empty, os.path.join(tmp, "missing.zip")):
+            try:
+                read_local_release(path)
+            except SourceError:
+                pass
+            else:
+                raise AssertionError(f"{path} accepted")
+
+        # Files that are not the ERSE ones are not a valid release
+        shutil.copy("data/Precos_ELEGN.csv", os.path.join(empty, "CondComerciais.csv"))
+        shutil.copy("data/Precos_ELEGN.csv", os.path.join(empty, "Precos_ELEGN.csv"))
+        try:
+            check_release(read_local_release(empty))
+        except SourceError:
+            pass
+        else:
+            raise AssertionError("wrong CondComerciais.csv accepted")
+
+
+class _Config:
+    def __init__(self, config_dir):
+        self.config_dir = config_dir
+
+    def path(self, *path):
+        return os.path.join(self.config_dir, *path)
+
+
+class _Hass:
+    def __init__(self, config_dir):
+        self.config = _Config(config_dir)
+
+
+def test_build_sources():
+    """Only ERSE by default; the mirror and the local source when listed, the latter also for a local path."""
+    with tempfile.TemporaryDirectory() as tmp:
+        hass = _Hass(tmp)
+        assert [type(s) for s in build_sources(hass)] == [ErseSource]
+        assert [type(s) for s in build_sources(hass, ["erse", "github"])] == [ErseSource, MirrorSource]
+
+        local = build_sources(hass, ["erse"], caminho_local="data")[-1]
+        assert isinstance(local, LocalSource) and local.path == os.path.join(tmp, "data") and not local.default
+
+        # Listed without a path: the default folder, skipped quietly while it does not exist
+        local = build_sources(hass, ["local"])[0]
+        assert local.default and local.path == os.path.join(tmp, "tarifarios_data")
+        try:
+            asyncio.run(local.async_fetch(hass))
+        except SourceUnavailable:
+            pass
+        else:
+            raise AssertionError("missing default folder read")
+        # A folder the user set is reported when missing
+        try:
+            asyncio.run(build_sources(hass, ["local"], caminho_local="missing")[0].async_fetch(hass))
+        except SourceUnavailable:
+            raise AssertionError("missing folder taken for the default one")
+        except SourceError:
+            pass
+
+
+def test_race():
+    """The newest valid release by the deadline wins; failures are skipped; the awaited release ends the race."""
+    old, new = date(2025, 9, 12), date(2025, 9, 19)
+    # Newest beats the faster older one, unless it comes after the deadline
+    assert _race(FakeSource("fast", 0, old), FakeSource("slow", 0.05, new)) == "slow"
+    assert _race(FakeSource("fast", 0, old), FakeSource("late", 1, new)) == "fast"
+    # Equally new (or undated): the first to arrive
+    assert _race(FakeSource("a", 0.05, new), FakeSource("b", 0, new)) == "b"
+    assert _race(FakeSource("a", 0.05), FakeSource("b", 0)) == "b"
+    # Nothing valid by the deadline: wait for the first valid one
+    assert _race(FakeSource("down", 0, fail=True), FakeSource("late", 0.4, old)) == "late"
+    # The release a probe has seen ends the race without waiting for the deadline
+    assert _race(FakeSource("erse", 0, new), FakeSource("mirror", 5, new), deadline=10, target_date=new) == "erse"
+    try:
+        _race(FakeSource("a", 0, fail=True), FakeSource("b", 0, fail=True))
+    except SourceError:
+        pass
+    else:
+        raise AssertionError("race without a valid release")
+
+    # A payload the caller already has is returned unread (the fake ZIP would not extract)
+    assert _race(FakeSource("zip", 0, new, key="zip:known"), known=frozenset({"zip:known"})) == "zip"
+    try:
+        _race(FakeSource("zip", 0, new, key="zip:other"), known=frozenset({"zip:known"}))
+    except SourceError:
+        pass
+    else:
+        raise AssertionError("unreadable ZIP accepted")
+
+    # A probe of ERSE is only newer than a mirror release when its date is
+    mirror = "https://raw.githubusercontent.com/x/CondComerciais.csv"
+    assert not is_newer_release(URL.format("20250919"), None, mirror, new)
+    assert is_newer_release(URL.format("20250920"), None, mirror, new)
+
+
+def test_payload_dedupe():
+    """ZIP fingerprints ignore re-packing; the cache returns one snapshot for every key of a payload."""
+    cond_txt, precos_txt = read_csvs()
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, f"{i}.zip") for i in range(3)]
+        _zip(paths[0], ["CondComerciais.csv", "Precos_ELEGN.csv"])
+        # Same files, other folder, order and compression time
+        _zip(paths[1], ["csv/Precos_ELEGN.csv", "csv/CondComerciais.csv"])
+        _zip(paths[2], ["CondComerciais.csv"])
+        fingerprints = []
+        for path in paths[:2]:
+            with open(path, "rb") as f:
+                fingerprints.append(zip_fingerprint(f.read()))
+        assert fingerprints[0] == fingerprints[1]
+        with open(paths[2], "rb") as f:
+            try:
+                zip_fingerprint(f.read())
+            except FileNotFoundError:
+                pass
+            else:
+                raise AssertionError("ZIP without Precos_ELEGN.csv fingerprinted")
+
+    cache = SnapshotCache()
+    snapshot = build_snapshot(cond_txt, precos_txt, "lite")
+    assert snapshot.hash == payload_digest(cond_txt, precos_txt)
+    cache.put("lite", snapshot, fingerprints[0])
+    assert cache.get("lite", fingerprints[0]) is snapshot
+    assert cache.get("lite", snapshot.hash) is snapshot
+    assert cache.get("pandas", snapshot.hash) is None
+    # A new key of the same snapshot is an alias; a new snapshot replaces the old keys
+    cache.put("lite", snapshot, "zip:alias")
+    assert cache.keys("lite") == {snapshot.hash, fingerprints[0], "zip:alias"}
+    other = build_snapshot(cond_txt.replace("GOLD", "GOLX"), precos_txt, "lite")
+    cache.put("lite", other, "zip:other")
+    assert cache.get("lite", fingerprints[0]) is None and cache.keys("lite") == {other.hash, "zip:other"}
+
+
+if __name__ == "__main__":
+    test_local_source()
+    test_build_sources()
+    test_race()
+    test_payload_dedupe()
+    print("All data source tests passed")
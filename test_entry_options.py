@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Test script for applying entry options in place (offline, a bare Home Assistant core on the local data/ source)."""
+
+import asyncio
+import os
+import sys
+import tempfile
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+sys.path.append('custom_components')
+
+from homeassistant import config_entries, loader
+from homeassistant.bootstrap import async_load_base_functionality
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+
+DOMAIN = "hass_tarifarios_eletricidade_pt"
+# The integration as Home Assistant loads it, from custom_components/
+PACKAGE = f"custom_components.{DOMAIN}"
+DATA_DIR = os.path.abspath("data")
+
+
+@asynccontextmanager
+async def async_hass():
+    """A Home Assistant core with its registries and config entries, in a temporary config dir."""
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        hass.config.skip_pip = True
+        hass.config_entries = config_entries.ConfigEntries(hass, {})
+        loader.async_setup(hass)
+        await async_load_base_functionality(hass)
+        # The websocket commands register without the HTTP server
+        hass.config.components.update({"http", "websocket_api"})
+        try:
+            yield hass
+        finally:
+            await hass.async_stop(force=True)
+
+
+async def async_add_entry(hass: HomeAssistant, caminho_local: str = DATA_DIR, **data) -> config_entries.ConfigEntry:
+    """Set up an entry reading the releases of a local folder."""
+    entry = config_entries.ConfigEntry(
+        version=1, minor_version=1, domain=DOMAIN, title=data.get("comercializador", "GOLD"), source="user",
+        data={
+            "comercializador": "GOLD", "energy_type": "ele", "pot_cont": ["6,9"], "contagem": "2",
+            "ciclo": "diario", "codigos_oferta": [], "fontes": ["local"], "caminho_local": caminho_local,
+            **data,
+        },
+        options={},
+    )
+    await hass.config_entries.async_add(entry)
+    await hass.async_block_till_done()
+    assert entry.state is config_entries.ConfigEntryState.LOADED
+    return entry
+
+
+def offer_entities(hass: HomeAssistant, entry) -> dict[str, str]:
+    """unique_id -> entity_id of the entry's per-offer sensors."""
+    shared = ("_cheapest_offers", "_current_price", "_gn")
+    return {
+        e.unique_id: e.entity_id
+        for e in er.async_entries_for_config_entry(er.async_get(hass), entry.entry_id)
+        if not e.unique_id.endswith(shared) and "_summary_" not in e.unique_id
+    }
+
+
+async def _options(hass: HomeAssistant, entry, init: dict, filters: dict, offers: dict) -> None:
+    flow = await hass.config_entries.options.async_init(entry.entry_id)
+    assert flow["step_id"] == "init"
+    flow = await hass.config_entries.options.async_configure(flow["flow_id"], init)
+    assert flow["step_id"] == "filters", flow.get("errors")
+    flow = await hass.config_entries.options.async_configure(flow["flow_id"], filters)
+    assert flow["step_id"] == "offers"
+    flow = await hass.config_entries.options.async_configure(flow["flow_id"], offers)
+    assert flow["type"] == "create_entry", flow.get("errors")
+    await hass.async_block_till_done()
+
+
+async def _test_options_refilter():
+    async with async_hass() as hass:
+        entry = await async_add_entry(hass)
+        coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+        snapshot = coordinator.snapshot
+        before = offer_entities(hass, entry)
+        assert len(before) > 3
+
+        kept = sorted(before)[:2]
+        codes = [unique_id.removeprefix(f"{entry.entry_id}_") for unique_id in kept]
+        data_loader = sys.modules[f"{PACKAGE}.data_loader"]
+        with patch.object(data_loader, "async_load_snapshot", side_effect=AssertionError("downloaded")) as load:
+            await _options(
+                hass, entry,
+                {"energy_type": "ele", "pot_cont": ["6,9"], "escalao_gn": "1", "engine": coordinator.engine,
+                 "fontes": ["local"], "caminho_local": DATA_DIR},
+                {"consumo_anual": 2500},
+                {"codigos_oferta": codes, "modo_sensores": "ofertas"},
+            )
+            assert not load.called
+
+        # The cached snapshot was filtered again, in place
+        assert entry.state is config_entries.ConfigEntryState.LOADED
+        assert coordinator.snapshot is snapshot and coordinator.consumo_anual == 2500
+        assert sorted(str(c) for c in coordinator.data["Código da oferta comercial"].unique()) == sorted(codes)
+
+        # Stale offer sensors are gone; the kept ones are the same entities, with their state
+        after = offer_entities(hass, entry)
+        assert after == {unique_id: before[unique_id] for unique_id in kept}
+        for entity_id in set(before.values()) - set(after.values()):
+            assert hass.states.get(entity_id) is None
+        for entity_id in after.values():
+            assert hass.states.get(entity_id) is not None
+
+        # Back to every offer: the removed sensors come back, still without a download
+        with patch.object(data_loader, "async_load_snapshot", side_effect=AssertionError("downloaded")):
+            await _options(
+                hass, entry,
+                {"energy_type": "ele", "pot_cont": ["6,9"], "escalao_gn": "1", "engine": coordinator.engine,
+                 "fontes": ["local"], "caminho_local": DATA_DIR},
+                {"consumo_anual": 2500},
+                {"codigos_oferta": [], "modo_sensores": "ofertas"},
+            )
+        assert offer_entities(hass, entry).keys() == before.keys()
+
+
+def test_options_refilter():
+    """An options change re-filters the cached snapshot and reconciles the offer sensors without a download."""
+    asyncio.run(_test_options_refilter())
+
+
+if __name__ == "__main__":
+    test_options_refilter()
+    print("All entry options tests passed")
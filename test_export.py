@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Test script for the streaming snapshot export (offline, uses data/*.csv)."""
+
+import asyncio
+import csv
+import json
+import os
+import sys
+import tempfile
+sys.path.append('custom_components')
+
+from homeassistant import auth
+from homeassistant.auth.const import GROUP_ID_ADMIN, GROUP_ID_USER
+from homeassistant.core import Context
+from homeassistant.exceptions import Unauthorized
+
+from hass_tarifarios_eletricidade_pt.data_loader import build_snapshot, filter_snapshot
+from hass_tarifarios_eletricidade_pt.export import ExportError, export_file_name, export_frame
+
+from test_entry_options import DOMAIN, async_add_entry, async_hass
+from test_lite_engine import _rows, read_csvs
+
+COLUMNS = ["Código da oferta comercial", "Potência contratada", "Termo fixo (€/dia)"]
+
+
+def test_export():
+    """CSV and JSON Lines exports, written in small chunks, hold exactly the frame's rows on both engines."""
+    cond_txt, precos_txt = read_csvs()
+    with tempfile.TemporaryDirectory() as tmp:
+        for engine in ("pandas", "lite"):
+            snapshot = build_snapshot(cond_txt, precos_txt, engine)
+            merged = snapshot.merged
+            expected = [[row[c] for c in COLUMNS] for row in _rows(merged)]
+
+            path = os.path.join(tmp, engine, export_file_name("tudo", "csv"))
+            info = export_frame(merged, path, "csv", COLUMNS, chunk_rows=997)
+            assert info["linhas"] == len(merged) and info["colunas"] == len(COLUMNS)
+            with open(path, encoding="utf-8", newline="") as f:
+                rows = list(csv.reader(f, delimiter=";"))
+            assert rows[0] == COLUMNS
+            assert rows[1:] == [["" if v is None else v for v in row] for row in expected], engine
+            assert not os.path.exists(f"{path}.tmp")
+
+            view = filter_snapshot(snapshot, comercializador="GOLD", energy_type="all")
+            path = os.path.join(tmp, engine, export_file_name("gold.jsonl", "jsonl"))
+            assert path.endswith("gold.jsonl")
+            export_frame(view, path, "jsonl", chunk_rows=50)
+            with open(path, encoding="utf-8") as f:
+                lines = [json.loads(line) for line in f]
+            assert lines == _rows(view), engine
+
+            try:
+                export_frame(view, path, "csv", ["Coluna inexistente"])
+            except ExportError:
+                pass
+            else:
+                raise AssertionError("unknown column accepted")
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:
+                try:
+                    export_frame(view, os.path.join(tmp, "x.parquet"), "parquet")
+                except ExportError:
+                    pass
+                else:
+                    raise AssertionError("parquet export without pyarrow")
+            else:
+                path = os.path.join(tmp, engine, "gold.parquet")
+                export_frame(view, path, "parquet", COLUMNS, chunk_rows=50)
+                assert pq.read_table(path).to_pylist() == [{c: row[c] for c in COLUMNS} for row in _rows(view)]
+            print(f"{engine:<7} exported {info['linhas']} rows, {info['bytes']} bytes")
+    assert export_file_name("../../etc/passwd", "csv") == "etc_passwd.csv"
+
+
+async def _test_admin_services():
+    async with async_hass() as hass:
+        hass.auth = await auth.auth_manager_from_config(hass, [], [])
+        entry = await async_add_entry(hass)
+        # The first user is the owner
+        admin = await hass.auth.async_create_user("admin", group_ids=[GROUP_ID_ADMIN])
+        user = await hass.auth.async_create_user("user", group_ids=[GROUP_ID_USER])
+        assert not user.is_admin
+        data = {"config_entry_id": entry.entry_id, "nome": "admin_only"}
+        try:
+            await hass.services.async_call(DOMAIN, "export", data, blocking=True, return_response=True,
+                                           context=Context(user_id=user.id))
+        except Unauthorized:
+            pass
+        else:
+            raise AssertionError("export called by a non-admin user")
+        assert not os.path.exists(hass.config.path("tarifarios_export"))
+
+        result = await hass.services.async_call(DOMAIN, "export", data, blocking=True, return_response=True,
+                                                context=Context(user_id=admin.id))
+        assert result["linhas"] > 0 and os.path.exists(result["ficheiro"])
+
+        # Backfilling downloads ERSE releases: admins only too (refused before any download)
+        try:
+            await hass.services.async_call(DOMAIN, "backfill_archive", {"dias": 365}, blocking=True,
+                                           return_response=True, context=Context(user_id=user.id))
+        except Unauthorized:
+            pass
+        else:
+            raise AssertionError("backfill_archive called by a non-admin user")
+
+
+def test_admin_services():
+    """Only admin users may write an export or backfill the archive; they still get the response."""
+    asyncio.run(_test_admin_services())
+
+
+if __name__ == "__main__":
+    test_export()
+    test_admin_services()
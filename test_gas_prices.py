@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""Test script for the per-escalão natural gas prices and the dual offer lookup (offline, uses data/*.csv)."""
+
+import sys
+sys.path.append('custom_components')
+
+import pandas as pd
+
+from hass_tarifarios_eletricidade_pt.data_loader import build_snapshot
+
+from test_lite_engine import read_csvs
+
+
+def _float(value):
+    return None if pd.isna(value) else float(value.replace(",", "."))
+
+
+def expected_gas_prices() -> dict:
+    """First TFGN/TVGN row of every (offer, escalão) in the raw price CSV."""
+    precos = pd.read_csv('data/Precos_ELEGN.csv', sep=';', dtype=str)
+    gas = precos[precos["Escalao"].notna() & (precos["TFGN"].notna() | precos["TVGN"].notna())]
+    expected = {}
+    for row in gas.itertuples(index=False):
+        expected.setdefault((row.COD_Proposta, row.Escalao), (_float(row.TFGN), _float(row.TVGN)))
+    return expected
+
+
+def test_gas_prices():
+    """Every (offer, escalão) resolves to the CSV prices, on both engines."""
+    expected = expected_gas_prices()
+    cond = pd.read_csv('data/CondComerciais.csv', sep=';', dtype=str)
+    offered = set(cond["COD_Proposta"])
+    expected = {key: prices for key, prices in expected.items() if key[0] in offered}
+    assert len(expected) > 1000
+
+    cond_txt, precos_txt = read_csvs()
+    for engine in ("pandas", "lite"):
+        prices = build_snapshot(cond_txt, precos_txt, engine).offer_prices
+        for (code, escalao), values in expected.items():
+            assert prices.gas(code, escalao) == values, (engine, code, escalao)
+        assert prices.escaloes("EDPC_89") == ["1", "2", "3", "4"]
+        # A dual offer resolves both commodities from the same index
+        assert prices.electricity("EDPC_89", "6,9") == (0.4931, 0.1424, None, None)
+        assert prices.gas("EDPC_89", 2) == (0.1114, 0.0953)
+        # Gas-only offers have no electricity prices
+        assert prices.electricity("AUDAX_01") is None
+    print(f"{len(expected)} (offer, escalão) gas prices match")
+
+
+if __name__ == "__main__":
+    test_gas_prices()
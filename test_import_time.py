@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Import-time benchmark: loading the integration must not import pandas, numpy or bs4."""
+
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ("pandas", "numpy", "bs4")
+INTEGRATION_MODULES = [
+    "hass_tarifarios_eletricidade_pt",
+    "hass_tarifarios_eletricidade_pt.config_flow",
+    "hass_tarifarios_eletricidade_pt.sensor",
+]
+# Home Assistant modules the integration imports, loaded first so they are not counted
+BASELINE = "import homeassistant.config_entries, homeassistant.components.sensor, homeassistant.helpers.update_coordinator"
+
+
+def _run(code: str) -> tuple[str, float]:
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=".",
+    ).stdout.rstrip("\n")
+    return out, time.perf_counter() - start
+
+
+def test_import_time():
+    """Import the integration in a fresh interpreter and report what it pulled in."""
+    code = (
+        "import sys, time; sys.path.insert(0, 'custom_components'); "
+        f"{BASELINE}; start = time.perf_counter(); "
+        + "; ".join(f"import {m}" for m in INTEGRATION_MODULES)
+        + "; elapsed = time.perf_counter() - start; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules)); print(elapsed)"
+    )
+    out, _ = _run(code)
+    loaded, elapsed = out.splitlines()[-2:]
+    print(f"Integration import: {float(elapsed) * 1000:.1f} ms, heavy modules loaded: {loaded or 'none'}")
+
+    pandas_out, _ = _run("import time; start = time.perf_counter(); import pandas; print(time.perf_counter() - start)")
+    print(f"For reference, importing pandas alone: {float(pandas_out) * 1000:.1f} ms")
+
+    assert not loaded, f"Integration import pulled in {loaded}"
+
+
+if __name__ == "__main__":
+    test_import_time()
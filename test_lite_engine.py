@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Test script comparing the pandas and lite data engines (offline, uses data/*.csv).
+
+Checks that both engines filter and rank identically, and prints build latency and
+peak traced memory of each one.
+"""
+
+import sys
+import time
+import tracemalloc
+sys.path.append('custom_components')
+
+from hass_tarifarios_eletricidade_pt.catalogue import Catalogue
+from hass_tarifarios_eletricidade_pt.data_loader import build_snapshot, filter_snapshot
+from hass_tarifarios_eletricidade_pt.snapshot import pot_values, rank_offers
+
+FILTERS = [
+    {},
+    {"comercializador": "GOLD", "pot_cont": "6,9"},
+    {"comercializador": "EDPC", "pot_cont": ["3,45", "6,9"]},
+    {"comercializador": "GOLD", "energy_type": "dual", "codigos_oferta": ["GOLD_12", "GOLD_14"]},
+    {"energy_type": "gn"},
+]
+
+
+def read_csvs():
+    with open('data/CondComerciais.csv', encoding='utf-8-sig') as f:
+        cond_txt = f.read()
+    with open('data/Precos_ELEGN.csv', encoding='utf-8-sig') as f:
+        precos_txt = f.read()
+    return cond_txt, precos_txt
+
+
+def _rows(df):
+    # pandas marks missing cells with NaN, the lite engine with None
+    return [{k: None if v != v else v for k, v in row.to_dict().items()} for _, row in df.iterrows()]
+
+
+def measure(engine, cond_txt, precos_txt):
+    """Build and index a snapshot; return (snapshot, seconds, peak traced bytes)."""
+    start = time.perf_counter()
+    snapshot = build_snapshot(cond_txt, precos_txt, engine)
+    snapshot.prepare()
+    elapsed = time.perf_counter() - start
+
+    # Traced separately: tracing slows allocation-heavy code down
+    tracemalloc.start()
+    build_snapshot(cond_txt, precos_txt, engine).prepare()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return snapshot, elapsed, peak
+
+
+def test_engines_match():
+    """Both engines return the same rows, rankings and catalogue."""
+    cond_txt, precos_txt = read_csvs()
+    pandas_snapshot = build_snapshot(cond_txt, precos_txt, "pandas")
+    lite_snapshot = build_snapshot(cond_txt, precos_txt, "lite")
+    assert lite_snapshot.engine == "lite"
+    assert pandas_snapshot.hash == lite_snapshot.hash
+
+    for filters in FILTERS:
+        expected = filter_snapshot(pandas_snapshot, **filters)
+        actual = filter_snapshot(lite_snapshot, **filters)
+        assert list(expected.columns) == list(actual.columns), filters
+        assert _rows(expected) == _rows(actual), filters
+
+    assert pandas_snapshot.cost_vectors.keys() == lite_snapshot.cost_vectors.keys()
+    for (pot, contagem), vector in pandas_snapshot.cost_vectors.items():
+        lite_vector = lite_snapshot.cost_vectors[(pot, contagem)]
+        assert rank_offers(vector, 3000, contagem, 20) == rank_offers(lite_vector, 3000, contagem, 20)
+
+    assert Catalogue.from_snapshot(pandas_snapshot).offers == Catalogue.from_snapshot(lite_snapshot).offers
+
+
+def test_multi_potencia():
+    """A list of potências selects the union of the single-potência rows."""
+    assert pot_values("6,9") == ["6,9"]
+    assert pot_values(["3,45", "6.9", "6,9", ""]) == ["3,45", "6.9"]
+    cond_txt, precos_txt = read_csvs()
+    for engine in ("pandas", "lite"):
+        snapshot = build_snapshot(cond_txt, precos_txt, engine)
+        both = _rows(filter_snapshot(snapshot, comercializador="EDPC", pot_cont=["3,45", "6,9"]))
+        single = [
+            row
+            for pot in ("3,45", "6,9")
+            for row in _rows(filter_snapshot(snapshot, comercializador="EDPC", pot_cont=pot))
+        ]
+        assert single and len(both) == len(single), engine
+        assert all(row in single for row in both), engine
+
+
+def test_benchmark():
+    """Report latency and peak memory of both engines."""
+    cond_txt, precos_txt = read_csvs()
+    for engine in ("pandas", "lite"):
+        snapshot, elapsed, peak = measure(engine, cond_txt, precos_txt)
+        assert not snapshot.empty
+        print(f"{engine:<7} build+index {elapsed * 1000:7.1f} ms  peak {peak / 1024 / 1024:6.1f} MiB  rows={len(snapshot.merged)}")
+
+
+if __name__ == "__main__":
+    test_engines_match()
+    test_multi_potencia()
+    test_benchmark()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Memory profile of the data pipeline and the offer sensor payloads (offline, uses data/*.csv).
+
+For every stage (CSV parse, merge, indexes, entry filter, entity attributes for 1, 10
+and all offers) tracemalloc reports:
+  peak   - highest extra memory while the stage ran
+  steady - memory still held by the stage's result afterwards
+
+Usage:
+  python test_memory_profile.py [--engine pandas|lite] [--save FILE] [--baseline FILE]
+
+--save writes the numbers as JSON; --baseline prints the change against a saved run.
+"""
+
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+from datetime import datetime, timezone
+sys.path.append('custom_components')
+
+from hass_tarifarios_eletricidade_pt.data_loader import (
+    HEADER_MAPPING,
+    _apply_header_mapping,
+    _read_csv,
+    build_snapshot,
+    filter_snapshot,
+)
+from hass_tarifarios_eletricidade_pt.sensor import _group_offers, _offer_codes
+from hass_tarifarios_eletricidade_pt.snapshot import CODE_COL
+
+ENTITY_COUNTS = (1, 10, None)  # None = every offer
+MIB = 1024 * 1024
+
+
+def read_csvs():
+    with open('data/CondComerciais.csv', encoding='utf-8-sig') as f:
+        cond_txt = f.read()
+    with open('data/Precos_ELEGN.csv', encoding='utf-8-sig') as f:
+        precos_txt = f.read()
+    return cond_txt, precos_txt
+
+
+def measure(func, *args):
+    """Run func(*args) under tracemalloc; return (result, peak bytes, steady bytes)."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = func(*args)
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak - before, current - before
+
+
+def _parse(csv_text, label, engine):
+    if engine == "lite":
+        from hass_tarifarios_eletricidade_pt.lite_engine import parse_csv
+
+        return parse_csv(csv_text, label, HEADER_MAPPING)
+    return _apply_header_mapping(_read_csv(csv_text, label))
+
+
+def _attrs_bytes(grouped):
+    """Size of the entity attributes as Home Assistant serialises them."""
+    return sum(len(json.dumps(o["attrs"], default=str).encode()) for o in grouped.values())
+
+
+def profile(engine="pandas"):
+    """Return {stage: {"peak": bytes, "steady": bytes, ...}} for one engine."""
+    cond_txt, precos_txt = read_csvs()
+    report = {}
+
+    # Warm-up run, so lazy imports and library caches are not charged to the first stage
+    filter_snapshot(build_snapshot(cond_txt, precos_txt, engine), None, None, None, "all")
+    build_snapshot(cond_txt, precos_txt, engine).prepare()
+
+    def record(stage, peak, steady, **extra):
+        report[stage] = {"peak": peak, "steady": steady, **extra}
+
+    cond, peak, steady = measure(_parse, cond_txt, "CondComerciais", engine)
+    record("cond_df", peak, steady)
+    precos, peak, steady = measure(_parse, precos_txt, "Precos_ELEGN", engine)
+    record("precos_df", peak, steady)
+    del cond, precos
+
+    # build_snapshot re-parses both files: steady is the parsed tables plus merged
+    snapshot, peak, steady = measure(build_snapshot, cond_txt, precos_txt, engine)
+    record("merged", peak, steady, rows=len(snapshot.merged), cols=len(snapshot.merged.columns))
+    _, peak, steady = measure(snapshot.prepare)
+    record("indexes", peak, steady, vectors=len(snapshot.cost_vectors))
+
+    data, peak, steady = measure(filter_snapshot, snapshot, None, None, None, "all")
+    record("coordinator_data", peak, steady, rows=len(data))
+
+    codes = _offer_codes(data)
+    ts = datetime.now(timezone.utc)
+    for count in ENTITY_COUNTS:
+        selected = set(codes[:count] if count else codes)
+        subset = data[data[CODE_COL].isin(selected)]
+        grouped, peak, steady = measure(_group_offers, subset, "ALL", ts)
+        record(f"entities_{count or 'all'}", peak, steady,
+               entities=len(grouped), attrs_bytes=_attrs_bytes(grouped))
+    return report
+
+
+def print_report(report, baseline=None):
+    print(f"{'stage':<18} {'peak MiB':>9} {'steady MiB':>11}  details")
+    for stage, values in report.items():
+        details = ", ".join(f"{k}={v}" for k, v in values.items() if k not in ("peak", "steady"))
+        line = f"{stage:<18} {values['peak'] / MIB:9.2f} {values['steady'] / MIB:11.2f}  {details}"
+        if baseline and stage in baseline:
+            line += f"  (steady {(values['steady'] - baseline[stage]['steady']) / MIB:+.2f} MiB vs baseline)"
+        print(line)
+
+
+def test_memory_profile():
+    """Every stage is measured and entity payloads grow with the entity count."""
+    report = profile()
+    print_report(report)
+    assert report["merged"]["steady"] > 0
+    assert report["coordinator_data"]["rows"] > 0
+    sizes = [report[f"entities_{c or 'all'}"] for c in ENTITY_COUNTS]
+    assert [s["entities"] for s in sizes[:2]] == [1, 10]
+    assert sizes[0]["attrs_bytes"] < sizes[1]["attrs_bytes"] < sizes[2]["attrs_bytes"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", choices=("pandas", "lite"), default="pandas")
+    parser.add_argument("--save", help="write the report as JSON")
+    parser.add_argument("--baseline", help="compare against a report saved with --save")
+    args = parser.parse_args()
+
+    report = profile(args.engine)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
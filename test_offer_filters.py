@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Test script for the compiled offer filters, bitfield columns, validity and consumption indexes (offline, uses data/*.csv)."""
+
+import sys
+from datetime import date, timedelta
+sys.path.append('custom_components')
+
+import pandas as pd
+
+from hass_tarifarios_eletricidade_pt.data_loader import build_snapshot, filter_snapshot
+from hass_tarifarios_eletricidade_pt.catalogue import Catalogue
+from hass_tarifarios_eletricidade_pt.consumption import ConsumptionIndex
+from hass_tarifarios_eletricidade_pt.flags import (
+    FATURACAO_COL,
+    PAGAMENTO_COL,
+    Contagem,
+    Contratacao,
+    Faturacao,
+    Pagamento,
+    decode_listed,
+    decode_positional,
+)
+from hass_tarifarios_eletricidade_pt.offer_filters import compile_filters, consumption_predicate
+from hass_tarifarios_eletricidade_pt.validity import ValidityIndex, parse_dates
+
+from test_lite_engine import _rows, read_csvs
+
+FILTERS = {
+    "sem_fidelizacao": True,
+    "renovavel": True,
+    "tipo_precos": "fixos",
+    "contratacao_eletronica": True,
+    "em_vigor": True,
+}
+DAY = date(2025, 10, 1)
+
+
+def expected_codes(day: date) -> set[str]:
+    """Brute-force scan of the raw CSV with the same rules."""
+    cond = pd.read_csv('data/CondComerciais.csv', sep=';', dtype=str)
+    start = pd.to_datetime(cond["Data ini"], format="%d/%m/%Y").dt.date
+    end = pd.to_datetime(cond["Data fim"], format="%d/%m/%Y").dt.date
+    keep = (
+        (cond["FiltroFidelização"] == "N")
+        & (cond["FiltroRenovavel"] == "S")
+        & (cond["FiltroPrecosIndex"] == "N")
+        & (cond["FiltroContratacao"].str[0] == "1")
+        & ((start <= day) | start.isna())
+        & ((end >= day) | end.isna())
+    )
+    return set(cond.loc[keep, "COD_Proposta"])
+
+
+def test_compiled_filters():
+    """One compiled selection matches a brute-force scan, on both engines."""
+    predicates = compile_filters(FILTERS, DAY)
+    assert len(predicates) == 5
+    assert compile_filters({"tipo_precos": "todos", "renovavel": False}) == ()
+
+    expected = expected_codes(DAY)
+    assert 0 < len(expected) < 687
+    cond_txt, precos_txt = read_csvs()
+    snapshots = [build_snapshot(cond_txt, precos_txt, engine) for engine in ("pandas", "lite")]
+    for snapshot in snapshots:
+        assert snapshot.offer_index.select(predicates) == expected
+        # Cached: the same frozenset comes back
+        assert snapshot.offer_index.select(predicates) is snapshot.offer_index.select(predicates)
+
+    # Intersected with the selected codes, then applied as a single code selection
+    # ACCIONA_02 has a loyalty period
+    codes = sorted(expected)[:3] + ["ACCIONA_02"]
+    frames = [
+        filter_snapshot(s, codigos_oferta=codes, energy_type="all", offer_filters={**FILTERS, "em_vigor": False})
+        for s in snapshots
+    ]
+    assert _rows(frames[0]) == _rows(frames[1])
+    kept = set(frames[0]["Código da oferta comercial"])
+    assert kept == set(codes) - {"ACCIONA_02"}
+    print(f"{len(expected)} offers match {predicates}")
+
+
+def test_bitfields():
+    """Digit strings decode to IntFlags, and channel queries are bitwise ANDs."""
+    assert decode_positional("101", Contratacao) == Contratacao.ELETRONICA | Contratacao.TELEFONICA
+    assert decode_positional("01", Faturacao) == Faturacao.PAPEL
+    assert decode_positional(None, Pagamento) == 0
+    assert decode_listed("123", Contagem) == Contagem.SIMPLES | Contagem.BI_HORARIA | Contagem.TRI_HORARIA
+    assert decode_listed("23", Contagem) == Contagem.BI_HORARIA | Contagem.TRI_HORARIA
+    assert decode_listed(" ", Contagem) == 0
+
+    cond = pd.read_csv('data/CondComerciais.csv', sep=';', dtype=str)
+    expected = set(cond.loc[(cond["FiltroPagamento"].str[0] == "1") & (cond["Filtrofaturacao"].str[0] == "1"), "COD_Proposta"])
+
+    cond_txt, precos_txt = read_csvs()
+    for engine in ("pandas", "lite"):
+        index = build_snapshot(cond_txt, precos_txt, engine).offer_index
+        bits = index.bits
+        mask = ((bits[PAGAMENTO_COL] & Pagamento.DEBITO_DIRETO) != 0) & ((bits[FATURACAO_COL] & Faturacao.ELETRONICA) != 0)
+        assert set(index.codes[mask]) == expected
+        assert index.select(compile_filters({"debito_direto": True, "fatura_eletronica": True})) == expected
+        assert index.flags("GOLD_12")["ciclos_contagem_oferta"] == ["simples", "bi_horaria"]
+
+
+def test_validity_index():
+    """Offers valid on each day match a scan, and next_boundary is the next change."""
+    starts = parse_dates(["01/01/2025", None, "2025-03-01", "15/02/2025", "bad"])
+    ends = parse_dates(["31/01/2025", "28/02/2025", None, "15/02/2025", None])
+    index = ValidityIndex(starts, ends)
+    assert index.valid_mask(date(2024, 12, 31)).tolist() == [False, True, False, False, True]
+    assert index.valid_mask(date(2025, 2, 15)).tolist() == [False, True, False, True, True]
+    assert index.next_boundary(date(2024, 12, 31)) == date(2025, 1, 1)
+    assert index.next_boundary(date(2025, 2, 15)) == date(2025, 2, 16)
+    assert index.next_boundary(date(2025, 3, 1)) is None
+    assert ValidityIndex(parse_dates([None]), parse_dates([None])).valid_mask(DAY).tolist() == [True]
+
+    cond_txt, precos_txt = read_csvs()
+    index = build_snapshot(cond_txt, precos_txt, "lite").offer_index
+    for day in pd.date_range("2024-06-01", "2026-06-01", freq="7D").date:
+        assert index.valid_codes(day) == expected_validity(day)
+        boundary = index.validity.next_boundary(day)
+        if boundary is not None:
+            assert boundary > day
+            assert index.valid_codes(boundary) != index.valid_codes(boundary - timedelta(days=1))
+
+
+def expected_validity(day: date) -> set[str]:
+    cond = pd.read_csv('data/CondComerciais.csv', sep=';', dtype=str)
+    start = pd.to_datetime(cond["Data ini"], format="%d/%m/%Y").dt.date
+    end = pd.to_datetime(cond["Data fim"], format="%d/%m/%Y").dt.date
+    return set(cond.loc[((start <= day) | start.isna()) & ((end >= day) | end.isna()), "COD_Proposta"])
+
+
+def test_consumption_index():
+    """Offers eligible for a consumption match a scan of ConsIni/ConsFim, on and between limits."""
+    import numpy as np
+
+    nan = np.nan
+    lower = np.array([nan, 0, 5000, 1000, nan])
+    upper = np.array([nan, 10000, nan, 1000, 2500])
+    index = ConsumptionIndex(lower, upper)
+    for kwh in (0, 0.5, 999, 1000, 1000.5, 2500, 2500.1, 4999, 5000, 10000, 10001, 1e6):
+        expected = [(np.isnan(lo) or lo <= kwh) and (np.isnan(hi) or kwh <= hi) for lo, hi in zip(lower, upper)]
+        assert index.eligible_mask(kwh).tolist() == expected, kwh
+    assert ConsumptionIndex(np.array([nan]), np.array([nan])).eligible_mask(1).tolist() == [True]
+
+    cond = pd.read_csv('data/CondComerciais.csv', sep=';', dtype=str)
+    cond_txt, precos_txt = read_csvs()
+    snapshot = build_snapshot(cond_txt, precos_txt, "lite")
+    catalogue = Catalogue.from_snapshot(snapshot)
+    for fuel, suffix in (("ele", "ELE"), ("gn", "GN")):
+        lo = pd.to_numeric(cond[f"ConsIni_{suffix}"])
+        hi = pd.to_numeric(cond[f"ConsFim_{suffix}"])
+        for kwh in (0, 3000, 10000, 10001, 20000, 20001):
+            expected = set(cond.loc[(lo.isna() | (lo <= kwh)) & (hi.isna() | (kwh <= hi)), "COD_Proposta"])
+            assert snapshot.offer_index.eligible_codes(kwh, fuel) == expected
+            energy_type = "gn" if fuel == "gn" else "all"
+            assert {o["codigo"] for o in catalogue.offers_for(energy_type=energy_type, consumo_anual=kwh)} == (
+                {o["codigo"] for o in catalogue.offers_for(energy_type=energy_type)} & expected
+            )
+    # Combined with the other filters in one selection
+    predicates = (*compile_filters(FILTERS, DAY), consumption_predicate(25000))
+    assert snapshot.offer_index.select(predicates) == expected_codes(DAY) & snapshot.offer_index.eligible_codes(25000)
+
+
+if __name__ == "__main__":
+    test_compiled_filters()
+    test_bitfields()
+    test_validity_index()
+    test_consumption_index()
+    print("All offer filter tests passed")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Test script for the paginated offer queries behind the websocket API (offline, uses data/*.csv)."""
+
+import sys
+sys.path.append('custom_components')
+
+from hass_tarifarios_eletricidade_pt.data_loader import build_snapshot, filter_snapshot
+from hass_tarifarios_eletricidade_pt.offer_query import OfferQueries, QueryError, encode_cursor, query_key, run_query
+from hass_tarifarios_eletricidade_pt.snapshot import column_values
+
+from test_lite_engine import read_csvs
+
+CODE = "Código da oferta comercial"
+TERMO_FIXO = "Termo fixo (€/dia)"
+FILTERS = {"comercializador": "GOLD", "energy_type": "ele", "sem_fidelizacao": True}
+SORT = [f"-{TERMO_FIXO}", CODE]
+
+
+def _pages(queries, snapshot, limit):
+    rows, cursor = [], None
+    while True:
+        page = run_query(queries, snapshot, FILTERS, SORT, [CODE, TERMO_FIXO], cursor, limit)
+        rows.extend(page["rows"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return page["total"], rows
+
+
+def expected_rows(snapshot):
+    """Brute-force order: termo fixo descending (missing last), then code ascending."""
+    frame = filter_snapshot(snapshot, comercializador="GOLD", energy_type="ele", offer_filters={"sem_fidelizacao": True})
+    rows = [
+        {CODE: code, TERMO_FIXO: tf}
+        for code, tf in zip(column_values(frame, CODE), column_values(frame, TERMO_FIXO))
+    ]
+    present = sorted((r for r in rows if r[TERMO_FIXO]), key=lambda r: r[CODE])
+    present.sort(key=lambda r: float(r[TERMO_FIXO].replace(",", ".")), reverse=True)
+    return present + [r for r in rows if not r[TERMO_FIXO]]
+
+
+def test_offer_query():
+    """Cursor pages of a sorted, projected query cover the filtered rows once, on both engines."""
+    cond_txt, precos_txt = read_csvs()
+    results = {}
+    for engine in ("pandas", "lite"):
+        snapshot = build_snapshot(cond_txt, precos_txt, engine)
+        queries = OfferQueries(size=2)
+        total, rows = _pages(queries, snapshot, 7)
+        assert total == len(rows) > 7, engine
+        assert rows == expected_rows(snapshot), engine
+        # One view served every page
+        assert len(queries) == 1
+        results[engine] = rows
+
+        for cursor, code in (
+            ("not-a-cursor", "invalid_cursor"),
+            (encode_cursor("0" * 64, query_key(FILTERS, SORT), 7), "cursor_expired"),
+            (encode_cursor(snapshot.hash, query_key({}, []), 7), "invalid_cursor"),
+        ):
+            try:
+                run_query(queries, snapshot, FILTERS, SORT, None, cursor)
+            except QueryError as e:
+                assert e.code == code, (engine, e.code)
+            else:
+                raise AssertionError(f"{code} not raised")
+        try:
+            run_query(queries, snapshot, FILTERS, ["Coluna inexistente"], None, None)
+        except QueryError as e:
+            assert e.code == "unknown_column"
+        else:
+            raise AssertionError("unknown_column not raised")
+
+        # Least recently used views are evicted
+        run_query(queries, snapshot, {"comercializador": "EDPC"}, [], None, None, 1)
+        run_query(queries, snapshot, {"comercializador": "COOP"}, [], None, None, 1)
+        assert len(queries) == 2
+    assert results["pandas"] == results["lite"]
+    print(f"{len(results['pandas'])} rows paged identically on both engines")
+
+
+if __name__ == "__main__":
+    test_offer_query()
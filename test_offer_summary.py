@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Test script for the catalogue mode offer summary and its pages (offline, uses data/*.csv)."""
+
+import sys
+sys.path.append('custom_components')
+
+import numpy as np
+
+from hass_tarifarios_eletricidade_pt.data_loader import build_snapshot, filter_snapshot
+from hass_tarifarios_eletricidade_pt.offer_summary import build_offer_summary, offer_names
+from hass_tarifarios_eletricidade_pt.snapshot import rank_offers
+
+from test_lite_engine import read_csvs
+
+
+def test_offer_summary():
+    """Summary statistics match the price index, the cheapest offer matches the ranking, pages cover every offer."""
+    cond_txt, precos_txt = read_csvs()
+    for engine in ("pandas", "lite"):
+        snapshot = build_snapshot(cond_txt, precos_txt, engine)
+        data = filter_snapshot(snapshot, comercializador="EDPC", pot_cont="6,9", energy_type="all")
+        names = offer_names(data)
+        summary = build_offer_summary(snapshot, data, "6,9", "2", 3000, "1")
+        assert len(summary) == len(names) > 100, engine
+
+        termos = [snapshot.offer_prices.electricity(c, "6,9")[0] for c in names if snapshot.offer_prices.electricity(c, "6,9")]
+        termos = np.array([t for t in termos if t is not None])
+        assert summary.termo_fixo_min == round(float(termos.min()), 4)
+        assert summary.termo_fixo_mediano == round(float(np.median(termos)), 4)
+        assert summary.termo_fixo_max == round(float(termos.max()), 4)
+
+        vector = snapshot.cost_vector("6,9", "2").restrict(names)
+        best = rank_offers(vector, 3000, "2", 1)[0]
+        assert summary.cheapest["codigo"] == best["codigo"], engine
+        assert summary.cheapest["custo_anual"] == best["custo_anual"]
+        assert set(summary.cheapest["termos_energia_eur_kwh"]) == {"fora_vazio", "vazio"}
+
+        # Gas-only offers have no electricity cost and come last
+        costs = [o["custo_anual"] for o in summary.offers]
+        priced = [c for c in costs if c is not None]
+        assert priced == sorted(priced) and costs[:len(priced)] == priced
+
+        seen, offset = [], 0
+        while offset is not None:
+            page = summary.page(offset, 40, valid_codes=frozenset(names))
+            assert page["total"] == len(summary) and len(page["ofertas"]) <= 40
+            assert all(row["valida"] for row in page["ofertas"])
+            seen.extend(row["codigo"] for row in page["ofertas"])
+            offset = page["next_offset"]
+        assert seen == [o["codigo"] for o in summary.offers]
+        assert "valida" not in summary.offers[0]
+        print(f"{engine:<7} {len(summary)} offers, cheapest {summary.cheapest['codigo']} {summary.cheapest['custo_anual']} €/year")
+
+
+if __name__ == "__main__":
+    test_offer_summary()
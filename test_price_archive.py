@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Test script for the delta-encoded ERSE release archive (offline, uses data/*.csv)."""
+
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+from unittest.mock import patch
+sys.path.append('custom_components')
+
+from hass_tarifarios_eletricidade_pt import archive as archive_module
+from hass_tarifarios_eletricidade_pt.archive import PriceArchive, release_date_from_url
+
+from test_cheapest_offers import load_local_snapshot
+
+
+def test_price_archive():
+    """Three releases, one of them backfilled, queried by date and by offer."""
+    table = load_local_snapshot().price_table
+    key = next(k for k in table if k[0] == "GOLD_12")
+    other = next(k for k in table if k[0] != "GOLD_12")
+
+    march = dict(table)
+    march[key] = (1.0,) + table[key][1:]
+    may = dict(march)
+    may[key] = (2.0,) + table[key][1:]
+    del may[other]
+
+    with tempfile.TemporaryDirectory() as path:
+        archive = PriceArchive(path)
+        assert archive.add_release("a" * 64, date(2025, 1, 1), table)
+        assert archive.add_release("c" * 64, date(2025, 5, 1), may)
+        # Backfilled release lands between the two and the May delta is rebased on it
+        assert archive.add_release("b" * 64, date(2025, 3, 1), march)
+        assert not archive.add_release("b" * 64, date(2025, 3, 1), march)
+        assert [r["date"] for r in archive.releases] == ["2025-01-01", "2025-03-01", "2025-05-01"]
+        print(f"Archive files: {sorted(os.listdir(path))}")
+
+        reopened = PriceArchive(path)
+        variant = "|".join(key[1:])
+        assert reopened.price_on("GOLD_12", date(2025, 2, 1))[variant]["termo_fixo"] == table[key][0]
+        assert reopened.price_on("GOLD_12", date(2025, 4, 1))[variant]["termo_fixo"] == 1.0
+        assert reopened.price_on("GOLD_12", date(2025, 6, 1))[variant]["termo_fixo"] == 2.0
+        assert reopened.price_on(other[0], date(2025, 6, 1)).get("|".join(other[1:])) is None
+
+        changes = [c for c in reopened.changes("GOLD_12") if c["variant"] == variant]
+        assert [(c["date"], c["new"]["termo_fixo"]) for c in changes] == [
+            ("2025-01-01", table[key][0]), ("2025-03-01", 1.0), ("2025-05-01", 2.0),
+        ]
+        # Only the releases that touched GOLD_12 are indexed for it
+        assert len(reopened.offers["GOLD_12"]) == 3
+        assert len(reopened.offers[other[0]]) == 2
+
+
+def test_checkpoints():
+    """Adding a release or rebuilding a table replays at most CHECKPOINT_INTERVAL deltas, backfills included."""
+    interval = 4
+    day = date(2025, 1, 1)
+
+    def table(n):
+        # A few offers, some coming and going, priced after the release number
+        return {(f"OFFER_{i % 7}", "6.9", "1", ""): (float(n + i),) + (None,) * 5 for i in range(n % 5 + 3)}
+
+    with tempfile.TemporaryDirectory() as path, patch.object(archive_module, "CHECKPOINT_INTERVAL", interval):
+        archive = PriceArchive(path)
+        reads = []
+        read_delta = archive._read_delta
+        archive._read_delta = lambda release: reads.append(release["hash"]) or read_delta(release)
+
+        # Daily releases, then a backfill of the days before them, newest first
+        order = list(range(10, 25)) + list(range(9, -1, -1))
+        for n in order:
+            reads.clear()
+            assert archive.add_release(f"{n:064d}", day + timedelta(days=n), table(n))
+            assert len(reads) <= 2 * interval, (n, len(reads))
+
+        assert [r["date"] for r in archive.releases] == [(day + timedelta(days=n)).isoformat() for n in range(25)]
+        assert "full" in archive.releases[-1]
+        full_files = [f for f in os.listdir(path) if f.endswith(".full.json.gz")]
+        assert len(full_files) == sum("full" in r for r in archive.releases) < 25
+
+        reopened = PriceArchive(path)
+        reopened._read_delta = archive._read_delta
+        for n in range(1, 26):
+            reads.clear()
+            previous = reopened.previous_table(f"{n:064d}" if n < 25 else "x" * 64)
+            assert previous == table(n - 1), n
+            assert len(reads) < interval, (n, len(reads))
+
+
+def test_release_date_from_url():
+    url = "https://simuladorprecos.erse.pt/Admin/csvs/20250919%20100313%20CSV.zip"
+    assert release_date_from_url(url) == date(2025, 9, 19)
+    assert release_date_from_url("https://example.com/latest.zip") is None
+
+
+if __name__ == "__main__":
+    test_price_archive()
+    test_checkpoints()
+    test_release_date_from_url()
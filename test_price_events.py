@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Test script for the price-change events between two snapshots (offline, uses data/*.csv)."""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+sys.path.append('custom_components')
+
+from hass_tarifarios_eletricidade_pt.events import (
+    EVENT_BATCH_SIZE,
+    EVENT_OFFER_ADDED,
+    EVENT_OFFER_REMOVED,
+    EVENT_PRICE_CHANGED,
+    async_fire_price_events,
+    diff_price_tables,
+)
+
+from test_cheapest_offers import load_local_snapshot
+from test_entry_options import DATA_DIR, DOMAIN, async_add_entry, async_hass
+
+
+class _Bus:
+    def __init__(self):
+        self.events = []
+
+    def async_fire(self, event_type, data):
+        self.events.append((event_type, data))
+
+
+class _Hass:
+    def __init__(self):
+        self.bus = _Bus()
+
+
+def test_price_events():
+    """A changed price, a new offer and a withdrawn offer become one event each."""
+    old = load_local_snapshot().price_table
+    new = dict(old)
+    changed_key = next(k for k in old if k[0] == "GOLD_12")
+    new[changed_key] = (old[changed_key][0] + 0.01,) + old[changed_key][1:]
+    removed_code = "GOLD_14"
+    for key in [k for k in new if k[0] == removed_code]:
+        del new[key]
+    new[("GOLD_99", "6.9", "1", "")] = (0.5, 0.15, None, None, None, None)
+
+    start = time.perf_counter()
+    diff = diff_price_tables(old, new)
+    print(f"Joined {len(old)} x {len(new)} price rows in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    assert list(diff[EVENT_PRICE_CHANGED]) == ["GOLD_12"]
+    variant = diff[EVENT_PRICE_CHANGED]["GOLD_12"][0]
+    assert variant["new"]["termo_fixo"] == variant["old"]["termo_fixo"] + 0.01
+    assert list(diff[EVENT_OFFER_ADDED]) == ["GOLD_99"]
+    assert list(diff[EVENT_OFFER_REMOVED]) == [removed_code]
+    assert all(v["new"] is None for v in diff[EVENT_OFFER_REMOVED][removed_code])
+
+    # Only the entry's offers are reported
+    scoped = diff_price_tables(old, new, codes={"GOLD_14"})
+    assert not scoped[EVENT_PRICE_CHANGED] and list(scoped[EVENT_OFFER_REMOVED]) == ["GOLD_14"]
+
+    # ... at the entry's potências (and gas escalões)
+    ele_key = ("GOLD_12", "6.9", "1", "")
+    new[ele_key] = (old[ele_key][0] + 0.02,) + old[ele_key][1:]
+    elsewhere = diff_price_tables(old, new, codes={"GOLD_12"}, potencias={"3.45"}, escaloes=set())
+    assert not any(elsewhere.values())
+    at_pot = diff_price_tables(old, new, codes={"GOLD_12", "GOLD_14"}, potencias={"6.9"}, escaloes=set())
+    assert [v["potencia"] for v in at_pot[EVENT_PRICE_CHANGED]["GOLD_12"]] == ["6.9"]
+    assert list(at_pot[EVENT_OFFER_REMOVED]) == ["GOLD_14"]
+    assert {v["potencia"] for v in at_pot[EVENT_OFFER_REMOVED]["GOLD_14"]} == {"6.9"}
+
+
+def test_events_are_batched():
+    """Every offer of a large release gets its own event, fired in batches."""
+    old = load_local_snapshot().price_table
+    new = {k: (v[0] + 0.001 if v[0] is not None else 0.1,) + v[1:] for k, v in old.items()}
+    diff = diff_price_tables(old, new)
+    hass = _Hass()
+    fired = asyncio.run(async_fire_price_events(hass, diff, {"snapshot_hash": "x"}))
+    assert fired == len(hass.bus.events) == len(diff[EVENT_PRICE_CHANGED]) > EVENT_BATCH_SIZE
+    print(f"{fired} offers changed, {fired} events")
+
+
+def _next_release(path: str, removed: str, changes: dict) -> None:
+    """Copy of the data/ release without one offer, with the termo fixo of some (code, potência) rows changed."""
+    for name in ("CondComerciais.csv", "Precos_ELEGN.csv"):
+        with open(os.path.join(DATA_DIR, name), encoding="utf-8-sig", newline="") as f:
+            lines = f.read().splitlines(keepends=True)
+        code_field = 1 if name.startswith("Cond") else 4
+        kept = []
+        for line in lines:
+            fields = line.split(";")
+            if len(fields) > code_field and fields[code_field] == removed:
+                continue
+            if name.startswith("Precos") and (fields[4], fields[1]) in changes:
+                fields[6] = changes[(fields[4], fields[1])]
+            kept.append(";".join(fields))
+        with open(os.path.join(path, name), "w", encoding="utf-8", newline="") as f:
+            f.write("".join(kept))
+
+
+async def _test_coordinator_events():
+    async with async_hass() as hass:
+        entry = await async_add_entry(hass)
+        coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+        selected = set(coordinator.data["Código da oferta comercial"].astype(str))
+        assert {"GOLD_06", "GOLD_09", "GOLD_14"} <= selected
+        fired = []
+        for event_type in (EVENT_PRICE_CHANGED, EVENT_OFFER_ADDED, EVENT_OFFER_REMOVED):
+            hass.bus.async_listen(event_type, lambda event: fired.append((event.event_type, event.data)))
+
+        with tempfile.TemporaryDirectory() as path:
+            # GOLD_14 withdrawn; GOLD_09 dearer at the entry's 6,9 kVA and at 3,45 kVA, GOLD_06 only at 3,45 kVA
+            _next_release(path, "GOLD_14", {("GOLD_09", "6,9"): "0,9", ("GOLD_09", "3,45"): "0,4", ("GOLD_06", "3,45"): "0,4"})
+            coordinator.caminho_local = path
+            coordinator.last_full_refresh = None
+            await coordinator.async_refresh()
+            await hass.async_block_till_done()
+
+        assert coordinator.last_update_success
+        assert "GOLD_14" not in set(coordinator.data["Código da oferta comercial"].astype(str))
+        by_type = {}
+        for event_type, data in fired:
+            assert data["entry_id"] == entry.entry_id and data["comercializador"] == "GOLD"
+            by_type.setdefault(event_type, {})[data["codigo_oferta"]] = data["variantes"]
+        assert list(by_type[EVENT_OFFER_REMOVED]) == ["GOLD_14"]
+        assert {v["potencia"] for v in by_type[EVENT_OFFER_REMOVED]["GOLD_14"]} == {"6.9"}
+        # Only the change at the entry's potência
+        assert list(by_type[EVENT_PRICE_CHANGED]) == ["GOLD_09"]
+        assert {(v["potencia"], v["new"]["termo_fixo"]) for v in by_type[EVENT_PRICE_CHANGED]["GOLD_09"]} == {("6.9", 0.9)}
+        assert EVENT_OFFER_ADDED not in by_type
+        # Withdrawn offers stay attributed in the archive, for the releases that arrive while Home Assistant is down
+        assert "GOLD_14" in hass.data[DOMAIN]["archive"].offer_codes("GOLD")
+
+
+def test_coordinator_events():
+    """A new release withdrawing one of the entry's offers fires offer_removed; other potências stay quiet."""
+    asyncio.run(_test_coordinator_events())
+
+
+if __name__ == "__main__":
+    test_price_events()
+    test_events_are_batched()
+    test_coordinator_events()
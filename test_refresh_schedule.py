@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Test script for the refresh schedule learned from ERSE publication times (offline)."""
+
+import logging
+import sys
+from datetime import date, datetime, time, timedelta
+sys.path.append('custom_components')
+
+from hass_tarifarios_eletricidade_pt.downloader import _newest_release, parse_update_dates
+from hass_tarifarios_eletricidade_pt.scheduler import (
+    BACKOFF_MAX,
+    PROBE_INTERVAL,
+    PublicationSchedule,
+    is_newer_release,
+)
+from hass_tarifarios_eletricidade_pt.tariff_periods import LISBON_TZ
+
+URL = "https://simuladorprecos.erse.pt/Admin/csvs/{}%20{}%20CSV.zip"
+
+
+def lisbon(*args) -> datetime:
+    return datetime(*args, tzinfo=LISBON_TZ)
+
+
+def test_learned_window():
+    """Tuesday and Thursday releases around 14:00 move the window and skip other days."""
+    schedule = PublicationSchedule()
+    for day in ("20251007", "20251009", "20251014", "20251016"):
+        assert schedule.observe_url(URL.format(day, "140210"))
+    assert not schedule.observe_url(URL.format("20251016", "140210"))
+    assert schedule.weekdays() == {1, 3}
+
+    start, end = schedule.window(date(2025, 10, 21))
+    assert start == lisbon(2025, 10, 21, 13, 32, 10)
+    assert end == lisbon(2025, 10, 21, 16, 2, 10)
+    assert schedule.window(date(2025, 10, 20)) is None
+
+    # Monday evening: sleep until the Tuesday window opens, capped by the backoff
+    now = lisbon(2025, 10, 20, 20, 0)
+    assert schedule.next_interval(now, False, 0) == timedelta(hours=1)
+    assert schedule.next_interval(now, False, 10) == BACKOFF_MAX
+    now = lisbon(2025, 10, 21, 12, 0)
+    assert schedule.next_interval(now, False, 10) == timedelta(hours=1, minutes=32, seconds=10)
+    # Inside the window: probe often until today's release is loaded
+    now = lisbon(2025, 10, 21, 14, 30)
+    assert schedule.next_interval(now, False, 3) == PROBE_INTERVAL
+    assert schedule.next_interval(now, True, 3) == timedelta(hours=6)
+
+
+def test_default_window():
+    """Without observations: working days around the known 10:03:13 publication."""
+    schedule = PublicationSchedule()
+    assert schedule.window(date(2025, 10, 18)) is None
+    start, _ = schedule.window(date(2025, 10, 17))
+    assert start.time() == time(9, 33, 13)
+    assert schedule.next_interval(lisbon(2025, 10, 17, 10, 30), False, 0) == PROBE_INTERVAL
+
+
+def test_release_probe_parsing():
+    html = (
+        '<p>Ofertas comerciais (CSV) - Atualizado em 19/09/2025</p>'
+        '<a href="/Admin/csvs/20250912%20100313%20CSV.zip">old</a>'
+        '<a href="/Admin/csvs/20250919 100313 CSV.zip">new</a>'
+    )
+    assert parse_update_dates(html) == [date(2025, 9, 19)]
+    # Parsed on every probe: nothing above debug
+    logger = logging.getLogger("hass_tarifarios_eletricidade_pt.downloader")
+    records = []
+    handler = logging.Handler(logging.INFO)
+    handler.emit = records.append
+    level = logger.level
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    try:
+        url, update_date = _newest_release(html)
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+    assert not records, [r.getMessage() for r in records]
+    assert url == URL.format("20250919", "100313")
+    assert update_date == date(2025, 9, 19)
+    assert _newest_release("<p>nothing</p>") == (None, None)
+
+    current = URL.format("20250912", "100313")
+    assert is_newer_release(url, None, current, date(2025, 9, 12))
+    assert not is_newer_release(current, None, url, date(2025, 9, 19))
+    assert not is_newer_release(None, date(2025, 9, 19), url, date(2025, 9, 19))
+    assert is_newer_release(None, date(2025, 9, 20), url, date(2025, 9, 19))
+
+
+if __name__ == "__main__":
+    test_learned_window()
+    test_default_window()
+    test_release_probe_parsing()
+    print("All refresh schedule tests passed")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Test script for the snapshot artefacts of the build tool (offline, uses data/*.csv)."""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import zipfile
+sys.path.append('custom_components')
+
+from hass_tarifarios_eletricidade_pt.artefact import ArtefactError, read_artefact, write_artefact
+from hass_tarifarios_eletricidade_pt.build import main as build_main
+from hass_tarifarios_eletricidade_pt.catalogue import Catalogue
+from hass_tarifarios_eletricidade_pt.data_loader import build_release_snapshot, build_snapshot, parse_tables
+from hass_tarifarios_eletricidade_pt.snapshot import payload_digest
+from hass_tarifarios_eletricidade_pt.sources import ArtefactSource, SourceError, read_local_release, read_release
+
+from test_lite_engine import _rows, read_csvs
+
+
+def test_round_trip():
+    """Tables come back cell for cell; foreign and other-version artefacts are refused."""
+    cond_txt, precos_txt = read_csvs()
+    cond, precos = parse_tables(cond_txt, precos_txt)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sub", "t.snapshot")
+        manifest = write_artefact(path, "abc", {"cond": cond, "precos": precos}, release={"date": "2025-10-08"})
+        assert manifest["tables"]["precos"]["rows"] == len(next(iter(precos.values())))
+        with open(path, "rb") as f:
+            content = f.read()
+        artefact = read_artefact(content)
+        assert artefact.tables == {"cond": cond, "precos": precos}
+        assert artefact.hash == "abc" and artefact.catalogue is None
+        assert str(artefact.release_date) == "2025-10-08"
+
+        newer = os.path.join(tmp, "newer.snapshot")
+        with zipfile.ZipFile(path) as src, zipfile.ZipFile(newer, "w") as dst:
+            for name in src.namelist():
+                data = src.read(name)
+                if name == "manifest.json":
+                    data = json.dumps({**manifest, "version": 99})
+                dst.writestr(name, data)
+        with open(newer, "rb") as f:
+            content = f.read()
+        for bad in (content, b"not a zip"):
+            try:
+                read_artefact(bad)
+            except ArtefactError:
+                pass
+            else:
+                raise AssertionError("bad artefact accepted")
+
+
+def test_build_and_load():
+    """An artefact built by the tool loads into the snapshot and catalogue the CSVs give, on both engines."""
+    local = read_local_release("data")
+    cond_txt, precos_txt = local.cond_txt, local.precos_txt
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tarifarios.snapshot")
+        assert build_main(["--fontes", "local", "--local", "data", "-o", path]) == 0
+
+        release = asyncio.run(ArtefactSource(path).async_fetch(None))
+        # Keyed like the CSVs it was built from, so either loads the same cached snapshot
+        assert release.prebuilt and release.key == local.key == payload_digest(cond_txt, precos_txt)
+        read_release(release)
+        for engine in ("pandas", "lite"):
+            expected = build_snapshot(cond_txt, precos_txt, engine)
+            snapshot = build_release_snapshot(release, engine)
+            assert snapshot.hash == expected.hash and snapshot.engine == engine
+            assert list(snapshot.merged.columns) == list(expected.merged.columns), engine
+            assert _rows(snapshot.merged) == _rows(expected.merged), engine
+            assert snapshot.cost_vectors.keys() == expected.cost_vectors.keys()
+        assert snapshot.prebuilt_catalogue["offers"] == Catalogue.from_snapshot(expected).offers
+
+        try:
+            asyncio.run(ArtefactSource(os.path.join(tmp, "missing")).async_fetch(None))
+        except SourceError:
+            pass
+        else:
+            raise AssertionError("missing artefact fetched")
+
+
+if __name__ == "__main__":
+    test_round_trip()
+    test_build_and_load()
+    print("All snapshot artefact tests passed")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Test script for the precomputed ERSE tariff-period calendar."""
+
+import sys
+from datetime import datetime, timedelta
+sys.path.append('custom_components')
+
+from hass_tarifarios_eletricidade_pt.tariff_periods import (
+    LISBON_TZ,
+    PERIOD_NAMES,
+    SCHEDULES,
+    current_period,
+    get_calendar,
+    warm_calendars,
+)
+
+
+def test_tariff_periods():
+    """Check known periods and that every boundary really changes the period."""
+    cases = [
+        # (moment, contagem, ciclo, expected period, expected next boundary)
+        (datetime(2026, 1, 5, 9, 45), "3", "diario", "ponta", datetime(2026, 1, 5, 10, 30)),
+        (datetime(2026, 7, 6, 9, 45), "3", "diario", "cheias", datetime(2026, 7, 6, 10, 30)),
+        (datetime(2026, 7, 4, 10, 0), "2", "semanal", "fora_vazio", datetime(2026, 7, 4, 14, 0)),
+        (datetime(2026, 1, 4, 12, 0), "3", "semanal", "vazio", datetime(2026, 1, 5, 7, 0)),
+        (datetime(2026, 3, 10, 23, 0), "2", "diario", "vazio", datetime(2026, 3, 11, 8, 0)),
+    ]
+    for moment, contagem, ciclo, period, boundary in cases:
+        index, next_change = current_period(moment.replace(tzinfo=LISBON_TZ), contagem, ciclo)
+        print(f"  {moment} {contagem}/{ciclo}: {PERIOD_NAMES[contagem][index]} until {next_change}")
+        assert PERIOD_NAMES[contagem][index] == period
+        assert next_change == boundary.replace(tzinfo=LISBON_TZ)
+
+    assert current_period(datetime(2026, 1, 5, tzinfo=LISBON_TZ), "1", "diario") == (0, None)
+
+    calendar = get_calendar(2026, "3", "semanal")
+    assert get_calendar(2026, "3", "semanal") is calendar
+    moment = datetime(2026, 1, 1, tzinfo=LISBON_TZ)
+    while moment.year == 2026:
+        index, next_change = calendar.lookup(moment)
+        if next_change.year != 2026:
+            break
+        assert calendar.lookup(next_change)[0] != index
+        assert calendar.lookup(next_change - timedelta(minutes=1))[0] == index
+        moment = next_change
+
+
+
+def test_new_year_boundary():
+    """A period running over New Year ends at its real boundary next year, not at midnight."""
+    index, next_change = current_period(datetime(2026, 12, 31, 23, 30, tzinfo=LISBON_TZ), "2", "diario")
+    assert PERIOD_NAMES["2"][index] == "vazio" and next_change == datetime(2027, 1, 1, 8, 0, tzinfo=LISBON_TZ)
+    for contagem, ciclo in SCHEDULES:
+        moment = datetime(2026, 12, 29, tzinfo=LISBON_TZ)
+        while moment.year == 2026:
+            index, next_change = current_period(moment, contagem, ciclo)
+            assert current_period(next_change, contagem, ciclo)[0] != index, (contagem, ciclo, moment)
+            assert current_period(next_change - timedelta(minutes=1), contagem, ciclo)[0] == index
+            moment += timedelta(minutes=15)
+
+
+def test_warm_calendars():
+    """Warming builds this year's and next year's calendars, so the New Year boundary finds its calendar cached."""
+    get_calendar.cache_clear()
+    warm_calendars(datetime(2027, 12, 31, 23, 30, tzinfo=LISBON_TZ), "2", "diario")
+    assert get_calendar.cache_info().currsize == 2
+    index, next_change = current_period(datetime(2027, 12, 31, 23, 30, tzinfo=LISBON_TZ), "2", "diario")
+    assert next_change.year == 2028
+    current_period(next_change, "2", "diario")
+    assert get_calendar.cache_info().misses == 2
+    warm_calendars(datetime(2027, 6, 1, tzinfo=LISBON_TZ), "1", "diario")
+    assert get_calendar.cache_info().currsize == 2
+
+
+if __name__ == "__main__":
+    test_tariff_periods()
+    test_new_year_boundary()
+    test_warm_calendars()